@@ -0,0 +1,202 @@
+import argparse
+import csv
+import io
+import os
+import time
+
+import numpy as np
+
+from embed_cache import embed_queries
+from ranking import MAX_FETCH, aggregate, top_k
+
+# -------------------- CONFIG --------------------
+EMBED_BATCH_SIZE = 64
+BLOCK_ELEMENTS = 32_000_000    # jobs x chunks scores held in memory at once (~128 MB float32)
+PAGE_SIZE = 5000
+TEXT_COLUMNS = ["job_description", "description", "text"]
+
+
+# -------------------- INPUT --------------------
+def read_jobs_csv(file_obj):
+    """
+    Accepts a path or a text file object.
+    Needs a job_description (or description/text) column, job_id is optional.
+    """
+    if isinstance(file_obj, str):
+        with open(file_obj, newline="", encoding="utf-8") as f:
+            return read_jobs_csv(f)
+
+    reader = csv.DictReader(file_obj)
+    text_col = next((c for c in TEXT_COLUMNS if c in (reader.fieldnames or [])), None)
+    if text_col is None:
+        raise ValueError(f"CSV needs one of the columns: {', '.join(TEXT_COLUMNS)}")
+
+    jobs = []
+    for i, row in enumerate(reader):
+        text = (row.get(text_col) or "").strip()
+        if text:
+            jobs.append((row.get("job_id") or str(i + 1), text))
+    return jobs
+
+
+# -------------------- RESUME VECTORS --------------------
+def load_resume_matrix(vectorstore, near_dup=None):
+    """
+    All chunk vectors (L2-normalized) plus the resume each chunk belongs to.
+    Collapsed near-duplicates get a row with their canonical chunk's vector.
+    """
+    collection = vectorstore._collection
+    total = collection.count()
+    vectors = []
+    ids = []
+    file_names = []
+    for offset in range(0, total, PAGE_SIZE):
+        page = collection.get(
+            include=["embeddings", "metadatas"],
+            limit=PAGE_SIZE,
+            offset=offset
+        )
+        vectors.extend(page["embeddings"])
+        ids.extend(page["ids"])
+        file_names.extend(m.get("file_name", "") for m in page["metadatas"])
+    if not file_names:
+        return np.zeros((0, 0), dtype=np.float32), np.asarray(file_names, dtype=object)
+
+    matrix = np.asarray(vectors, dtype=np.float32).reshape(len(file_names), -1)
+    if near_dup is not None:
+        pos = {cid: i for i, cid in enumerate(ids)}
+        refs = [(pos[canonical], name) for _, canonical, name in near_dup.references() if canonical in pos]
+        if refs:
+            matrix = np.vstack([matrix, matrix[[i for i, _ in refs]]])
+            file_names.extend(name for _, name in refs)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix /= np.maximum(norms, 1e-12)
+    return matrix, np.asarray(file_names, dtype=object)
+
+
+# -------------------- SCORING --------------------
+def score_jobs(job_vectors, matrix, file_names, k, aggregator="max", top_n=3):
+    """
+    One matrix product per block of jobs.
+    'max' is reduced per resume directly (chunks are grouped by resume once),
+    other aggregators look at the top MAX_FETCH chunks of each job.
+    """
+    results = []
+    if len(file_names) == 0:
+        return [[] for _ in range(len(job_vectors))]
+
+    order = np.argsort(file_names, kind="stable")
+    matrix = matrix[order]
+    file_names = file_names[order]
+    names, starts, counts = np.unique(file_names, return_index=True, return_counts=True)
+
+    block = max(1, BLOCK_ELEMENTS // len(file_names))
+    fetch = min(MAX_FETCH, len(file_names))
+    for i in range(0, len(job_vectors), block):
+        scores = job_vectors[i:i + block] @ matrix.T      # (jobs, chunks)
+
+        if aggregator == "max":
+            per_resume = np.maximum.reduceat(scores, starts, axis=1)
+            for row in per_resume:
+                results.append(top_k(names, row, counts, k))
+            continue
+
+        cand = np.argpartition(-scores, fetch - 1, axis=1)[:, :fetch]
+        for row, idx in zip(scores, cand):
+            r_names, r_scores, r_counts = aggregate(file_names[idx], row[idx], aggregator, top_n)
+            results.append(top_k(r_names, r_scores, r_counts, k))
+    return results
+
+
+def shortlist_batch(jobs, vectorstore, embedding_model, k=5, aggregator="max", top_n=3,
+                    batch_size=EMBED_BATCH_SIZE, near_dup=None):
+    """
+    jobs: list of (job_id, job_description)
+    returns (rows, stats) -- one row per (job, rank)
+    """
+    t0 = time.perf_counter()
+    matrix, file_names = load_resume_matrix(vectorstore, near_dup)
+    t1 = time.perf_counter()
+    if not jobs or len(file_names) == 0:
+        # nothing to rank (or nothing to rank against) -> no rows, no embedding calls
+        return [], {"jobs": len(jobs), "chunks": len(file_names), "load_seconds": t1 - t0,
+                    "embed_seconds": 0.0, "score_seconds": 0.0, "total_seconds": t1 - t0}
+
+    # job descriptions are queries: same vectors (and cache entries) as a shortlist from the app
+    texts = [text for _, text in jobs]
+    job_vectors = []
+    for i in range(0, len(texts), batch_size):
+        job_vectors.extend(embed_queries(embedding_model, texts[i:i + batch_size]))
+    job_vectors = np.asarray(job_vectors, dtype=np.float32).reshape(len(texts), -1)
+    job_vectors /= np.maximum(np.linalg.norm(job_vectors, axis=1, keepdims=True), 1e-12)
+    t2 = time.perf_counter()
+
+    ranked = score_jobs(job_vectors, matrix, file_names, k, aggregator, top_n)
+    t3 = time.perf_counter()
+
+    rows = []
+    for (job_id, _), hits in zip(jobs, ranked):
+        for rank, hit in enumerate(hits, start=1):
+            rows.append({
+                "job_id": job_id,
+                "rank": rank,
+                "file_name": hit["file_name"],
+                "score": round(hit["score"], 4)
+            })
+
+    stats = {
+        "jobs": len(jobs),
+        "chunks": len(file_names),
+        "load_seconds": t1 - t0,
+        "embed_seconds": t2 - t1,
+        "score_seconds": t3 - t2,
+        "total_seconds": t3 - t0
+    }
+    return rows, stats
+
+
+# -------------------- OUTPUT --------------------
+def rows_to_csv(rows):
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=["job_id", "rank", "file_name", "score"])
+    writer.writeheader()
+    writer.writerows(rows)
+    return buf.getvalue()
+
+
+def write_rows(rows, path):
+    if path.endswith(".parquet"):
+        import pandas as pd
+        pd.DataFrame(rows).to_parquet(path, index=False)
+    else:
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            f.write(rows_to_csv(rows))
+
+
+# -------------------- CLI --------------------
+if __name__ == "__main__":
+    from ranking import AGGREGATORS
+    from resources import EMBED_MODEL, VECTOR_BACKEND, get_embedding_model, get_near_dup_index, get_vectorstore
+
+    parser = argparse.ArgumentParser(description="Shortlist resumes for many job descriptions at once")
+    parser.add_argument("jobs_csv")
+    parser.add_argument("output", help="output .csv or .parquet")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--aggregator", choices=AGGREGATORS, default="max")
+    parser.add_argument("--top-n", type=int, default=3)
+    parser.add_argument("--chroma-dir", default="chroma_db")
+    parser.add_argument("--backend", default=VECTOR_BACKEND)
+    parser.add_argument("--model", default=EMBED_MODEL)
+    parser.add_argument("--dedup-policy", default=os.getenv("DEDUP_POLICY", "collapse"))
+    args = parser.parse_args()
+
+    embedding_model = get_embedding_model(args.model)
+    vectorstore = get_vectorstore(args.chroma_dir, embedding_model, args.backend)
+    # collapsed near-duplicates only reach their resumes through the reference table
+    near_dup = get_near_dup_index(args.chroma_dir, vectorstore, args.dedup_policy)
+
+    jobs = read_jobs_csv(args.jobs_csv)
+    rows, stats = shortlist_batch(jobs, vectorstore, embedding_model, args.k, args.aggregator, args.top_n,
+                                  near_dup=near_dup)
+    write_rows(rows, args.output)
+    print(f"{stats['jobs']} jobs x {stats['chunks']} chunks in {stats['total_seconds']:.1f}s -> {args.output}")
@@ -0,0 +1,112 @@
+import argparse
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from flat_store import FlatCollection, normalize
+
+# Compares the flat memmap backend with Chroma on the same random vectors:
+# open time, bulk add, query latency and recall@k of HNSW against exact search.
+
+
+def percentile_ms(times, p):
+    return float(np.percentile(np.asarray(times) * 1000, p))
+
+
+def make_data(n, dim, n_queries, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = normalize(rng.normal(size=(n, dim)))
+    queries = normalize(rng.normal(size=(n_queries, dim)))
+    ids = [f"chunk_{i}" for i in range(n)]
+    metadatas = [{"file_name": f"resume_{i // 5}.pdf"} for i in range(n)]
+    return ids, vectors, metadatas, queries
+
+
+def bench_flat(path, ids, vectors, metadatas, queries, k):
+    t0 = time.perf_counter()
+    collection = FlatCollection(path)
+    t1 = time.perf_counter()
+    collection.upsert(ids=ids, embeddings=vectors, metadatas=metadatas)
+    collection.save()
+    t2 = time.perf_counter()
+
+    # reopen so queries run against the memory-mapped file
+    t3 = time.perf_counter()
+    collection = FlatCollection(path)
+    reopen = time.perf_counter() - t3
+
+    times = []
+    results = []
+    for q in queries:
+        t = time.perf_counter()
+        res = collection.query([q], n_results=k, include=["distances"])
+        times.append(time.perf_counter() - t)
+        results.append(res["ids"][0])
+    return {"open": t1 - t0, "reopen": reopen, "add": t2 - t1, "times": times, "results": results}
+
+
+def bench_chroma(path, ids, vectors, metadatas, queries, k):
+    import chromadb
+
+    t0 = time.perf_counter()
+    client = chromadb.PersistentClient(path=path)
+    collection = client.get_or_create_collection("bench")
+    t1 = time.perf_counter()
+    step = client.get_max_batch_size()
+    for i in range(0, len(ids), step):
+        collection.add(
+            ids=ids[i:i + step],
+            embeddings=vectors[i:i + step].tolist(),
+            metadatas=metadatas[i:i + step]
+        )
+    t2 = time.perf_counter()
+
+    t3 = time.perf_counter()
+    client = chromadb.PersistentClient(path=path)
+    collection = client.get_collection("bench")
+    reopen = time.perf_counter() - t3
+
+    times = []
+    results = []
+    for q in queries:
+        t = time.perf_counter()
+        res = collection.query(query_embeddings=[q.tolist()], n_results=k, include=["distances"])
+        times.append(time.perf_counter() - t)
+        results.append(res["ids"][0])
+    return {"open": t1 - t0, "reopen": reopen, "add": t2 - t1, "times": times, "results": results}
+
+
+def recall(results, truth):
+    hits = sum(len(set(r) & set(t)) for r, t in zip(results, truth))
+    return hits / sum(len(t) for t in truth)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark flat memmap store vs Chroma")
+    parser.add_argument("--n", type=int, default=50_000, help="number of chunk vectors")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--skip-chroma", action="store_true")
+    args = parser.parse_args()
+
+    ids, vectors, metadatas, queries = make_data(args.n, args.dim, args.queries)
+    truth = [[ids[i] for i in np.argsort(-(vectors @ q))[:args.k]] for q in queries]
+
+    runs = {}
+    tmp = tempfile.mkdtemp(prefix="bench_stores_")
+    try:
+        runs["flat"] = bench_flat(f"{tmp}/flat", ids, vectors, metadatas, queries, args.k)
+        if not args.skip_chroma:
+            runs["chroma"] = bench_chroma(f"{tmp}/chroma", ids, vectors, metadatas, queries, args.k)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    print(f"{args.n} vectors x {args.dim} dims, {args.queries} queries, k={args.k}")
+    print(f"{'backend':<8} {'open s':>7} {'reopen s':>9} {'add s':>7} {'p50 ms':>7} {'p95 ms':>7} {'recall':>7}")
+    for name, r in runs.items():
+        print(f"{name:<8} {r['open']:>7.3f} {r['reopen']:>9.3f} {r['add']:>7.2f} "
+              f"{percentile_ms(r['times'], 50):>7.2f} {percentile_ms(r['times'], 95):>7.2f} "
+              f"{recall(r['results'], truth):>7.3f}")
@@ -0,0 +1,294 @@
+import json
+import math
+import re
+import sqlite3
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+import numpy as np
+
+# -------------------- CONFIG --------------------
+INDEX_FILE = "bm25_index.sqlite3"
+PURGE_MIN = 10000       # masked (deleted) docs tolerated before the postings are rebuilt
+K1 = 1.5
+B = 0.75
+PAGE_SIZE = 5000
+
+# keeps skill tokens intact: c++, c#, node.js, az-104, sap/abap -> sap, abap
+TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#.\-]*[a-z0-9+#]|[a-z0-9]")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is",
+    "it", "of", "on", "or", "the", "to", "with", "we", "you", "our", "will"
+}
+
+
+def tokenize(text):
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+# -------------------- INVERTED INDEX --------------------
+class _Posting:
+    """Rows and term frequencies of one term; appends are batched into the arrays on read."""
+
+    __slots__ = ("rows", "tfs", "new_rows", "new_tfs")
+
+    def __init__(self):
+        self.rows = np.empty(0, dtype=np.int64)
+        self.tfs = np.empty(0, dtype=np.float32)
+        self.new_rows = []
+        self.new_tfs = []
+
+    def view(self):
+        if self.new_rows:
+            self.rows = np.concatenate([self.rows, np.array(self.new_rows, dtype=np.int64)])
+            self.tfs = np.concatenate([self.tfs, np.array(self.new_tfs, dtype=np.float32)])
+            self.new_rows = []
+            self.new_tfs = []
+        return self.rows, self.tfs
+
+
+class BM25Index:
+    """
+    Keyword index over the same chunks / ids / file_name metadata as the
+    vector collection. One SQLite row per chunk (its term counts), written
+    per batch; other processes' writes are picked up through a version
+    counter. Postings are held in memory as arrays and scored with numpy;
+    a snapshot of those arrays lets an open replay only the chunks written
+    since. Deleted chunks are masked until they outnumber the live ones.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS docs ("
+            " doc INTEGER PRIMARY KEY,"
+            " chunk_id TEXT NOT NULL,"
+            " file_name TEXT NOT NULL,"
+            " length INTEGER NOT NULL,"
+            " terms TEXT,"
+            " alive INTEGER NOT NULL,"
+            " version INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_docs_version ON docs (version)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_docs_file ON docs (file_name, alive)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS postings (term TEXT PRIMARY KEY, rows BLOB, tfs BLOB)")
+        self._reset()
+        self._load()
+
+    def _reset(self):
+        self.postings = defaultdict(_Posting)   # term -> rows / tfs
+        self.doc_ids = []                       # row -> chunk_id
+        self.doc_file = []                      # row -> file_name
+        self.doc_len = np.zeros(0, dtype=np.float32)
+        self.alive = np.zeros(0, dtype=bool)
+        self.row_of = {}                        # live chunk_id -> row
+        self.total_len = 0
+        self.masked = 0                         # deleted docs still in the posting arrays
+        self.version = 0
+
+    def __len__(self):
+        with self._lock:
+            self._sync()
+            return len(self.row_of)
+
+    # ---------- storage ----------
+    def _load(self):
+        """Full state: the doc table, the postings snapshot and the docs written after it."""
+        with self._lock:
+            meta = dict(self._conn.execute("SELECT key, value FROM meta"))
+            snapshot = int(meta.get("snapshot_version", 0))
+            docs = self._conn.execute("SELECT doc, chunk_id, file_name, length, alive FROM docs ORDER BY doc").fetchall()
+            size = docs[-1][0] + 1 if docs else 0
+            self.doc_ids = [None] * size
+            self.doc_file = [None] * size
+            self.doc_len = np.zeros(size, dtype=np.float32)
+            self.alive = np.zeros(size, dtype=bool)
+            for doc, chunk_id, file_name, length, alive in docs:
+                self.doc_ids[doc] = chunk_id
+                self.doc_file[doc] = file_name
+                self.doc_len[doc] = length
+                if alive:
+                    self.alive[doc] = True
+                    self.row_of[chunk_id] = doc
+                    self.total_len += length
+
+            if snapshot:
+                for term, rows, tfs in self._conn.execute("SELECT term, rows, tfs FROM postings"):
+                    posting = self.postings[term]
+                    posting.rows = np.frombuffer(rows, dtype=np.int64)
+                    posting.tfs = np.frombuffer(tfs, dtype=np.float32)
+            tail = self._conn.execute(
+                "SELECT doc, terms FROM docs WHERE version > ? AND alive = 1", (snapshot,)).fetchall()
+            for doc, terms in tail:
+                for term, tf in json.loads(terms).items():
+                    posting = self.postings[term]
+                    posting.new_rows.append(doc)
+                    posting.new_tfs.append(tf)
+            # deleted after the snapshot -> still in its arrays
+            self.masked = self._conn.execute(
+                "SELECT COUNT(*) FROM docs WHERE version > ? AND alive = 0", (snapshot,)).fetchone()[0]
+            self.version = int(meta.get("version", 0))
+        if len(tail) > PURGE_MIN:
+            self.snapshot()
+
+    def snapshot(self):
+        """Persist the posting arrays (live docs only), so the next open skips replaying every doc."""
+        with self._write() as version:
+            self._purge()
+            self._conn.execute("DELETE FROM postings")
+            self._conn.executemany(
+                "INSERT INTO postings (term, rows, tfs) VALUES (?, ?, ?)",
+                [(term, rows.tobytes(), tfs.tobytes())
+                 for term, (rows, tfs) in ((t, p.view()) for t, p in self.postings.items())]
+            )
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('snapshot_version', ?)",
+                               (str(version),))
+
+    def _purge(self):
+        """Drop deleted docs from the posting arrays."""
+        for term in list(self.postings):
+            rows, tfs = self.postings[term].view()
+            keep = self.alive[rows]
+            if not keep.any():
+                del self.postings[term]
+            elif not keep.all():
+                self.postings[term].rows = rows[keep]
+                self.postings[term].tfs = tfs[keep]
+        self.masked = 0
+
+    def _sync(self):
+        """Apply docs committed since this process last looked (by anyone)."""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+            version = int(row[0]) if row else 0
+            if version == self.version:
+                return
+            self._apply(self._conn.execute(
+                "SELECT doc, chunk_id, file_name, length, terms, alive FROM docs "
+                "WHERE version > ? ORDER BY doc", (self.version,)))
+            self.version = version
+
+    def _apply(self, records):
+        records = list(records)
+        size = max((r[0] + 1 for r in records), default=0)
+        if size > len(self.doc_ids):
+            grow = size - len(self.doc_ids)
+            self.doc_ids.extend([None] * grow)
+            self.doc_file.extend([None] * grow)
+            self.doc_len = np.concatenate([self.doc_len, np.zeros(grow, dtype=np.float32)])
+            self.alive = np.concatenate([self.alive, np.zeros(grow, dtype=bool)])
+        for doc, chunk_id, file_name, length, terms, alive in records:
+            if alive and not self.alive[doc]:
+                self.doc_ids[doc] = chunk_id
+                self.doc_file[doc] = file_name
+                self.doc_len[doc] = length
+                self.alive[doc] = True
+                self.row_of[chunk_id] = doc
+                self.total_len += length
+                for term, tf in json.loads(terms).items():
+                    posting = self.postings[term]
+                    posting.new_rows.append(doc)
+                    posting.new_tfs.append(tf)
+            elif not alive and self.alive[doc]:
+                self.alive[doc] = False
+                self.masked += 1
+                self.total_len -= int(self.doc_len[doc])
+                if self.row_of.get(chunk_id) == doc:
+                    del self.row_of[chunk_id]
+
+    @contextmanager
+    def _write(self):
+        """One SQLite write transaction (serializes writers across processes); yields its version."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._sync()
+                version = self.version + 1
+                yield version
+                self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('version', ?)",
+                                   (str(version),))
+                self._conn.execute("COMMIT")
+                self.version = version
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                self._reset()           # in-memory state may be half applied -> reload
+                self._load()
+                raise
+            if self.masked > max(len(self.row_of), PURGE_MIN):
+                self._purge()
+
+    def _delete_rows(self, docs, version):
+        self._conn.executemany("UPDATE docs SET alive = 0, terms = NULL, version = ? WHERE doc = ?",
+                               [(version, doc) for doc in docs])
+        self._apply([(doc, self.doc_ids[doc], None, 0, None, False) for doc in docs])
+
+    def _insert(self, ids, texts, file_names, version):
+        self._delete_rows(sorted({self.row_of[c] for c in ids if c in self.row_of}), version)
+        start = len(self.doc_ids)
+        records = []
+        for i, (chunk_id, text, file_name) in enumerate(zip(ids, texts, file_names)):
+            tf = Counter(tokenize(text or ""))
+            records.append((start + i, chunk_id, file_name, sum(tf.values()), json.dumps(tf), True))
+        self._conn.executemany(
+            "INSERT INTO docs (doc, chunk_id, file_name, length, terms, alive, version) "
+            "VALUES (?, ?, ?, ?, ?, 1, ?)",
+            [r[:5] + (version,) for r in records]
+        )
+        self._apply(records)
+
+    # ---------- updates ----------
+    def add(self, ids, texts, metadatas):
+        with self._write() as version:
+            self._insert(ids, texts, [(m or {}).get("file_name", "") for m in metadatas], version)
+
+    def delete(self, ids):
+        with self._write() as version:
+            self._delete_rows(sorted({self.row_of[c] for c in ids if c in self.row_of}), version)
+
+    def delete_file(self, file_name):
+        with self._write() as version:
+            self._delete_rows([r[0] for r in self._conn.execute(
+                "SELECT doc FROM docs WHERE file_name = ? AND alive = 1", (file_name,))], version)
+
+    def rebuild_from(self, vectorstore):
+        """One-off build for a collection that was indexed before this file existed."""
+        collection = vectorstore._collection
+        for offset in range(0, collection.count(), PAGE_SIZE):
+            page = collection.get(include=["documents", "metadatas"], limit=PAGE_SIZE, offset=offset)
+            self.add(page["ids"], page["documents"], [m or {} for m in page["metadatas"]])
+        self.snapshot()
+
+    # ---------- search ----------
+    def search(self, query, n=50):
+        """Top-n (chunk_id, file_name, bm25 score), best first."""
+        terms = set(tokenize(query))
+        with self._lock:
+            self._sync()
+            n_docs = len(self.row_of)
+            if n_docs == 0:
+                return []
+            avg_len = self.total_len / n_docs
+
+            scores = np.zeros(len(self.doc_ids), dtype=np.float32)
+            for term in terms:
+                if term not in self.postings:
+                    continue
+                rows, tf = self.postings[term].view()
+                live = self.alive[rows]
+                df = int(live.sum())
+                if df == 0:
+                    continue
+                idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                norm = K1 * (1 - B + B * self.doc_len[rows] / avg_len)
+                scores[rows] += live * (idf * tf * (K1 + 1) / (tf + norm))
+
+            hits = np.flatnonzero(scores > 0)
+            if len(hits) > n:
+                hits = hits[np.argpartition(-scores[hits], n - 1)[:n]]
+            hits = hits[np.argsort(-scores[hits])]
+            return [(self.doc_ids[r], self.doc_file[r], float(scores[r])) for r in hits]
@@ -0,0 +1,412 @@
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+import numpy as np
+
+from group_commit import GroupCommitStore
+
+try:
+    import fcntl
+except ImportError:         # Windows: no advisory locks, other processes can't be detected
+    fcntl = None
+
+# -------------------- CONFIG --------------------
+COMPACT_RATIO = float(os.getenv("COMPACT_RATIO", "0.3"))   # tombstones / rows that triggers a rebuild
+MIN_ROWS = 1000            # tiny stores are never worth compacting
+PROBE_QUERIES = 20
+PAGE_SIZE = 5000
+COMPACT_SUFFIX = "__compact"
+RETIRED_SUFFIX = "__retired"
+WRITERS_FILE = "writers.lock"
+CHECK_SECONDS = float(os.getenv("COMPACT_CHECK_SECONDS", "60"))   # min gap between tombstone checks
+
+_running = threading.Lock()
+_reports = {}
+_checked = {}               # persist dir -> monotonic time of the last tombstone check
+_free_after_rebuild = {}    # persist dir -> free SQLite pages a rebuild left behind (VACUUM busy)
+
+
+# -------------------- MEASURE --------------------
+def dir_bytes(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def probe_latency(collection, n=PROBE_QUERIES, k=10, seed=0):
+    """Median query latency (ms) over n fixed random queries."""
+    if collection.count() == 0:
+        return 0.0
+    sample = collection.get(limit=1, include=["embeddings"])["embeddings"]
+    dim = len(sample[0])
+    queries = np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+    times = []
+    for q in queries:
+        t0 = time.perf_counter()
+        collection.query(query_embeddings=[q.tolist()], n_results=k, include=["distances"])
+        times.append(time.perf_counter() - t0)
+    return float(np.median(times) * 1000)
+
+
+def _inner(vectorstore):
+    return vectorstore._store if isinstance(vectorstore, GroupCommitStore) else vectorstore
+
+
+def _freelist(persist_directory):
+    """(free pages, all pages) of Chroma's SQLite file."""
+    try:
+        with sqlite3.connect(os.path.join(persist_directory, "chroma.sqlite3"), timeout=5) as conn:
+            return (conn.execute("PRAGMA freelist_count").fetchone()[0],
+                    conn.execute("PRAGMA page_count").fetchone()[0])
+    except sqlite3.Error:
+        return 0, 0
+
+
+def _chroma_tombstones(persist_directory, live):
+    """
+    Chroma only marks deleted HNSW elements; its persisted segment metadata
+    knows how many were ever added and how many ids are still live.
+    """
+    dead = total = 0
+    for root, _, files in os.walk(persist_directory):
+        if "index_metadata.pickle" not in files:
+            continue
+        try:
+            with open(os.path.join(root, "index_metadata.pickle"), "rb") as f:
+                data = pickle.load(f)
+            added = data.total_elements_added if hasattr(data, "total_elements_added") \
+                else data["total_elements_added"]
+            labelled = len(data.id_to_label if hasattr(data, "id_to_label") else data["id_to_label"])
+        except Exception:
+            continue
+        dead += max(added - labelled, 0)
+        total += added
+    if total == 0:
+        # no HNSW metadata to read (newer chroma) -> the share of free SQLite pages,
+        # scaled to rows: live rows fill the used pages, deleted ones left the free pages.
+        # Pages a rebuild freed but could not VACUUM are not counted again.
+        free, pages = _freelist(persist_directory)
+        free = max(free - _free_after_rebuild.get(persist_directory, 0), 0)
+        if pages > free:
+            dead = round(live * free / (pages - free))
+            total = live + dead
+    return dead, total
+
+
+def tombstones(vectorstore, dense_index=None):
+    """(dead rows, total rows) of the store, or of its quantized sidecar if that is worse."""
+    collection = _inner(vectorstore)._collection
+    if hasattr(collection, "tombstones"):
+        dead, total = collection.tombstones()
+    else:
+        dead, total = _chroma_tombstones(_inner(vectorstore)._persist_directory, collection.count())
+    if dense_index is not None:
+        d, t = dense_index.tombstones()
+        if t and (not total or d / t > dead / total):
+            dead, total = d, t
+    return dead, total
+
+
+def tombstone_ratio(vectorstore, dense_index=None):
+    dead, total = tombstones(vectorstore, dense_index)
+    return dead / total if total else 0.0
+
+
+# -------------------- WRITE LOCK --------------------
+class LockedCollection:
+    """
+    Chroma collection whose writes go through one store-level lock, so a
+    rebuild can pause every writer in this process for its catch-up-and-swap
+    step, whatever wraps the store. Each open store also holds a shared lock
+    on the folder; a rebuild needs it exclusively and refuses to run while
+    any other store instance or process has the folder open.
+    """
+
+    def __init__(self, collection, persist_directory):
+        self._target = collection
+        self.lock = threading.RLock()
+        self._writers = open(os.path.join(persist_directory, WRITERS_FILE), "a")
+        if fcntl is not None:
+            fcntl.flock(self._writers, fcntl.LOCK_SH)      # waits while another process rebuilds
+
+    def _write(self, method, *args, **kwargs):
+        with self.lock:
+            return getattr(self._target, method)(*args, **kwargs)
+
+    def add(self, *args, **kwargs):
+        return self._write("add", *args, **kwargs)
+
+    def upsert(self, *args, **kwargs):
+        return self._write("upsert", *args, **kwargs)
+
+    def update(self, *args, **kwargs):
+        return self._write("update", *args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        return self._write("delete", *args, **kwargs)
+
+    def swap(self, collection):
+        with self.lock:
+            self._target = collection
+
+    @contextmanager
+    def exclusive(self):
+        """
+        Sole ownership of the folder; RuntimeError if another writer has it open.
+        Other processes block on their next open until it is released.
+        """
+        if fcntl is None:
+            yield
+            return
+        fcntl.flock(self._writers, fcntl.LOCK_UN)
+        try:
+            fcntl.flock(self._writers, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            fcntl.flock(self._writers, fcntl.LOCK_SH)
+            raise RuntimeError("another writer has the store open, not compacting") from None
+        try:
+            yield
+        finally:
+            fcntl.flock(self._writers, fcntl.LOCK_SH)
+
+    def __getattr__(self, name):
+        # count / get / query / name / metadata ... read the current collection
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return getattr(self._target, name)
+
+
+def lock_writes(store):
+    """Route the writes of a Chroma store through a LockedCollection (call right after opening it)."""
+    if not isinstance(store._collection, LockedCollection):
+        store._collection = LockedCollection(store._collection, store._persist_directory)
+    return store
+
+
+# -------------------- CHROMA REBUILD --------------------
+def _names(client):
+    # chroma >= 0.6 lists names, older versions list collection objects
+    return {getattr(c, "name", c) for c in client.list_collections()}
+
+
+def recover_chroma(client, name="langchain"):
+    """Finish or roll back a rebuild that was interrupted (call before opening the collection)."""
+    names = _names(client)
+    if name + RETIRED_SUFFIX in names:
+        # crashed mid-swap: the copy was complete before anything was renamed
+        if name not in names:
+            client.get_collection(name + COMPACT_SUFFIX).modify(name=name)
+        client.delete_collection(name + RETIRED_SUFFIX)
+    elif name + COMPACT_SUFFIX in names:
+        client.delete_collection(name + COMPACT_SUFFIX)       # crashed during the copy
+
+
+def _digest(document, metadata, embedding):
+    h = hashlib.sha1(json.dumps([document, metadata], sort_keys=True, default=str).encode("utf-8"))
+    h.update(np.asarray(embedding, dtype=np.float32).tobytes())
+    return h.hexdigest()
+
+
+def _listing(collection, page_size):
+    """id -> digest of its document, metadata and embedding."""
+    out = {}
+    for offset in range(0, collection.count(), page_size):
+        page = collection.get(include=["embeddings", "documents", "metadatas"], limit=page_size, offset=offset)
+        out.update((cid, _digest(doc, meta, emb))
+                   for cid, doc, meta, emb in zip(page["ids"], page["documents"],
+                                                  page["metadatas"], page["embeddings"]))
+    return out
+
+
+def _copy(source, target, ids, step):
+    for i in range(0, len(ids), step):
+        page = source.get(ids=ids[i:i + step], include=["embeddings", "documents", "metadatas"])
+        if page["ids"]:
+            target.upsert(ids=page["ids"], embeddings=page["embeddings"],
+                          documents=page["documents"], metadatas=page["metadatas"])
+
+
+def rebuild_chroma(vectorstore, page_size=PAGE_SIZE):
+    """
+    Copy the live entries into a fresh collection in the background, catch up
+    with writes made meanwhile (every writer is paused for that step only),
+    then swap by renaming. Deleted HNSW elements are not copied.
+    The folder is held exclusively for catch-up and swap only; other
+    processes may keep writing during the copy.
+    Raises RuntimeError if another store instance or process has the folder open.
+    """
+    store = lock_writes(_inner(vectorstore))
+    locked = store._collection
+    with locked.exclusive():
+        pass                    # fail before copying anything, not after
+    client = store._client
+    old = locked._target
+    name = old.name
+    recover_chroma(client, name)
+    step = min(page_size, client.get_max_batch_size())
+
+    new = client.create_collection(name + COMPACT_SUFFIX, metadata=old.metadata)
+    try:
+        for offset in range(0, old.count(), step):
+            page = old.get(include=["embeddings", "documents", "metadatas"], limit=step, offset=offset)
+            if page["ids"]:
+                new.upsert(ids=page["ids"], embeddings=page["embeddings"],
+                           documents=page["documents"], metadatas=page["metadatas"])
+        with locked.exclusive():
+            _catch_up_and_swap(locked, vectorstore, old, new, name, page_size, step)
+    except BaseException:
+        if name + RETIRED_SUFFIX not in _names(client):
+            client.delete_collection(name + COMPACT_SUFFIX)     # the swap never started
+        raise
+    client.delete_collection(name + RETIRED_SUFFIX)
+
+    # deleted rows leave free pages behind; VACUUM gives them back to the filesystem
+    path = store._persist_directory
+    try:
+        with sqlite3.connect(os.path.join(path, "chroma.sqlite3"), timeout=5) as conn:
+            conn.execute("VACUUM")
+        vacuumed = True
+    except sqlite3.Error:
+        vacuumed = False        # busy -> pages are reused by later writes instead
+    # what is still free now is not new tombstones: the next check must not rebuild again
+    _free_after_rebuild[path] = _freelist(path)[0]
+    return vacuumed
+
+
+def _catch_up_and_swap(locked, vectorstore, old, new, name, page_size, step):
+    # the group-commit buffer is flushed first: its lock is always taken before the store's
+    buffered = vectorstore._collection if isinstance(vectorstore, GroupCommitStore) else None
+    with buffered._lock if buffered is not None else nullcontext(), locked.lock:
+        if buffered is not None:
+            buffered.flush()
+        current, copied = _listing(old, page_size), _listing(new, page_size)
+        gone = [cid for cid in copied if cid not in current]
+        for i in range(0, len(gone), step):
+            new.delete(ids=gone[i:i + step])
+        # new ids, and ids whose document, metadata or embedding changed during the copy
+        _copy(old, new, [cid for cid in current if copied.get(cid) != current[cid]], step)
+
+        old.modify(name=name + RETIRED_SUFFIX)
+        new.modify(name=name)
+        locked.swap(new)
+
+
+# -------------------- COMPACT --------------------
+def compact(vectorstore, dense_index=None):
+    """
+    Rebuild the store (and its quantized sidecar) from live entries only and
+    swap the result in atomically. Returns a report with bytes reclaimed and
+    median query latency before / after.
+    """
+    store = _inner(vectorstore)
+    path = store._persist_directory
+    dead, total = tombstones(vectorstore, dense_index)
+    if isinstance(vectorstore, GroupCommitStore):
+        vectorstore.flush()
+
+    bytes_before = dir_bytes(path)
+    ms_before = probe_latency(vectorstore._collection)
+    t0 = time.perf_counter()
+    vacuumed = None
+    if hasattr(store._collection, "compact"):
+        store._collection.compact()
+    else:
+        vacuumed = rebuild_chroma(vectorstore)
+    if dense_index is not None:
+        dense_index.compact()
+    seconds = time.perf_counter() - t0
+    bytes_after = dir_bytes(path)
+
+    report = {
+        "finished_at": time.time(),
+        "tombstones": dead,
+        "rows_before": total,
+        "live_rows": vectorstore._collection.count(),
+        "bytes_before": bytes_before,
+        "bytes_after": bytes_after,
+        "bytes_reclaimed": bytes_before - bytes_after,
+        "latency_ms_before": ms_before,
+        "latency_ms_after": probe_latency(vectorstore._collection),
+        "compact_seconds": seconds
+    }
+    if vacuumed is not None:
+        report["sqlite_vacuumed"] = vacuumed
+    _reports[path] = report
+    return report
+
+
+def maybe_compact(vectorstore, dense_index=None, threshold=COMPACT_RATIO, background=True):
+    """
+    Compact once tombstones reach threshold of all rows. In the background by
+    default; at most one compaction runs at a time, and tombstones are counted
+    at most once every CHECK_SECONDS. Returns True if one started.
+    """
+    path = _inner(vectorstore)._persist_directory
+    now = time.monotonic()
+    if now - _checked.get(path, -CHECK_SECONDS) < CHECK_SECONDS:
+        return False
+    _checked[path] = now
+    dead, total = tombstones(vectorstore, dense_index)
+    if total < MIN_ROWS or dead / total < threshold:
+        return False
+    if not _running.acquire(blocking=False):
+        return False
+
+    def run():
+        try:
+            compact(vectorstore, dense_index)
+        except RuntimeError:
+            pass            # another writer has the store open -> retried on a later check
+        finally:
+            _running.release()
+
+    if background:
+        threading.Thread(target=run, daemon=True, name="compaction").start()
+    else:
+        run()
+    return True
+
+
+def is_running():
+    return _running.locked()
+
+
+def last_report(vectorstore):
+    return _reports.get(_inner(vectorstore)._persist_directory)
+
+
+# -------------------- CLI --------------------
+if __name__ == "__main__":
+    from resources import QUANT_MODE, VECTOR_BACKEND, get_dense_index, get_embedding_model, get_vectorstore
+
+    parser = argparse.ArgumentParser(description="Rebuild the vector store from live entries only")
+    parser.add_argument("--chroma-dir", default="chroma_db")
+    parser.add_argument("--backend", default=VECTOR_BACKEND)
+    parser.add_argument("--quant-mode", default=QUANT_MODE)
+    parser.add_argument("--threshold", type=float, default=0.0,
+                        help="only compact above this tombstone ratio")
+    args = parser.parse_args()
+
+    vectorstore = get_vectorstore(args.chroma_dir, get_embedding_model(), args.backend)
+    dense_index = get_dense_index(args.chroma_dir, vectorstore, args.quant_mode)
+    dead, total = tombstones(vectorstore, dense_index)
+    print(f"{dead} tombstones in {total} rows ({dead / total if total else 0:.1%})")
+    if args.threshold == 0 or (total and dead / total >= args.threshold):
+        try:
+            report = compact(vectorstore, dense_index)
+        except RuntimeError as e:
+            raise SystemExit(str(e))
+        for key, value in report.items():
+            print(f"{key:<18} {value:.3f}" if isinstance(value, float) else f"{key:<18} {value}")
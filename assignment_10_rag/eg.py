@@ -1,27 +1,49 @@
 import streamlit as st
 import os
 
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.vectorstores import Chroma
+from ingest import delete_resume, ingest_pdfs
+from ledger import Ledger
+from ranking import rank_resumes
+from resources import (
+    QUANT_MODE,
+    READ_ONLY_BACKENDS,
+    VECTOR_BACKEND,
+    get_dense_index,
+    get_embedding_model,
+    get_keyword_index,
+    get_near_dup_index,
+    get_vectorstore
+)
 
 # -------------------- FOLDERS --------------------
 RESUME_FOLDER = "resumes"
 DB_FOLDER = "chroma_db"
+PAGE_SIZE = 50     # catalog rows per page in List / Delete
 
 os.makedirs(RESUME_FOLDER, exist_ok=True)
 
 # -------------------- EMBEDDINGS --------------------
-embeddings = HuggingFaceEmbeddings(
-    model_name="sentence-transformers/all-MiniLM-L6-v2"
-)
+# loaded once per process in the background, not on every rerun
+embeddings = get_embedding_model("sentence-transformers/all-MiniLM-L6-v2")
 
 # -------------------- VECTOR STORE --------------------
-db = Chroma(
-    persist_directory=DB_FOLDER,
-    embedding_function=embeddings
-)
+db = get_vectorstore(DB_FOLDER, embeddings, VECTOR_BACKEND)
+keyword_index = get_keyword_index(DB_FOLDER, db)
+dense_index = get_dense_index(DB_FOLDER, db, QUANT_MODE)
+# must match main.py: both apps share the collapsed near-duplicate references
+near_dup = get_near_dup_index(DB_FOLDER, db, os.getenv("DEDUP_POLICY", "collapse"))
+
+# content hashes of what is already indexed, so re-uploads don't duplicate chunks
+ledger = Ledger("ledger.sqlite3")
+
+# -------------------- CATALOG PAGING --------------------
+def catalog_page(key):
+    # search box + page number, so every resume is reachable, not just the newest 50
+    search = st.text_input("Search", key=f"{key}_search")
+    total = ledger.count_resumes(search)
+    pages = max(1, -(-total // PAGE_SIZE))
+    page = st.number_input(f"Page (of {pages}, {total} resumes)", 1, pages, 1, key=f"{key}_page")
+    return ledger.list_resumes(search=search, limit=PAGE_SIZE, offset=(page - 1) * PAGE_SIZE)
 
 # -------------------- STREAMLIT UI --------------------
 st.title("AI Resume Shortlisting App (Beginner)")
@@ -34,7 +56,10 @@ menu = st.sidebar.selectbox(
 # -------------------- UPLOAD RESUME --------------------
 if menu == "Upload Resume":
     st.header("Upload Resumes (Multiple PDFs Allowed)")
-    
+
+    if VECTOR_BACKEND in READ_ONLY_BACKENDS:
+        st.error("This store is read-only (snapshot). Upload on the writable store.")
+        st.stop()
     files = st.file_uploader(
         "Upload Resume PDFs",
         type="pdf",
@@ -42,38 +67,35 @@ if menu == "Upload Resume":
     )
 
     if files:
+        batch = []
         for file in files:
             path = os.path.join(RESUME_FOLDER, file.name)
 
             with open(path, "wb") as f:
                 f.write(file.getbuffer())
+            batch.append((path, file.name))
 
-            loader = PyPDFLoader(path)
-            documents = loader.load()
-
-            splitter = RecursiveCharacterTextSplitter(
-                chunk_size=800,
-                chunk_overlap=100
-            )
-            chunks = splitter.split_documents(documents)
-
-            for c in chunks:
-                c.metadata["file_name"] = file.name
-
-            db.add_documents(chunks)
+        # parse in a process pool, embed in batches, one bulk write
+        stats = ingest_pdfs(batch, db, embeddings, ledger=ledger,
+                            keyword_index=keyword_index, dense_index=dense_index, near_dup=near_dup)
 
-        db.persist()
-        st.success("All resumes uploaded successfully!")
+        for name, err in stats["errors"].items():
+            st.error(f"{name}: {err}")
+        st.success(
+            f"{stats['files']} resumes uploaded successfully! "
+            f"({stats['pages_per_sec']:.1f} pages/s, {stats['chunks_per_sec']:.1f} chunks/s)"
+        )
 
 
 # -------------------- LIST RESUMES --------------------
 elif menu == "List Resumes":
     st.header("Uploaded Resumes")
 
-    files = os.listdir(RESUME_FOLDER)
+    # catalog table instead of os.listdir: instant, and only what is really indexed
+    files = catalog_page("list")
     if files:
         for f in files:
-            st.write("📄", f)
+            st.write("📄", f["file_name"], f"({f['pages'] or '?'} pages, {f['chunks']} chunks, {f['status']})")
     else:
         st.info("No resumes uploaded.")
 
@@ -81,14 +103,18 @@ elif menu == "List Resumes":
 elif menu == "Delete Resume":
     st.header("Delete Resume")
 
-    files = os.listdir(RESUME_FOLDER)
+    files = [f["file_name"] for f in catalog_page("delete")]
     selected = st.selectbox("Select Resume", files)
 
-    if st.button("Delete"):
-        db._collection.delete(where={"file_name": selected})
-        db.persist()
+    if VECTOR_BACKEND in READ_ONLY_BACKENDS:
+        st.error("This store is read-only (snapshot). Delete on the writable store.")
+    elif selected and st.button("Delete"):
+        # deletes by chunk id from the ledger's registry, no metadata scan
+        delete_resume(selected, db, ledger, keyword_index, dense_index, near_dup)
 
-        os.remove(os.path.join(RESUME_FOLDER, selected))
+        path = os.path.join(RESUME_FOLDER, selected)
+        if os.path.exists(path):
+            os.remove(path)
         st.success("Resume deleted successfully!")
 
 # -------------------- SHORTLIST RESUMES --------------------
@@ -99,13 +125,10 @@ elif menu == "Shortlist Resumes":
     top_k = st.number_input("Number of resumes", 1, 5, 3)
 
     if st.button("Search"):
-        results = db.similarity_search(job_desc, k=top_k)
+        # over-fetches chunks and scores per resume -> always top_k distinct resumes
+        results = rank_resumes(db, job_desc, k=int(top_k), near_dup=near_dup)
 
         st.subheader("Shortlisted Resumes")
-        shown = []
 
-        for doc in results:
-            name = doc.metadata["file_name"]
-            if name not in shown:
-                st.write("✅", name)
-                shown.append(name)
\ No newline at end of file
+        for r in results:
+            st.write("✅", r["file_name"], f"({r['score']:.3f})")
@@ -0,0 +1,151 @@
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from array import array
+
+from langchain_core.embeddings import Embeddings
+
+# -------------------- CONFIG --------------------
+CACHE_PATH = "embed_cache.sqlite3"
+MAX_ENTRIES = 200_000
+
+
+def normalize_text(text):
+    # headers / addresses differ only by spacing between resumes -> same key
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def cache_key(model_name, text, kind="doc"):
+    raw = f"{model_name}\0{kind}\0{normalize_text(text)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def embed_queries(embeddings, texts):
+    """
+    Many texts embedded as queries: one batched call when the model has
+    embed_queries, else embed_query per text (never embed_documents --
+    models with a query prompt embed the two sides differently).
+    """
+    texts = list(texts)
+    if not texts:
+        return []
+    if hasattr(embeddings, "embed_queries"):
+        return embeddings.embed_queries(texts)
+    return [embeddings.embed_query(t) for t in texts]
+
+
+# -------------------- CACHED EMBEDDINGS --------------------
+class CachedEmbeddings(Embeddings):
+    """
+    Drop-in wrapper around any langchain embeddings object.
+    Vectors live in SQLite keyed by (model name, normalized text hash),
+    least recently used rows are evicted above max_entries.
+    """
+
+    def __init__(self, embeddings, model_name, path=CACHE_PATH, max_entries=MAX_ENTRIES):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS vectors ("
+            " key TEXT PRIMARY KEY,"
+            " vector BLOB NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON vectors (last_used)")
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+
+    # ---------- store ----------
+    def _lookup(self, keys):
+        found = {}
+        now = time.time()
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                part = keys[i:i + 500]
+                marks = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM vectors WHERE key IN ({marks})", part
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+            if found:
+                self._conn.executemany(
+                    "UPDATE vectors SET last_used = ? WHERE key = ?",
+                    [(now, k) for k in found]
+                )
+                self._conn.commit()
+        return found
+
+    def _store(self, items):
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO vectors (key, vector, last_used) VALUES (?, ?, ?)",
+                [(k, array("f", v).tobytes(), now) for k, v in items]
+            )
+            self._count += len(items)
+            if self._count > self.max_entries:
+                self._count = self._conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+                extra = self._count - self.max_entries
+                if extra > 0:
+                    self._conn.execute(
+                        "DELETE FROM vectors WHERE key IN ("
+                        " SELECT key FROM vectors ORDER BY last_used LIMIT ?)",
+                        (extra,)
+                    )
+                    self._count -= extra
+            self._conn.commit()
+
+    def _embed(self, texts, kind):
+        keys = [cache_key(self.model_name, t, kind) for t in texts]
+        found = self._lookup(list(set(keys)))
+
+        # every distinct missing text is embedded exactly once, even if repeated in the batch
+        missing = {}
+        for k, t in zip(keys, texts):
+            if k not in found and k not in missing:
+                missing[k] = t
+
+        self.misses += len(missing)
+        self.hits += len(texts) - len(missing)
+
+        if missing:
+            miss_keys = list(missing)
+            if kind == "query":
+                new_vectors = embed_queries(self.embeddings, [missing[k] for k in miss_keys])
+            else:
+                new_vectors = self.embeddings.embed_documents([missing[k] for k in miss_keys])
+            new = list(zip(miss_keys, new_vectors))
+            self._store(new)
+            found.update(new)
+
+        return [list(found[k]) for k in keys]
+
+    # ---------- langchain interface ----------
+    def embed_documents(self, texts):
+        return self._embed(list(texts), "doc")
+
+    def embed_query(self, text):
+        return self._embed([text], "query")[0]
+
+    def embed_queries(self, texts):
+        return self._embed(list(texts), "query")
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": self._count,
+            "max_entries": self.max_entries
+        }
@@ -0,0 +1,276 @@
+import argparse
+import base64
+import json
+import os
+import queue
+import threading
+import time
+import urllib.request
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# -------------------- CONFIG --------------------
+HOST = "127.0.0.1"
+# not 1234: that is LM Studio's port; the demos read EMBED_SERVER_URL
+PORT = int(os.getenv("EMBED_SERVER_PORT", "8765"))
+SERVER_URL = f"http://{HOST}:{PORT}/v1"
+MAX_BATCH = 64                # texts per forward pass
+MAX_WAIT_MS = 10              # how long the first request waits for company
+# id the default model (resources.EMBED_MODEL) is served under; requests for any other model are refused
+SERVED_MODEL = os.getenv("EMBED_SERVER_MODEL", "text-embedding-all-minilm-l6-v2-embedding")
+
+
+# -------------------- DYNAMIC BATCHER --------------------
+class DynamicBatcher:
+    """
+    Coalesces concurrent embed calls into one model call.
+    The first waiting request opens a window of max_wait_ms; everything that
+    arrives before it closes (up to max_batch texts) is embedded together.
+    """
+
+    def __init__(self, embed_fn, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS):
+        self.embed_fn = embed_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.batches = 0
+        self.texts = 0
+        self._thread = threading.Thread(target=self._loop, daemon=True, name="embed-batcher")
+        self._thread.start()
+
+    def embed(self, texts):
+        fut = Future()
+        self._queue.put((list(texts), fut))
+        return fut.result()
+
+    def _loop(self):
+        while True:
+            pending = [self._queue.get()]
+            size = len(pending[0][0])
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=left)
+                except queue.Empty:
+                    break
+                pending.append(item)
+                size += len(item[0])
+            self._run(pending)
+
+    def _run(self, pending):
+        texts = [t for item, _ in pending for t in item]
+        try:
+            vectors = []
+            for i in range(0, len(texts), self.max_batch):
+                vectors.extend(self.embed_fn(texts[i:i + self.max_batch]))
+        except Exception as e:
+            for _, fut in pending:
+                fut.set_exception(e)
+            return
+        start = 0
+        for item, fut in pending:
+            fut.set_result(vectors[start:start + len(item)])
+            start += len(item)
+        with self._lock:
+            self.requests += len(pending)
+            self.batches += 1
+            self.texts += len(texts)
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "texts": self.texts,
+            "avg_batch": self.texts / self.batches if self.batches else 0.0,
+            "requests_per_batch": self.requests / self.batches if self.batches else 0.0
+        }
+
+
+# -------------------- HTTP (OpenAI-compatible) --------------------
+def make_handler(batcher, served_model=SERVED_MODEL):
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, status, body):
+            raw = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(raw)))
+            self.end_headers()
+            self.wfile.write(raw)
+
+        def _error(self, status, message, code=None):
+            self._send(status, {"error": {"message": message, "type": "invalid_request_error", "code": code}})
+
+        def do_GET(self):
+            path = self.path.rstrip("/")
+            if path == "/v1/models":
+                self._send(200, {"object": "list", "data": [
+                    {"id": served_model, "object": "model", "owned_by": "local"}
+                ]})
+            elif path == "/v1/stats":
+                self._send(200, batcher.stats())
+            else:
+                self._error(404, f"unknown path {self.path}")
+
+        def do_POST(self):
+            if self.path.rstrip("/") != "/v1/embeddings":
+                return self._error(404, f"unknown path {self.path}")
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            except ValueError:
+                return self._error(400, "body is not valid JSON")
+
+            texts = body.get("input")
+            if isinstance(texts, str):
+                texts = [texts]
+            if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+                # token-id inputs only come from tiktoken length checks -> need check_embedding_ctx_length=False
+                return self._error(400, "input must be a string or a list of strings")
+            model = body.get("model", served_model)
+            if model != served_model:
+                # vectors from another model would silently mix with the caller's index
+                return self._error(400, f"model {model!r} is not served here, only {served_model!r}",
+                                   "model_not_found")
+
+            vectors = batcher.embed(texts) if texts else []
+            as_base64 = body.get("encoding_format") == "base64"
+            data = []
+            for i, v in enumerate(vectors):
+                if as_base64:
+                    v = base64.b64encode(np.asarray(v, dtype="<f4").tobytes()).decode("ascii")
+                data.append({"object": "embedding", "index": i, "embedding": v})
+            n_tokens = sum(len(t.split()) for t in texts)
+            self._send(200, {
+                "object": "list",
+                "data": data,
+                "model": served_model,
+                "usage": {"prompt_tokens": n_tokens, "total_tokens": n_tokens}
+            })
+
+        def log_message(self, fmt, *args):
+            pass
+
+    return Handler
+
+
+def serve(embedding_model, host=HOST, port=PORT, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS,
+          served_model=SERVED_MODEL):
+    batcher = DynamicBatcher(embedding_model.embed_documents, max_batch, max_wait_ms)
+    server = ThreadingHTTPServer((host, port), make_handler(batcher, served_model))
+    server.daemon_threads = True
+    return server, batcher
+
+
+# -------------------- CLIENT --------------------
+class RemoteEmbeddings(Embeddings):
+    """Minimal /v1/embeddings client, so apps share the server's single model copy."""
+
+    def __init__(self, base_url=SERVER_URL, model=SERVED_MODEL, timeout=60):
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.timeout = timeout
+
+    def _post(self, texts):
+        req = urllib.request.Request(
+            f"{self.base_url}/embeddings",
+            data=json.dumps({"input": texts, "model": self.model}).encode("utf-8"),
+            headers={"Content-Type": "application/json"}
+        )
+        with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+            data = json.loads(resp.read())["data"]
+        return [d["embedding"] for d in sorted(data, key=lambda d: d["index"])]
+
+    def embed_documents(self, texts):
+        texts = list(texts)
+        return self._post(texts) if texts else []
+
+    def embed_query(self, text):
+        return self._post([text])[0]
+
+    def embed_queries(self, texts):
+        texts = list(texts)
+        return self._post(texts) if texts else []
+
+
+# -------------------- MODEL --------------------
+def local_model(model_name, backend="torch"):
+    """
+    The model the server runs in-process: torch (sentence-transformers) or onnx.
+    Built here rather than through resources.get_embedding_model, whose
+    EMBED_BACKEND=remote would point the server at itself.
+    """
+    if backend == "onnx":
+        from onnx_embeddings import OnnxEmbeddings
+
+        return OnnxEmbeddings(model_name)
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+
+    return HuggingFaceEmbeddings(model_name=model_name)
+
+
+# -------------------- LOAD TEST --------------------
+def load_test(base_url, clients=16, requests_per_client=20, texts_per_request=4, model=SERVED_MODEL):
+    """Concurrent clients hammering the server; returns texts/s."""
+    client = RemoteEmbeddings(base_url, model)
+    text = "Senior data engineer with Python, Spark and AWS experience"
+
+    def worker():
+        for _ in range(requests_per_client):
+            client.embed_documents([text] * texts_per_request)
+
+    threads = [threading.Thread(target=worker) for _ in range(clients)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    seconds = time.perf_counter() - t0
+    return clients * requests_per_client * texts_per_request / seconds
+
+
+# -------------------- CLI --------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible embedding server")
+    parser.add_argument("command", choices=["serve", "loadtest"], nargs="?", default="serve")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--model", default=None, help="sentence-transformers model to load")
+    parser.add_argument("--backend", choices=["torch", "onnx"],
+                        default="onnx" if os.getenv("EMBED_BACKEND") == "onnx" else "torch",
+                        help="local inference backend (EMBED_BACKEND=remote is ignored here)")
+    parser.add_argument("--served-model", default=None,
+                        help=f"model id clients must ask for (default {SERVED_MODEL}, or --model if given)")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS)
+    parser.add_argument("--clients", type=int, default=16)
+    args = parser.parse_args()
+
+    if args.command == "loadtest":
+        rate = load_test(f"http://{args.host}:{args.port}/v1", clients=args.clients,
+                         model=args.served_model or args.model or SERVED_MODEL)
+        print(f"{rate:.1f} texts/s with {args.clients} concurrent clients")
+    else:
+        from resources import EMBED_MODEL
+
+        served_model = args.served_model or (args.model if args.model else SERVED_MODEL)
+        model = local_model(args.model or EMBED_MODEL, args.backend)
+        model.embed_query("warmup")     # load the single shared copy before accepting requests
+        server, batcher = serve(model, args.host, args.port, args.max_batch, args.max_wait_ms, served_model)
+        print(f"Serving {served_model} on http://{args.host}:{args.port}/v1/embeddings")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            print(batcher.stats())
@@ -0,0 +1,418 @@
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+
+import numpy as np
+from langchain_core.documents import Document
+
+# -------------------- CONFIG --------------------
+FLAT_DIR = "flat_store"
+BLOCK_ROWS = 65536      # rows scored per matrix-vector product
+VECTORS_FILE = "vectors.f32"
+ROWS_FILE = "rows.sqlite3"
+
+
+def normalize(x):
+    x = np.asarray(x, dtype=np.float32)
+    return x / np.maximum(np.linalg.norm(x, axis=-1, keepdims=True), 1e-12)
+
+
+# -------------------- COLLECTION --------------------
+class FlatCollection:
+    """
+    Exact brute-force replacement for the parts of a Chroma collection this
+    app uses (count / get / upsert / update / delete / query).
+    Normalized float32 vectors are appended to a memory-mapped file; ids,
+    documents and metadata are rows in SQLite, committed with every write.
+    The committed row count is authoritative: vector rows past it (a crash
+    between the two writes) are cut off before the next append. Writes take
+    SQLite's write lock and first pick up rows other processes committed.
+    Deleted rows are tombstoned until compact() rewrites the file with live rows only.
+    """
+
+    # distances are squared L2 on unit vectors, same as Chroma's default space
+    metadata = {"hnsw:space": "l2"}
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.RLock()
+        self._compacting = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(path, ROWS_FILE), timeout=30,
+                                     isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS rows ("
+            " row INTEGER PRIMARY KEY,"
+            " chunk_id TEXT NOT NULL,"
+            " document TEXT,"
+            " metadata TEXT,"
+            " alive INTEGER NOT NULL,"
+            " version INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_rows_version ON rows (version)")
+        self._reset()
+        self._sync()
+
+    def _reset(self):
+        self.dim = None
+        self.ids = []
+        self.documents = []
+        self.columns = {}              # metadata key -> list of values (None = missing)
+        self.alive = np.zeros(0, dtype=bool)
+        self.row_of = {}
+        self.version = 0
+        self.generation = None         # changes when compact() renumbers the rows
+        self.vectors_path = os.path.join(self.path, VECTORS_FILE)
+        self._mm = None
+
+    # ---------- storage ----------
+    def _vectors(self):
+        if not self.ids:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        if self._mm is None or len(self._mm) != len(self.ids):
+            self._mm = np.memmap(self.vectors_path, dtype=np.float32, mode="r",
+                                 shape=(len(self.ids), self.dim))
+        return self._mm
+
+    def _meta(self, row):
+        return {k: col[row] for k, col in self.columns.items() if col[row] is not None}
+
+    def _rows(self, ids=None, where=None):
+        if ids is not None:
+            rows = [self.row_of[c] for c in ids if c in self.row_of]
+        else:
+            rows = sorted(self.row_of.values())
+        if where:
+            rows = [r for r in rows if all(self.columns.get(k, [None] * len(self.ids))[r] == v
+                                           for k, v in where.items())]
+        return rows
+
+    def _sync(self):
+        """Apply rows committed since this process last looked (by anyone)."""
+        with self._lock:
+            meta = dict(self._conn.execute("SELECT key, value FROM meta"))
+            version = int(meta.get("version", 0))
+            if version == self.version and meta.get("generation") == self.generation:
+                return
+            if meta.get("generation") != self.generation:
+                self._reset()
+                self.generation = meta.get("generation")
+            if meta.get("dim"):
+                self.dim = int(meta["dim"])
+            self.vectors_path = os.path.join(self.path, meta.get("vectors_file", VECTORS_FILE))
+            self._apply([
+                (row, cid, doc, json.loads(md or "{}"), bool(alive))
+                for row, cid, doc, md, alive in self._conn.execute(
+                    "SELECT row, chunk_id, document, metadata, alive FROM rows "
+                    "WHERE version > ? ORDER BY row", (self.version,))
+            ])
+            self.version = version
+
+    def _apply(self, records):
+        """records: (row, id, document, metadata, alive), rows ascending; new rows are contiguous."""
+        start = len(self.ids)
+        for row, cid, doc, meta, alive in records:
+            if row >= start:
+                continue
+            self.documents[row] = doc
+            for key in meta.keys() - self.columns.keys():
+                self.columns[key] = [None] * len(self.ids)
+            for key, col in self.columns.items():
+                col[row] = meta.get(key)
+            if alive:
+                self.row_of[cid] = row
+            elif self.row_of.get(cid) == row:
+                del self.row_of[cid]
+            self.alive[row] = alive
+        new = [r for r in records if r[0] >= start]
+        if not new:
+            return
+        self.ids.extend(r[1] for r in new)
+        self.documents.extend(r[2] for r in new)
+        for key in {k for r in new for k in r[3]} - self.columns.keys():
+            self.columns[key] = [None] * start
+        for key, col in self.columns.items():
+            col.extend(r[3].get(key) for r in new)
+        self.alive = np.concatenate([self.alive, np.fromiter((r[4] for r in new), dtype=bool, count=len(new))])
+        for row, cid, _, _, alive in new:
+            if alive:
+                self.row_of[cid] = row
+
+    @contextmanager
+    def _write(self):
+        """One SQLite write transaction (serializes writers across processes); yields its version."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._sync()
+                version = self.version + 1
+                yield version
+                self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('version', ?)",
+                                   (str(version),))
+                self._conn.execute("COMMIT")
+                self.version = version
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                self._reset()           # in-memory state may be half applied -> reload
+                self._sync()
+                raise
+
+    def _insert(self, records, version):
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO rows (row, chunk_id, document, metadata, alive, version) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [(row, cid, doc, json.dumps(meta), int(alive), version) for row, cid, doc, meta, alive in records]
+        )
+
+    def _append_vectors(self, x, start):
+        offset = start * self.dim * 4
+        if not os.path.exists(self.vectors_path):
+            open(self.vectors_path, "wb").close()
+        with open(self.vectors_path, "r+b") as f:
+            if os.path.getsize(self.vectors_path) > offset:
+                f.truncate(offset)      # rows of a write that never committed
+            f.seek(offset)
+            f.write(x.tobytes())
+
+    def save(self):
+        # every write is committed as it happens; kept for the persist() surface
+        pass
+
+    # ---------- compaction ----------
+    def tombstones(self):
+        """(deleted rows still on disk, total rows)"""
+        with self._lock:
+            self._sync()
+            return len(self.ids) - len(self.row_of), len(self.ids)
+
+    def compact(self):
+        """
+        Rewrite the vectors with live rows only, online: rows are copied to a new
+        file without the lock, rows appended meanwhile are added under the lock,
+        and renumbering the rows in the same transaction as naming the new
+        file is the atomic swap. Returns (rows before, rows after).
+        """
+        with self._compacting:
+            with self._lock:
+                self._sync()
+                n = len(self.ids)
+                rows = np.flatnonzero(self.alive[:n])
+                vectors = self._vectors()
+                generation = self.generation
+                old_path = self.vectors_path
+            new_path = os.path.join(self.path, f"vectors-{uuid.uuid4().hex[:8]}.f32")
+            with open(new_path, "wb") as f:
+                for i in range(0, len(rows), BLOCK_ROWS):
+                    f.write(np.asarray(vectors[rows[i:i + BLOCK_ROWS]]).tobytes())
+
+            with self._write() as version:
+                if self.generation != generation:
+                    # another process compacted meanwhile
+                    os.remove(new_path)
+                    return n, len(self.ids)
+                tail = np.flatnonzero(self.alive[n:]) + n
+                if len(tail):
+                    with open(new_path, "ab") as f:
+                        f.write(np.asarray(self._vectors()[tail]).tobytes())
+                # rows deleted during the copy stay as tombstones of the new file
+                keep = np.concatenate([rows, tail]).astype(np.int64)
+                self.ids = [self.ids[r] for r in keep]
+                self.documents = [self.documents[r] for r in keep]
+                self.columns = {k: [col[r] for r in keep] for k, col in self.columns.items()}
+                self.alive = self.alive[keep]
+                self.row_of = {cid: i for i, cid in enumerate(self.ids) if self.alive[i]}
+                self.vectors_path = new_path
+                self.generation = uuid.uuid4().hex
+                self._mm = None
+                self._conn.execute("DELETE FROM rows")
+                self._insert([(i, cid, self.documents[i], self._meta(i), bool(self.alive[i]))
+                              for i, cid in enumerate(self.ids)], version)
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                    [("vectors_file", os.path.basename(new_path)), ("generation", self.generation)]
+                )
+            try:
+                os.remove(old_path)
+            except OSError:
+                pass        # still mapped (Windows) or never written
+            return n, len(self.ids)
+
+    # ---------- chroma-style API ----------
+    def count(self):
+        with self._lock:
+            self._sync()
+            return len(self.row_of)
+
+    def upsert(self, ids, embeddings, documents=None, metadatas=None):
+        x = normalize(embeddings).reshape(len(ids), -1)
+        documents = documents or [None] * len(ids)
+        metadatas = [m or {} for m in (metadatas or [{}] * len(ids))]
+        with self._write() as version:
+            if self.dim is None:
+                self.dim = x.shape[1]
+                self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('dim', ?)", (str(self.dim),))
+            dead = sorted({self.row_of[c] for c in ids if c in self.row_of})
+            for row in dead:
+                self.alive[row] = False
+                del self.row_of[self.ids[row]]
+            self._conn.executemany("UPDATE rows SET alive = 0, version = ? WHERE row = ?",
+                                   [(version, row) for row in dead])
+
+            start = len(self.ids)
+            self._append_vectors(x, start)
+            records = [(start + i, cid, doc, meta, True)
+                       for i, (cid, doc, meta) in enumerate(zip(ids, documents, metadatas))]
+            self._insert(records, version)
+            self._apply(records)
+
+    add = upsert
+
+    def update(self, ids, metadatas=None, documents=None, embeddings=None):
+        if embeddings is not None:
+            with self._lock:
+                self._sync()
+                rows = [self.row_of[c] for c in ids]
+                documents = documents or [self.documents[r] for r in rows]
+                metadatas = metadatas or [self._meta(r) for r in rows]
+                self.upsert(ids, embeddings, documents, metadatas)
+            return
+        with self._write() as version:
+            records = []
+            for i, cid in enumerate(ids):
+                row = self.row_of.get(cid)
+                if row is None:
+                    continue
+                records.append((
+                    row, cid,
+                    documents[i] if documents is not None else self.documents[row],
+                    (metadatas[i] or {}) if metadatas is not None else self._meta(row),
+                    True
+                ))
+            self._insert(records, version)
+            self._apply(records)
+
+    def delete(self, ids=None, where=None):
+        with self._write() as version:
+            rows = self._rows(ids, where)
+            for row in rows:
+                self.alive[row] = False
+                del self.row_of[self.ids[row]]
+            self._conn.executemany("UPDATE rows SET alive = 0, version = ? WHERE row = ?",
+                                   [(version, row) for row in rows])
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=("documents", "metadatas")):
+        with self._lock:
+            self._sync()
+            rows = self._rows(ids, where)
+            offset = offset or 0
+            rows = rows[offset:offset + limit] if limit is not None else rows[offset:]
+            out = {"ids": [self.ids[r] for r in rows]}
+            if "documents" in include:
+                out["documents"] = [self.documents[r] for r in rows]
+            if "metadatas" in include:
+                out["metadatas"] = [self._meta(r) for r in rows]
+            if "embeddings" in include:
+                out["embeddings"] = np.asarray(self._vectors()[rows]) if rows else []
+            return out
+
+    def top_k(self, q, n, where=None):
+        """Blocked exact search: (rows, cosine scores), best first."""
+        with self._lock:
+            self._sync()
+            vectors = self._vectors()
+            alive = self.alive
+            if where:
+                alive = np.zeros(len(self.ids), dtype=bool)
+                alive[self._rows(where=where)] = True
+            n = min(n, int(alive.sum()))
+            if n == 0:
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+            q = normalize(q)
+            cand_rows = []
+            cand_scores = []
+            for i in range(0, len(vectors), BLOCK_ROWS):
+                scores = np.asarray(vectors[i:i + BLOCK_ROWS]) @ q
+                scores[~alive[i:i + BLOCK_ROWS]] = -np.inf
+                m = min(n, len(scores))
+                part = np.argpartition(-scores, m - 1)[:m]
+                cand_rows.append(part + i)
+                cand_scores.append(scores[part])
+
+            rows = np.concatenate(cand_rows)
+            scores = np.concatenate(cand_scores)
+            best = np.argpartition(-scores, n - 1)[:n]
+            best = best[np.argsort(-scores[best])]
+            return rows[best], scores[best]
+
+    def query(self, query_embeddings, n_results=10, where=None,
+              include=("documents", "metadatas", "distances")):
+        out = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        with self._lock:        # rows stay valid until they are resolved to ids
+            for q in query_embeddings:
+                rows, scores = self.top_k(q, n_results, where)
+                out["ids"].append([self.ids[r] for r in rows])
+                out["distances"].append((2.0 - 2.0 * scores).tolist())
+                out["documents"].append([self.documents[r] for r in rows])
+                out["metadatas"].append([self._meta(r) for r in rows])
+        return {k: v for k, v in out.items() if k == "ids" or k in include}
+
+
+# -------------------- VECTOR STORE --------------------
+class FlatVectorStore:
+    """Same add / delete / similarity_search / persist surface as langchain's Chroma."""
+
+    def __init__(self, persist_directory, embedding_function):
+        self._persist_directory = persist_directory
+        self._embedding_function = embedding_function
+        self._collection = FlatCollection(persist_directory)
+
+    @property
+    def embeddings(self):
+        return self._embedding_function
+
+    def add_texts(self, texts, metadatas=None, ids=None):
+        texts = list(texts)
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        vectors = self._embedding_function.embed_documents(texts)
+        self._collection.upsert(ids=ids, embeddings=vectors, documents=texts, metadatas=metadatas)
+        return ids
+
+    def add_documents(self, documents, ids=None):
+        return self.add_texts(
+            [d.page_content for d in documents],
+            [d.metadata for d in documents],
+            ids
+        )
+
+    def delete(self, ids=None):
+        self._collection.delete(ids=ids)
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=None):
+        return self._collection.get(ids, where, limit, offset, include or ("documents", "metadatas"))
+
+    def similarity_search_by_vector_with_score(self, embedding, k=4, filter=None):
+        res = self._collection.query([embedding], n_results=k, where=filter)
+        return [
+            (Document(page_content=doc or "", metadata=meta), dist)
+            for doc, meta, dist in zip(res["documents"][0], res["metadatas"][0], res["distances"][0])
+        ]
+
+    def similarity_search_with_score(self, query, k=4, filter=None):
+        return self.similarity_search_by_vector_with_score(
+            self._embedding_function.embed_query(query), k, filter
+        )
+
+    def similarity_search_by_vector(self, embedding, k=4, filter=None):
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k, filter)]
+
+    def similarity_search(self, query, k=4, filter=None):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def persist(self):
+        self._collection.save()
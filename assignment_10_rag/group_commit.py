@@ -0,0 +1,238 @@
+import atexit
+import logging
+import threading
+import time
+
+# -------------------- CONFIG --------------------
+MAX_OPS = 2000                  # buffered ids before a commit
+MAX_BYTES = 32 * 1024 * 1024    # approx. buffered vector + text bytes before a commit
+INTERVAL_SECONDS = 2.0          # oldest buffered write waits at most this long
+MAX_FAILED = 20                 # quarantined groups kept for inspection
+
+log = logging.getLogger(__name__)
+
+
+# -------------------- BUFFERED COLLECTION --------------------
+class BufferedCollection:
+    """
+    Collects upsert / update / delete calls and applies them to the real
+    collection in groups, followed by a single persist().
+    Writes to the same id are coalesced; any read flushes first, so readers
+    always see their own writes.
+    A group that fails to commit is quarantined (its ids go to .failed, its
+    after-commit callbacks never run) instead of failing every later read.
+    Callbacks run in commit order.
+    """
+
+    def __init__(self, store, max_ops=MAX_OPS, max_bytes=MAX_BYTES, interval=INTERVAL_SECONDS):
+        self._store = store
+        self._collection = store._collection
+        # exposed so callers can size their own batches without forcing a flush
+        self._client = getattr(self._collection, "_client", None)
+        self.max_ops = max_ops
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self._lock = threading.RLock()
+        # taken before _lock is released -> callbacks of consecutive commits never interleave
+        self._callback_lock = threading.RLock()
+        self._upserts = {}          # id -> (vector, document, metadata)
+        self._updates = {}          # id -> metadata
+        self._deletes = set()
+        self._callbacks = []        # run after the group is durable
+        self._bytes = 0
+        self._first_write = None
+        self.failed = []            # quarantined groups: error, time and ids
+        self.stats = {"commits": 0, "ops": 0, "commit_seconds": 0.0, "failed": 0}
+
+    # ---------- writes ----------
+    def upsert(self, ids, embeddings, documents=None, metadatas=None):
+        documents = documents or [None] * len(ids)
+        metadatas = metadatas or [None] * len(ids)
+        with self._lock:
+            for cid, vec, doc, meta in zip(ids, embeddings, documents, metadatas):
+                self._deletes.discard(cid)
+                self._updates.pop(cid, None)
+                self._upserts[cid] = (vec, doc, meta)
+                self._bytes += len(vec) * 4 + len(doc or "")
+            self._touched()
+
+    add = upsert
+
+    def update(self, ids, metadatas=None, documents=None, embeddings=None):
+        if documents is not None or embeddings is not None:
+            self.flush()
+            self._collection.update(ids=ids, metadatas=metadatas, documents=documents,
+                                    embeddings=embeddings)
+            return
+        with self._lock:
+            for cid, meta in zip(ids, metadatas):
+                if cid in self._upserts:
+                    vec, doc, _ = self._upserts[cid]
+                    self._upserts[cid] = (vec, doc, meta)
+                else:
+                    self._updates[cid] = meta
+            self._touched()
+
+    def delete(self, ids=None, where=None):
+        if where is not None:
+            # filters can't be coalesced -> apply in order with everything before it
+            self.flush()
+            self._collection.delete(ids=ids, where=where)
+            return
+        with self._lock:
+            for cid in ids:
+                self._upserts.pop(cid, None)
+                self._updates.pop(cid, None)
+                self._deletes.add(cid)
+            self._touched()
+
+    def after_commit(self, callback):
+        """Run callback once everything buffered so far is committed."""
+        with self._lock:
+            if self._pending() or self._callbacks:
+                self._callbacks.append(callback)
+                return
+            self._callback_lock.acquire()
+        try:
+            callback()
+        finally:
+            self._callback_lock.release()
+
+    def _pending(self):
+        return len(self._upserts) + len(self._updates) + len(self._deletes)
+
+    def _touched(self):
+        if self._first_write is None:
+            self._first_write = time.monotonic()
+        if self._pending() >= self.max_ops or self._bytes >= self.max_bytes:
+            self.flush()
+
+    def due(self):
+        with self._lock:
+            return self._first_write is not None and time.monotonic() - self._first_write >= self.interval
+
+    # ---------- commit ----------
+    def _clear(self):
+        self._upserts = {}
+        self._updates = {}
+        self._deletes = set()
+        self._callbacks = []
+        self._bytes = 0
+        self._first_write = None
+
+    def _apply(self):
+        step = self._client.get_max_batch_size() if self._client is not None else 5000
+        deletes = list(self._deletes)
+        for i in range(0, len(deletes), step):
+            self._collection.delete(ids=deletes[i:i + step])
+
+        ids = list(self._upserts)
+        for i in range(0, len(ids), step):
+            part = ids[i:i + step]
+            self._collection.upsert(
+                ids=part,
+                embeddings=[self._upserts[c][0] for c in part],
+                documents=[self._upserts[c][1] for c in part],
+                metadatas=[self._upserts[c][2] for c in part]
+            )
+
+        ids = list(self._updates)
+        for i in range(0, len(ids), step):
+            part = ids[i:i + step]
+            self._collection.update(ids=part, metadatas=[self._updates[c] for c in part])
+
+        self._store.persist()
+
+    def flush(self):
+        with self._lock:
+            if self._pending() == 0 and not self._callbacks:
+                return
+            t0 = time.perf_counter()
+            ops = self._pending()
+            try:
+                self._apply()
+            except Exception as e:
+                # retrying the same group would fail the same way on every read -> quarantine it;
+                # its sidecar / ledger updates are dropped, reconcile repairs what got half-written
+                self.failed.append({
+                    "error": f"{type(e).__name__}: {e}",
+                    "at": time.time(),
+                    "upserts": list(self._upserts),
+                    "updates": list(self._updates),
+                    "deletes": sorted(self._deletes)
+                })
+                del self.failed[:-MAX_FAILED]
+                self.stats["failed"] += 1
+                self._clear()
+                raise
+
+            callbacks = self._callbacks
+            self._clear()
+            self.stats["commits"] += 1
+            self.stats["ops"] += ops
+            self.stats["commit_seconds"] += time.perf_counter() - t0
+            self._callback_lock.acquire()
+
+        # sidecar indexes / ledger only move forward once the vectors are durable
+        try:
+            for callback in callbacks:
+                callback()
+        finally:
+            self._callback_lock.release()
+
+    # ---------- reads ----------
+    def __getattr__(self, name):
+        # count / get / query / metadata ... -> see buffered writes first
+        if name.startswith("__"):
+            raise AttributeError(name)
+        self.flush()
+        return getattr(self._collection, name)
+
+
+# -------------------- STORE WRAPPER --------------------
+class GroupCommitStore:
+    """
+    Wraps a vector store so that writes through ._collection are group-committed.
+    persist() is a no-op (commits happen by count, size or time);
+    flush() commits now and runs automatically at interpreter exit.
+    """
+
+    def __init__(self, store, max_ops=MAX_OPS, max_bytes=MAX_BYTES, interval=INTERVAL_SECONDS):
+        self._store = store
+        self._collection = BufferedCollection(store, max_ops, max_bytes, interval)
+        self._stop = threading.Event()
+        self._timer = threading.Thread(target=self._tick, daemon=True, name="group-commit")
+        self._timer.start()
+        atexit.register(self.close)
+
+    def _tick(self):
+        while not self._stop.wait(min(0.25, self._collection.interval)):
+            if self._collection.due():
+                try:
+                    self._collection.flush()
+                except Exception:
+                    # the group is quarantined; keep committing the ones after it
+                    log.exception("group commit failed")
+
+    def persist(self):
+        pass
+
+    def flush(self):
+        self._collection.flush()
+
+    def after_commit(self, callback):
+        self._collection.after_commit(callback)
+
+    def close(self):
+        self._stop.set()
+        self._collection.flush()
+
+    def commit_stats(self):
+        return dict(self._collection.stats)
+
+    def __getattr__(self, name):
+        # similarity_search, embeddings, get ... read through the real store
+        if name.startswith("__"):
+            raise AttributeError(name)
+        self._collection.flush()
+        return getattr(self._store, name)
@@ -0,0 +1,673 @@
+import gc
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from ledger import chunk_hash, chunk_id, file_hash
+from near_dup import dedup_stats
+from pdf_text import TEXT_CACHE_PATH, iter_documents, load_documents, page_count
+from token_splitter import CHUNK_OVERLAP_TOKENS, CHUNK_TOKENS, TokenSplitter
+
+# -------------------- CONFIG --------------------
+# "tokens": chunks sized in the embedding model's word-pieces (nothing past its 256 limit)
+# "chars" : the original 800-character splitter
+SPLITTER = os.getenv("SPLITTER", "tokens")
+CHUNK_SIZE = 800
+CHUNK_OVERLAP = 100
+EMBED_BATCH_SIZE = 64
+# longer PDFs are streamed page by page; pages (text, chunks, vectors) are what
+# costs memory -- file size is mostly images and fonts
+STREAM_MIN_PAGES = 200
+STREAM_BATCH_SIZE = 32                # chunks per embed + write micro-batch
+MAX_EXTRA_RSS_MB = 256                # memory the streaming path may add on top of the baseline
+
+
+# -------------------- STAGE 1: PARSE + CHUNK --------------------
+def make_splitter(kind=None):
+    if (kind or SPLITTER) == "tokens":
+        return TokenSplitter(chunk_tokens=CHUNK_TOKENS, chunk_overlap=CHUNK_OVERLAP_TOKENS)
+    return RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP
+    )
+
+
+def parse_and_split(pdf_path, file_name, splitter_kind=None):
+    """
+    Load one PDF (page text cached by content hash) and split it into chunks.
+    Runs inside a worker process, so only plain lists/dicts are returned.
+    """
+    pages = load_documents(pdf_path)
+
+    chunks = make_splitter(splitter_kind).split_documents(pages)
+
+    texts = []
+    metadatas = []
+    for c in chunks:
+        meta = dict(c.metadata)
+        meta["file_name"] = file_name
+        texts.append(c.page_content)
+        metadatas.append(meta)
+
+    return {
+        "file_name": file_name,
+        "pages": len(pages),
+        "texts": texts,
+        "metadatas": metadatas
+    }
+
+
+def parse_files(files, max_workers=None):
+    """
+    files: list of (pdf_path, file_name)
+    returns (parsed, errors) -- one bad PDF never stops the others
+    """
+    parsed = []
+    errors = {}
+
+    if not files:
+        return parsed, errors
+
+    # a pool is not worth starting for a single file
+    if len(files) == 1:
+        path, name = files[0]
+        try:
+            parsed.append(parse_and_split(path, name))
+        except Exception as e:
+            errors[name] = str(e)
+        return parsed, errors
+
+    workers = max_workers or min(len(files), os.cpu_count() or 1)
+    # spawn, not fork: a forked child inherits the parent's torch / tokenizer threads and locks
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = {
+            pool.submit(parse_and_split, path, name): name
+            for path, name in files
+        }
+        for fut in as_completed(futures):
+            name = futures[fut]
+            try:
+                parsed.append(fut.result())
+            except Exception as e:
+                errors[name] = str(e)
+
+    return parsed, errors
+
+
+# -------------------- STAGE 2: EMBED --------------------
+def embed_in_batches(embedding_model, texts, batch_size=EMBED_BATCH_SIZE):
+    vectors = []
+    for i in range(0, len(texts), batch_size):
+        vectors.extend(embedding_model.embed_documents(texts[i:i + batch_size]))
+    return vectors
+
+
+# -------------------- STAGE 3: BULK WRITE --------------------
+def _max_batch(collection, n):
+    # chroma rejects a single call above its max batch size
+    client = getattr(collection, "_client", None)
+    if client is not None and hasattr(client, "get_max_batch_size"):
+        return client.get_max_batch_size()
+    return n or 1
+
+
+def bulk_write(vectorstore, ids, texts, vectors, metadatas,
+               delete_ids=(), update_ids=(), update_metadatas=()):
+    collection = vectorstore._collection
+    step = _max_batch(collection, max(len(ids), len(update_ids), len(delete_ids)))
+
+    for i in range(0, len(ids), step):
+        collection.upsert(
+            ids=ids[i:i + step],
+            embeddings=vectors[i:i + step],
+            documents=texts[i:i + step],
+            metadatas=metadatas[i:i + step]
+        )
+    # unchanged chunks keep their vector, only page numbers etc. may have moved
+    for i in range(0, len(update_ids), step):
+        collection.update(
+            ids=update_ids[i:i + step],
+            metadatas=update_metadatas[i:i + step]
+        )
+    for i in range(0, len(delete_ids), step):
+        collection.delete(ids=delete_ids[i:i + step])
+    vectorstore.persist()
+
+
+def after_commit(vectorstore, callback):
+    """
+    Run callback once the writes issued so far are durable.
+    A group-committed store defers it to its next commit, any other store runs it now.
+    """
+    if hasattr(type(vectorstore), "after_commit"):
+        vectorstore.after_commit(callback)
+    else:
+        callback()
+
+
+def write_batch(vectorstore, ids, texts, vectors, metadatas, delete_ids=(),
+                keep_ids=(), keep_metadatas=(), keyword_index=None, dense_index=None,
+                near_dup=None):
+    """
+    Vector store first, then the sidecar indexes, all with the same ids.
+    Deleted chunks that other resumes reference as near-duplicates hand their
+    vector over to one of them first.
+    """
+    moves = {}
+    if near_dup is not None and delete_ids:
+        heirs, moves = near_dup.release(vectorstore, delete_ids)
+        if heirs[0]:
+            ids, texts, vectors, metadatas = (
+                list(a) + list(b) for a, b in zip((ids, texts, vectors, metadatas), heirs)
+            )
+    if ids or keep_ids or delete_ids:
+        bulk_write(vectorstore, ids, texts, vectors, metadatas,
+                   delete_ids, keep_ids, keep_metadatas)
+
+    def update_sidecars():
+        if keyword_index is not None:
+            if delete_ids:
+                keyword_index.delete(delete_ids)
+            if ids:
+                keyword_index.add(ids, texts, metadatas)
+        if dense_index is not None:
+            if delete_ids:
+                dense_index.delete(delete_ids)
+            if ids:
+                dense_index.add(ids, vectors, metadatas)
+        if near_dup is not None and delete_ids:
+            near_dup.forget(delete_ids, moves)
+
+    after_commit(vectorstore, update_sidecars)
+
+
+def drop_near_duplicates(near_dup, ids, texts, metadatas, vectorstore, delete_ids=()):
+    """
+    Take near-duplicates of already stored chunks out of a batch before it is embedded.
+    Returns (ids, texts, metadatas, collapsed, skipped_ids); signatures and references
+    are stored once the batch is committed. Skipped chunks get neither a vector
+    nor a reference, so they must not be registered to their resume.
+    """
+    if near_dup is None or not ids:
+        return ids, texts, metadatas, 0, []
+    keep, refs, signatures = near_dup.filter(ids, texts, metadatas, exclude=delete_ids)
+    after_commit(vectorstore, lambda: near_dup.commit(signatures, refs))
+    kept = set(keep)
+    collapsed = {ref[0] for ref in refs}
+    return (
+        [ids[i] for i in keep],
+        [texts[i] for i in keep],
+        [metadatas[i] for i in keep],
+        len(refs),
+        [cid for i, cid in enumerate(ids) if i not in kept and cid not in collapsed]
+    )
+
+
+# -------------------- PIPELINE --------------------
+def ingest_pdfs(files, vectorstore, embedding_model, batch_size=EMBED_BATCH_SIZE,
+                max_workers=None, ledger=None, keyword_index=None, dense_index=None,
+                progress=None, near_dup=None):
+    """
+    Parse (process pool) -> embed (batched) -> write (one bulk upsert).
+    With a ledger, byte-identical files are skipped and only new chunks are embedded;
+    chunks that disappeared from a changed file are deleted.
+    A keyword_index (BM25) and a dense_index (quantized) are kept in step with the same ids.
+    A near_dup index (MinHash/LSH) collapses or skips new chunks that nearly match stored ones.
+    progress(stage) is called after each stage: parsed, chunked, embedded, committed
+    (the last one only once a group-committed store has made the writes durable).
+    Returns a stats dict with throughput and per-file errors.
+    """
+    progress = progress or (lambda stage: None)
+    t0 = time.perf_counter()
+    errors = {}
+    skipped = []
+    hashes = {}
+    to_parse = []
+    for path, name in files:
+        if ledger is not None:
+            try:
+                hashes[name] = file_hash(path)
+            except OSError as e:
+                errors[name] = str(e)
+                continue
+            if ledger.get_file_hash(name) == hashes[name]:
+                skipped.append(name)
+                continue
+        to_parse.append((path, name))
+
+    paths = {n: p for p, n in to_parse}
+    large = [(p, n) for p, n in to_parse if _page_count(p, hashes.get(n)) >= STREAM_MIN_PAGES]
+    to_parse = [f for f in to_parse if f not in large]
+
+    parsed, parse_errors = parse_files(to_parse, max_workers=max_workers)
+    errors.update(parse_errors)
+    t1 = time.perf_counter()
+    progress("parsed")
+
+    ids = []
+    texts = []
+    metadatas = []
+    keep_ids = []
+    keep_metadatas = []
+    delete_ids = []
+    records = []
+    pages = 0
+    chunks = 0
+    for item in parsed:
+        name = item["file_name"]
+        pages += item["pages"]
+        chunks += len(item["texts"])
+
+        # identical chunk texts inside one resume collapse to one vector
+        current = {}
+        for text, meta in zip(item["texts"], item["metadatas"]):
+            h = chunk_hash(text)
+            if h not in current:
+                current[h] = (text, meta)
+
+        old = ledger.get_chunk_hashes(name) if ledger is not None else set()
+        for h, (text, meta) in current.items():
+            if h in old:
+                keep_ids.append(chunk_id(name, h))
+                keep_metadatas.append(meta)
+            else:
+                ids.append(chunk_id(name, h))
+                texts.append(text)
+                metadatas.append(meta)
+        delete_ids.extend(chunk_id(name, h) for h in old - current.keys())
+        records.append((name, hashes.get(name), list(current), _file_size(paths[name]), item["pages"]))
+
+    considered = len(ids)
+    ids, texts, metadatas, collapsed, skipped_ids = drop_near_duplicates(
+        near_dup, ids, texts, metadatas, vectorstore, delete_ids
+    )
+    dropped = len(skipped_ids)
+    if skipped_ids:
+        skipped_ids = set(skipped_ids)
+        records = [
+            (name, f_hash, [h for h in chunk_hashes if chunk_id(name, h) not in skipped_ids], size, n)
+            for name, f_hash, chunk_hashes, size, n in records
+        ]
+    if near_dup is not None and keep_ids:
+        # collapsed chunks have no vector of their own to update
+        refs = near_dup.ref_ids(keep_ids)
+        keep = [i for i, cid in enumerate(keep_ids) if cid not in refs]
+        keep_ids = [keep_ids[i] for i in keep]
+        keep_metadatas = [keep_metadatas[i] for i in keep]
+    progress("chunked")
+
+    vectors = embed_in_batches(embedding_model, texts, batch_size)
+    t2 = time.perf_counter()
+    progress("embedded")
+
+    if ledger is not None:
+        for name, _, chunk_hashes, _, _ in records:
+            ledger.reserve(name, chunk_hashes)
+    write_batch(vectorstore, ids, texts, vectors, metadatas, delete_ids,
+                keep_ids, keep_metadatas, keyword_index, dense_index, near_dup)
+    if ledger is not None:
+        # a file only counts as indexed once its chunks are committed
+        after_commit(vectorstore, lambda: ledger.record_many(records))
+
+    # large scans never go through the pool: they are streamed with bounded memory
+    streamed = []
+    for path, name in large:
+        try:
+            streamed.append(stream_ingest_pdf(
+                path, name, vectorstore, embedding_model, ledger=ledger,
+                keyword_index=keyword_index, dense_index=dense_index, f_hash=hashes.get(name),
+                near_dup=near_dup
+            ))
+        except Exception as e:
+            errors[name] = str(e)
+    t3 = time.perf_counter()
+    # a group-committed store may still hold the batch; report it once it is durable
+    after_commit(vectorstore, lambda: progress("committed"))
+    if ledger is not None:
+        for name, err in errors.items():
+            ledger.mark_failed(name, err)
+
+    for item in streamed:
+        pages += item["pages"]
+        chunks += item["chunks"]
+        considered += item["dedup"]["considered"]
+        collapsed += item["dedup"]["collapsed"]
+        dropped += item["dedup"]["skipped"]
+
+    total = t3 - t0
+    return {
+        "files": len(parsed) + len(streamed),
+        "skipped": len(skipped),
+        "failed": len(errors),
+        "errors": errors,
+        "pages": pages,
+        "chunks": chunks,
+        "embedded": len(texts) + sum(item["embedded"] for item in streamed),
+        "deleted": len(delete_ids) + sum(item["deleted"] for item in streamed),
+        "dedup": dedup_stats(considered, collapsed, dropped),
+        "parse_seconds": t1 - t0,
+        "embed_seconds": t2 - t1,
+        "write_seconds": t3 - t2,
+        "total_seconds": total,
+        "pages_per_sec": pages / total if total else 0.0,
+        "chunks_per_sec": chunks / total if total else 0.0
+    }
+
+
+# -------------------- STREAMING (BOUNDED MEMORY) --------------------
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _page_count(path, f_hash=None):
+    # cheap: cached count or the page tree's /Count; without a hash the
+    # cache is skipped rather than reading the whole file to compute one
+    try:
+        return page_count(path, f_hash=f_hash, cache_path=TEXT_CACHE_PATH if f_hash else None)
+    except Exception:
+        return 0        # unreadable -> the parse pool reports the error
+
+
+def current_rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        try:
+            import psutil
+            return psutil.Process().memory_info().rss / 2 ** 20
+        except ImportError:
+            return 0.0
+
+
+def iter_pages(pdf_path, f_hash=None):
+    # one page at a time instead of the whole list; a re-upload reads the text cache
+    return iter_documents(pdf_path, f_hash=f_hash)
+
+
+def stream_ingest_pdf(pdf_path, file_name, vectorstore, embedding_model,
+                      batch_size=STREAM_BATCH_SIZE, max_extra_rss_mb=MAX_EXTRA_RSS_MB,
+                      ledger=None, keyword_index=None, dense_index=None, f_hash=None,
+                      near_dup=None):
+    """
+    Lazily load pages -> chunk -> embed + write in micro-batches.
+    RSS is checked after every page; above the ceiling the pending batch is
+    flushed right away and the micro-batch size is halved, so memory stays
+    flat however many pages the PDF has.
+    """
+    t0 = time.perf_counter()
+    baseline = current_rss_mb()
+    peak = baseline
+
+    if ledger is not None:
+        f_hash = f_hash or file_hash(pdf_path)
+        if ledger.get_file_hash(file_name) == f_hash:
+            return {"file_name": file_name, "skipped": True, "pages": 0, "chunks": 0,
+                    "embedded": 0, "deleted": 0, "dedup": dedup_stats(0, 0, 0), "peak_extra_rss_mb": 0.0,
+                    "total_seconds": time.perf_counter() - t0}
+    old = ledger.get_chunk_hashes(file_name) if ledger is not None else set()
+
+    seen = set()
+    skipped = set()             # near-duplicates dropped without a vector or a reference
+    pending = []
+    keep = []
+    counts = {"pages": 0, "chunks": 0, "embedded": 0, "considered": 0, "collapsed": 0, "skipped": 0}
+    refs = near_dup.ref_ids(chunk_id(file_name, h) for h in old) if near_dup is not None else set()
+
+    def flush():
+        if not pending and not keep:
+            return
+        if ledger is not None:
+            ledger.reserve(file_name, [h for h, _, _ in pending])
+        ids, texts, metadatas, collapsed, dropped = drop_near_duplicates(
+            near_dup,
+            [chunk_id(file_name, h) for h, _, _ in pending],
+            [t for _, t, _ in pending],
+            [m for _, _, m in pending],
+            vectorstore
+        )
+        vectors = embedding_model.embed_documents(texts) if texts else []
+        write_batch(
+            vectorstore,
+            ids,
+            texts,
+            vectors,
+            metadatas,
+            keep_ids=[cid for cid, _ in keep],
+            keep_metadatas=[m for _, m in keep],
+            keyword_index=keyword_index,
+            dense_index=dense_index
+        )
+        counts["embedded"] += len(ids)
+        counts["considered"] += len(pending)
+        counts["collapsed"] += collapsed
+        counts["skipped"] += len(dropped)
+        skipped.update(dropped)
+        pending.clear()
+        keep.clear()
+
+    splitter = make_splitter()
+    for page in iter_pages(pdf_path, f_hash):
+        counts["pages"] += 1
+        for c in splitter.split_documents([page]):
+            counts["chunks"] += 1
+            h = chunk_hash(c.page_content)
+            if h in seen:
+                continue
+            seen.add(h)
+            meta = dict(c.metadata)
+            meta["file_name"] = file_name
+            if h in old:
+                if chunk_id(file_name, h) not in refs:
+                    keep.append((chunk_id(file_name, h), meta))
+            else:
+                pending.append((h, c.page_content, meta))
+            if len(pending) + len(keep) >= batch_size:
+                flush()
+        del page
+
+        rss = current_rss_mb()
+        peak = max(peak, rss)
+        if rss - baseline > max_extra_rss_mb:
+            flush()
+            gc.collect()
+            batch_size = max(1, batch_size // 2)
+
+    flush()
+    gone = [chunk_id(file_name, h) for h in old - seen]
+    if gone:
+        write_batch(vectorstore, [], [], [], [], delete_ids=gone,
+                    keyword_index=keyword_index, dense_index=dense_index, near_dup=near_dup)
+    if ledger is not None:
+        hashes = [h for h in seen if chunk_id(file_name, h) not in skipped]
+        size, pages = _file_size(pdf_path), counts["pages"]
+        after_commit(vectorstore, lambda: ledger.record(file_name, f_hash, hashes, size, pages))
+
+    return {
+        "file_name": file_name,
+        "skipped": False,
+        "pages": counts["pages"],
+        "chunks": counts["chunks"],
+        "embedded": counts["embedded"],
+        "deleted": len(gone),
+        "dedup": dedup_stats(counts["considered"], counts["collapsed"], counts["skipped"]),
+        "peak_extra_rss_mb": peak - baseline,
+        "total_seconds": time.perf_counter() - t0
+    }
+
+
+# -------------------- FOLDER RESYNC --------------------
+def sync_folder(folder, vectorstore, embedding_model, ledger, batch_size=EMBED_BATCH_SIZE,
+                keyword_index=None, dense_index=None, near_dup=None):
+    """
+    Bring the index in line with a folder of PDFs (nightly resync).
+    Unchanged files cost one hash, removed files are dropped from the index.
+    """
+    names = [n for n in os.listdir(folder) if n.lower().endswith(".pdf")]
+    files = [(os.path.join(folder, n), n) for n in names]
+    stats = ingest_pdfs(files, vectorstore, embedding_model, batch_size,
+                        ledger=ledger, keyword_index=keyword_index, dense_index=dense_index,
+                        near_dup=near_dup)
+
+    removed = 0
+    for name in set(ledger.list_files()) - set(names):
+        delete_resume(name, vectorstore, ledger, keyword_index, dense_index, near_dup)
+        removed += 1
+    stats["removed"] = removed
+    return stats
+
+
+# -------------------- DELETE --------------------
+def delete_resume(file_name, vectorstore, ledger, keyword_index=None, dense_index=None,
+                  near_dup=None):
+    """
+    Delete by chunk id from the registry -- no metadata scan over the collection.
+    Resumes indexed before the registry existed fall back to the file_name filter.
+    Returns the number of chunk ids removed (None for the fallback).
+    """
+    ids = ledger.get_chunk_ids(file_name)
+    collection = vectorstore._collection
+    moves = {}
+    if near_dup is not None and ids:
+        # vectors other resumes point at move to one of them before they go
+        heirs, moves = near_dup.release(vectorstore, ids)
+        if heirs[0]:
+            write_batch(vectorstore, *heirs, keyword_index=keyword_index, dense_index=dense_index)
+    if ids:
+        step = _max_batch(collection, len(ids))
+        for i in range(0, len(ids), step):
+            collection.delete(ids=ids[i:i + step])
+    else:
+        collection.delete(where={"file_name": file_name})
+    vectorstore.persist()
+
+    def forget():
+        for index in (keyword_index, dense_index):
+            if index is not None:
+                if ids:
+                    index.delete(ids)
+                else:
+                    index.delete_file(file_name)
+        if near_dup is not None and ids:
+            near_dup.forget(ids, moves)
+        ledger.forget(file_name)
+
+    after_commit(vectorstore, forget)
+    return len(ids) if ids else None
+
+
+def get_resume_chunks(file_name, vectorstore, ledger):
+    ids = ledger.get_chunk_ids(file_name)
+    if not ids:
+        return []
+    got = vectorstore._collection.get(ids=ids, include=["documents", "metadatas"])
+    chunks = [
+        {"id": cid, "text": doc, "metadata": meta}
+        for cid, doc, meta in zip(got["ids"], got["documents"], got["metadatas"])
+    ]
+    chunks.sort(key=lambda c: (c["metadata"] or {}).get("page", 0))
+    return chunks
+
+
+# -------------------- RECONCILE --------------------
+def reconcile(vectorstore, ledger, folder=None, fix=False, keyword_index=None, dense_index=None,
+              page_size=5000, near_dup=None):
+    """
+    Compare the catalog with the vector store (and the resume folder, if given).
+      orphan_vectors : chunk ids in the store that no catalog entry owns
+      missing_vectors: indexed resumes with registered chunks absent from the store
+      orphan_files   : PDFs in the folder that were never indexed
+      missing_files  : indexed resumes whose PDF is gone from the folder
+    fix=True deletes orphan vectors and drops resumes with missing vectors from
+    the catalog (marked failed) so the next upload / sync re-indexes them.
+    """
+    collection = vectorstore._collection
+    stored = {}
+    for offset in range(0, collection.count(), page_size):
+        page = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+        for cid, meta in zip(page["ids"], page["metadatas"]):
+            stored[cid] = (meta or {}).get("file_name", "")
+
+    registry = ledger.chunk_registry()
+    owned = set().union(*registry.values()) if registry else set()
+    catalog = ledger.list_resumes(limit=-1)
+    # resumes indexed before the registry have random ids -> owned by file name
+    legacy = {r["file_name"] for r in catalog} - registry.keys()
+    orphan_vectors = [cid for cid in stored if cid not in owned and stored[cid] not in legacy]
+
+    indexed = {r["file_name"] for r in catalog if r["status"] == "indexed"}
+    absent = {cid for name in indexed for cid in registry.get(name, ()) if cid not in stored}
+    if near_dup is not None and absent:
+        # collapsed near-duplicates are served by another resume's vector
+        absent -= near_dup.ref_ids(absent)
+    missing_vectors = sorted(
+        name for name in indexed if any(cid in absent for cid in registry.get(name, ()))
+    )
+
+    report = {
+        "stored_chunks": len(stored),
+        "catalog_resumes": len(catalog),
+        "orphan_vectors": len(orphan_vectors),
+        "orphan_vector_files": sorted({stored[cid] for cid in orphan_vectors}),
+        "missing_vectors": missing_vectors
+    }
+    if folder is not None:
+        on_disk = {n for n in os.listdir(folder) if n.lower().endswith(".pdf")}
+        report["orphan_files"] = sorted(on_disk - indexed)
+        report["missing_files"] = sorted(indexed - on_disk)
+
+    if fix:
+        step = _max_batch(collection, len(orphan_vectors))
+        for i in range(0, len(orphan_vectors), step):
+            collection.delete(ids=orphan_vectors[i:i + step])
+        for index in (keyword_index, dense_index):
+            if index is not None and orphan_vectors:
+                index.delete(orphan_vectors)
+        vectorstore.persist()
+        if orphan_vectors:
+            ledger.bump_version()
+        for name in missing_vectors:
+            ledger.forget(name)
+            ledger.mark_failed(name, "vectors missing from the store, re-index this resume")
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from ledger import Ledger
+    from resources import (
+        QUANT_MODE,
+        VECTOR_BACKEND,
+        get_dense_index,
+        get_embedding_model,
+        get_keyword_index,
+        get_near_dup_index,
+        get_vectorstore
+    )
+
+    parser = argparse.ArgumentParser(description="Resync or reconcile the resume index")
+    parser.add_argument("command", choices=["sync", "reconcile"], nargs="?", default="sync")
+    parser.add_argument("--folder", default="resumes")
+    parser.add_argument("--fix", action="store_true", help="reconcile: repair what it finds")
+    parser.add_argument("--backend", default=VECTOR_BACKEND)
+    args = parser.parse_args()
+
+    embedding_model = get_embedding_model()
+    vectorstore = get_vectorstore("chroma_db", embedding_model, args.backend)
+    keyword_index = get_keyword_index("chroma_db", vectorstore)
+    # same quantized index the app searches, or deleted resumes keep showing up there
+    dense_index = get_dense_index("chroma_db", vectorstore, QUANT_MODE)
+    near_dup = get_near_dup_index("chroma_db", vectorstore, os.getenv("DEDUP_POLICY", "collapse"))
+    if args.command == "sync":
+        print(sync_folder(args.folder, vectorstore, embedding_model, Ledger(),
+                          keyword_index=keyword_index, dense_index=dense_index, near_dup=near_dup))
+    else:
+        print(reconcile(vectorstore, Ledger(), args.folder, args.fix, keyword_index=keyword_index,
+                        dense_index=dense_index, near_dup=near_dup))
@@ -0,0 +1,136 @@
+import sqlite3
+import threading
+import time
+import uuid
+
+# -------------------- CONFIG --------------------
+JOBS_PATH = "jobs.sqlite3"
+WORKERS = 2
+POLL_SECONDS = 0.5
+STAGES = ["queued", "parsed", "chunked", "embedded", "committed"]
+
+
+# -------------------- JOB QUEUE --------------------
+class JobQueue:
+    """
+    Durable local queue of indexing jobs (one job = one uploaded file).
+    Jobs live in SQLite, so they survive browser refreshes and restarts;
+    up to `workers` files are indexed at the same time by worker threads.
+
+    handler(file_path, file_name, progress) does the work and calls
+    progress(stage) as it goes; an exception marks the job failed.
+    """
+
+    def __init__(self, handler, path=JOBS_PATH, workers=WORKERS):
+        self.handler = handler
+        self.path = path
+        self.workers = workers
+        self._threads = []
+        self._stop = threading.Event()
+        self._claim_lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " job_id TEXT PRIMARY KEY,"
+                " file_path TEXT NOT NULL,"
+                " file_name TEXT NOT NULL,"
+                " status TEXT NOT NULL,"
+                " stage TEXT NOT NULL,"
+                " error TEXT,"
+                " created_at REAL NOT NULL,"
+                " updated_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)")
+            # jobs that were running when the process died start over
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', stage = 'queued', updated_at = ? "
+                "WHERE status = 'running'",
+                (time.time(),)
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    # ---------- producer side ----------
+    def submit(self, file_path, file_name):
+        job_id = uuid.uuid4().hex[:12]
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (job_id, file_path, file_name, status, stage, created_at, updated_at) "
+                "VALUES (?, ?, ?, 'queued', 'queued', ?, ?)",
+                (job_id, file_path, file_name, now, now)
+            )
+        return job_id
+
+    def get_jobs(self, job_ids=None, limit=50):
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            if job_ids:
+                marks = ",".join("?" * len(job_ids))
+                rows = conn.execute(
+                    f"SELECT * FROM jobs WHERE job_id IN ({marks}) ORDER BY created_at", list(job_ids)
+                ).fetchall()
+            else:
+                rows = conn.execute(
+                    "SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)
+                ).fetchall()
+        return [dict(r) for r in rows]
+
+    def pending_count(self):
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')"
+            ).fetchone()[0]
+
+    # ---------- worker side ----------
+    def _claim(self):
+        with self._claim_lock, self._connect() as conn:
+            while True:
+                row = conn.execute(
+                    "SELECT job_id, file_path, file_name FROM jobs "
+                    "WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+                ).fetchone()
+                if row is None:
+                    return None
+                # another process may have taken it in between
+                claimed = conn.execute(
+                    "UPDATE jobs SET status = 'running', updated_at = ? "
+                    "WHERE job_id = ? AND status = 'queued'",
+                    (time.time(), row[0])
+                ).rowcount
+                if claimed:
+                    return row
+
+    def _set(self, job_id, **fields):
+        fields["updated_at"] = time.time()
+        cols = ", ".join(f"{k} = ?" for k in fields)
+        with self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {cols} WHERE job_id = ?", [*fields.values(), job_id])
+
+    def _work(self):
+        while not self._stop.is_set():
+            job = self._claim()
+            if job is None:
+                self._stop.wait(POLL_SECONDS)
+                continue
+            job_id, file_path, file_name = job
+            try:
+                self.handler(file_path, file_name, lambda stage: self._set(job_id, stage=stage))
+                self._set(job_id, status="done", stage="committed")
+            except Exception as e:
+                self._set(job_id, status="failed", error=str(e))
+
+    def start(self):
+        if self._threads:
+            return
+        for i in range(self.workers):
+            t = threading.Thread(target=self._work, daemon=True, name=f"ingest-worker-{i}")
+            t.start()
+            self._threads.append(t)
+
+    def stop(self):
+        self._stop.set()
+        for t in self._threads:
+            t.join()
+        self._threads = []
@@ -0,0 +1,221 @@
+import hashlib
+import sqlite3
+import time
+
+# -------------------- CONFIG --------------------
+LEDGER_PATH = "ledger.sqlite3"
+STATUSES = ["indexing", "indexed", "failed"]
+PAGE_SIZE = 50
+
+
+# -------------------- HASHING --------------------
+def file_hash(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def chunk_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_id(file_name, c_hash):
+    # stable id -> the same chunk text of the same resume always maps to the same vector
+    return f"{file_name}::{c_hash}"
+
+
+# -------------------- LEDGER --------------------
+class Ledger:
+    """
+    Content-hash ledger and chunk-id registry of what is in the vector store.
+    files   : file_name -> hash of the whole PDF
+    chunks  : file_name -> hashes of its chunk texts (chunk id = chunk_id(file_name, hash))
+    catalog : one row per resume for the UI (size, pages, chunks, ingest time, status),
+              written in the same transaction as the two tables above
+    """
+
+    def __init__(self, path=LEDGER_PATH):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                " file_name TEXT PRIMARY KEY,"
+                " file_hash TEXT NOT NULL,"
+                " updated_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS chunks ("
+                " file_name TEXT NOT NULL,"
+                " chunk_hash TEXT NOT NULL,"
+                " PRIMARY KEY (file_name, chunk_hash))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS catalog ("
+                " file_name TEXT PRIMARY KEY,"
+                " file_hash TEXT,"
+                " size_bytes INTEGER,"
+                " pages INTEGER,"
+                " chunks INTEGER NOT NULL DEFAULT 0,"
+                " ingested_at REAL,"
+                " status TEXT NOT NULL,"
+                " error TEXT)"
+            )
+            # bumped whenever the set of indexed chunks changes -> query caches key on it
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('index_version', 0)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_catalog_ingested ON catalog (ingested_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_catalog_status ON catalog (status)")
+            # resumes indexed before the catalog existed
+            conn.execute(
+                "INSERT OR IGNORE INTO catalog (file_name, file_hash, chunks, ingested_at, status) "
+                "SELECT f.file_name, f.file_hash,"
+                " (SELECT COUNT(*) FROM chunks c WHERE c.file_name = f.file_name),"
+                " f.updated_at, 'indexed' FROM files f"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def has_file(self, file_name):
+        return self.get_file_hash(file_name) is not None
+
+    def get_file_hash(self, file_name):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT file_hash FROM files WHERE file_name = ?", (file_name,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def get_chunk_hashes(self, file_name):
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT chunk_hash FROM chunks WHERE file_name = ?", (file_name,)
+            ).fetchall()
+        return {r[0] for r in rows}
+
+    def get_chunk_ids(self, file_name):
+        # served from the (file_name, chunk_hash) primary key, no collection scan
+        return [chunk_id(file_name, h) for h in sorted(self.get_chunk_hashes(file_name))]
+
+    def chunk_registry(self):
+        """file_name -> set of registered chunk ids, for the whole ledger."""
+        registry = {}
+        with self._connect() as conn:
+            for file_name, h in conn.execute("SELECT file_name, chunk_hash FROM chunks"):
+                registry.setdefault(file_name, set()).add(chunk_id(file_name, h))
+        return registry
+
+    def list_files(self):
+        with self._connect() as conn:
+            rows = conn.execute("SELECT file_name FROM files").fetchall()
+        return [r[0] for r in rows]
+
+    def reserve(self, file_name, chunk_hashes):
+        """
+        Register chunk ids *before* they are written to the vector store, so a
+        crash mid-write never leaves vectors that no registry entry points to.
+        The file hash is left alone -> the file is re-processed next time.
+        """
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO chunks (file_name, chunk_hash) VALUES (?, ?)",
+                [(file_name, h) for h in chunk_hashes]
+            )
+            conn.execute(
+                "INSERT INTO catalog (file_name, status) VALUES (?, 'indexing') "
+                "ON CONFLICT (file_name) DO UPDATE SET status = 'indexing', error = NULL",
+                (file_name,)
+            )
+
+    def record(self, file_name, f_hash, chunk_hashes, size_bytes=None, pages=None):
+        self.record_many([(file_name, f_hash, chunk_hashes, size_bytes, pages)])
+
+    def record_many(self, records):
+        """
+        records: (file_name, file_hash, chunk_hashes, size_bytes, pages)
+        One transaction: file hashes, their chunk sets and the catalog always agree.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            for file_name, f_hash, chunk_hashes, size_bytes, pages in records:
+                conn.execute("DELETE FROM chunks WHERE file_name = ?", (file_name,))
+                conn.executemany(
+                    "INSERT OR IGNORE INTO chunks (file_name, chunk_hash) VALUES (?, ?)",
+                    [(file_name, h) for h in chunk_hashes]
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO files (file_name, file_hash, updated_at) VALUES (?, ?, ?)",
+                    (file_name, f_hash, now)
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO catalog "
+                    "(file_name, file_hash, size_bytes, pages, chunks, ingested_at, status, error) "
+                    "VALUES (?, ?, ?, ?, ?, ?, 'indexed', NULL)",
+                    (file_name, f_hash, size_bytes, pages, len(chunk_hashes), now)
+                )
+            if records:
+                self._bump(conn)
+
+    def mark_failed(self, file_name, error):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO catalog (file_name, status, error) VALUES (?, 'failed', ?) "
+                "ON CONFLICT (file_name) DO UPDATE SET status = 'failed', error = excluded.error",
+                (file_name, error)
+            )
+
+    def forget(self, file_name):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM chunks WHERE file_name = ?", (file_name,))
+            conn.execute("DELETE FROM files WHERE file_name = ?", (file_name,))
+            conn.execute("DELETE FROM catalog WHERE file_name = ?", (file_name,))
+            self._bump(conn)
+
+    # ---------- index version ----------
+    def _bump(self, conn):
+        conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'index_version'")
+
+    def bump_version(self):
+        with self._connect() as conn:
+            self._bump(conn)
+
+    def index_version(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT value FROM meta WHERE key = 'index_version'").fetchone()[0]
+
+    # ---------- catalog ----------
+    def _catalog_filter(self, search, status):
+        clauses = []
+        args = []
+        if search:
+            clauses.append("file_name LIKE ? ESCAPE '\\'")
+            pattern = search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            args.append(f"%{pattern}%")
+        if status:
+            clauses.append("status = ?")
+            args.append(status)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), args
+
+    def list_resumes(self, search="", status=None, limit=PAGE_SIZE, offset=0):
+        """Catalog rows, newest first -- one indexed query, no directory listing."""
+        where, args = self._catalog_filter(search, status)
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute(
+                f"SELECT * FROM catalog{where} ORDER BY ingested_at DESC, file_name LIMIT ? OFFSET ?",
+                [*args, limit, offset]
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    def count_resumes(self, search="", status=None):
+        where, args = self._catalog_filter(search, status)
+        with self._connect() as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM catalog{where}", args).fetchone()[0]
+
+    def get_resume(self, file_name):
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute("SELECT * FROM catalog WHERE file_name = ?", (file_name,)).fetchone()
+        return dict(row) if row else None
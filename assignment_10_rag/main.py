@@ -1,107 +1,294 @@
 import streamlit as st
+import io
 import os
 import shutil
+import time
 from datetime import datetime
 
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.vectorstores import Chroma
+
+from batch_shortlist import read_jobs_csv, rows_to_csv, shortlist_batch
+from compact import is_running, last_report, maybe_compact
+from ingest import delete_resume as delete_resume_chunks
+from ingest import get_resume_chunks, ingest_pdfs, iter_pages, make_splitter
+from jobs import STAGES
+from ledger import Ledger
+from ranking import AGGREGATORS, MMR_LAMBDA
+from resources import (
+    QUANT_MODE,
+    READ_ONLY_BACKENDS,
+    VECTOR_BACKEND,
+    get_dense_index,
+    get_embedding_model,
+    get_job_queue,
+    get_keyword_index,
+    get_metrics,
+    get_near_dup_index,
+    get_query_cache,
+    get_reranker,
+    get_vectorstore,
+    record_query
+)
 
 # -------------------- CONFIG --------------------
 RESUME_DIR = "resumes"
 CHROMA_DIR = "chroma_db"
+LEDGER_PATH = "ledger.sqlite3"
+EMBED_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+EMBED_CACHE_PATH = "embed_cache.sqlite3"
+JOBS_PATH = "jobs.sqlite3"
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+# a snapshot node only serves shortlists; uploads / deletes go to the writable store
+READ_ONLY = VECTOR_BACKEND in READ_ONLY_BACKENDS
+# buffer writes and commit them in groups instead of persisting after every file
+GROUP_COMMIT = os.getenv("GROUP_COMMIT", "1") == "1" and not READ_ONLY
+CATALOG_PAGE_SIZE = 50
+# near-duplicate chunks (shared templates, boilerplate): "collapse" onto one stored
+# vector that counts for every resume containing it, "skip" them, or "off"
+DEDUP_POLICY = os.getenv("DEDUP_POLICY", "collapse")
 
 os.makedirs(RESUME_DIR, exist_ok=True)
 
-embedding_model = HuggingFaceEmbeddings(
-    model_name="sentence-transformers/all-MiniLM-L6-v2"
-)
+# loaded once per process (warmed in the background), not on every rerun;
+# repeated chunk text (headers, addresses, templates) is only ever embedded once
+embedding_model = get_embedding_model(EMBED_MODEL, EMBED_CACHE_PATH)
+vectorstore = get_vectorstore(CHROMA_DIR, embedding_model, VECTOR_BACKEND, GROUP_COMMIT)
+# BM25 over the same chunks, for exact skill tokens the embeddings miss
+keyword_index = get_keyword_index(CHROMA_DIR, vectorstore)
+dense_index = get_dense_index(CHROMA_DIR, vectorstore, QUANT_MODE)
+near_dup = get_near_dup_index(CHROMA_DIR, vectorstore, DEDUP_POLICY)
 
-vectorstore = Chroma(
-    persist_directory=CHROMA_DIR,
-    embedding_function=embedding_model
-)
+ledger = Ledger(LEDGER_PATH)
 
 # -------------------- UTILS --------------------
 def load_and_split_pdf(pdf_path):
-    loader = PyPDFLoader(pdf_path)
-    docs = loader.load()
+    # generator: pages are loaded lazily and split one at a time
+    splitter = make_splitter()
+    for page in iter_pages(pdf_path):
+        yield from splitter.split_documents([page])
 
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=800,
-        chunk_overlap=100
+def add_resume(file_path, file_name):
+    return add_resumes([(file_path, file_name)])
+
+def add_resumes(files):
+    # files: list of (file_path, file_name)
+    stats = ingest_pdfs(
+        files,
+        vectorstore,
+        embedding_model,
+        ledger=ledger,
+        keyword_index=keyword_index,
+        dense_index=dense_index,
+        near_dup=near_dup
     )
-    return splitter.split_documents(docs)
+    if stats["deleted"]:
+        maybe_compact(vectorstore, dense_index)
+    return stats
 
-def add_resume(file_path, file_name):
-    docs = load_and_split_pdf(file_path)
-    for d in docs:
-        d.metadata["file_name"] = file_name
-    vectorstore.add_documents(docs)
-    vectorstore.persist()
+def index_job(file_path, file_name, progress):
+    # runs on a background worker thread of the job queue
+    stats = ingest_pdfs(
+        [(file_path, file_name)],
+        vectorstore,
+        embedding_model,
+        ledger=ledger,
+        keyword_index=keyword_index,
+        dense_index=dense_index,
+        progress=progress,
+        near_dup=near_dup
+    )
+    if GROUP_COMMIT:
+        # the job only counts as done once its writes are committed
+        vectorstore.flush()
+    if stats["errors"]:
+        raise RuntimeError(stats["errors"][file_name])
+    if stats["deleted"]:
+        maybe_compact(vectorstore, dense_index)
+
+# durable queue: survives browser refreshes, unfinished jobs resume after a restart
+job_queue = get_job_queue(index_job, JOBS_PATH, INGEST_WORKERS)
 
 def delete_resume(file_name):
-    vectorstore._collection.delete(
-        where={"file_name": file_name}
-    )
-    vectorstore.persist()
+    # id-based delete through the chunk registry in the ledger
+    removed = delete_resume_chunks(file_name, vectorstore, ledger, keyword_index, dense_index, near_dup)
+    if GROUP_COMMIT:
+        vectorstore.flush()     # the catalog row goes away with the commit, show it now
+    # deleted rows stay on disk as tombstones; rebuilt in the background past COMPACT_RATIO
+    maybe_compact(vectorstore, dense_index)
+    return removed
 
-def list_resumes():
-    if not os.path.exists(RESUME_DIR):
-        return []
-    return os.listdir(RESUME_DIR)
+def list_resumes(search="", limit=CATALOG_PAGE_SIZE, offset=0):
+    # served from the catalog table, not a directory listing
+    return ledger.list_resumes(search=search, limit=limit, offset=offset)
 
 # -------------------- STREAMLIT UI --------------------
 st.set_page_config(page_title="AI Resume Shortlisting", layout="wide")
 st.title("📄 AI Enabled Resume Shortlisting Application")
 
+with st.sidebar:
+    st.subheader("⏱ Startup")
+    metrics = get_metrics()
+    if embedding_model.is_ready():
+        st.metric("Model ready after start", f"{metrics['model_ready_after_start']:.1f}s")
+    else:
+        st.info("Embedding model is warming up...")
+    if metrics["store_open_seconds"] is not None:
+        st.metric("Vector store open", f"{metrics['store_open_seconds'] * 1000:.0f} ms")
+    if metrics["first_query_seconds"] is not None:
+        st.metric("First query", f"{metrics['first_query_seconds'] * 1000:.0f} ms")
+    if GROUP_COMMIT:
+        commits = vectorstore.commit_stats()
+        if commits["commits"]:
+            st.caption(
+                f"{commits['ops']} writes in {commits['commits']} commits "
+                f"({commits['commit_seconds'] / commits['commits'] * 1000:.0f} ms per commit)"
+            )
+    if is_running():
+        st.caption("Compacting vector store...")
+    report = last_report(vectorstore)
+    if report:
+        st.caption(
+            f"Last compaction: {report['tombstones']} tombstones, "
+            f"{report['bytes_reclaimed'] / 2 ** 20:.1f} MB reclaimed, query "
+            f"{report['latency_ms_before']:.1f} -> {report['latency_ms_after']:.1f} ms"
+        )
+
 tabs = st.tabs([
     "📤 Upload / Update Resume",
     "📋 List Resumes",
     "🗑 Delete Resume",
-    "🎯 Shortlist Resumes"
+    "🎯 Shortlist Resumes",
+    "📑 Batch Shortlist"
 ])
 
 # -------------------- TAB 1: UPLOAD --------------------
 with tabs[0]:
-    st.header("Upload or Update Resume (PDF)")
-    uploaded_file = st.file_uploader("Upload Resume", type=["pdf"])
+    st.header("Upload or Update Resumes (PDF)")
+    if READ_ONLY:
+        st.info(f"The {VECTOR_BACKEND} store is read-only: upload resumes on the writable node.")
+    uploaded_files = None if READ_ONLY else st.file_uploader(
+        "Upload Resumes",
+        type=["pdf"],
+        accept_multiple_files=True
+    )
+
+    background = st.checkbox("Index in background", value=True)
+
+    if "submitted" not in st.session_state:
+        st.session_state.submitted = {}     # (name, size) -> job id
+
+    if uploaded_files:
+        batch = []
+        for uploaded_file in uploaded_files:
+            key = (uploaded_file.name, uploaded_file.size)
+            if key in st.session_state.submitted:
+                continue        # same upload seen again on a rerun
+            file_path = os.path.join(RESUME_DIR, uploaded_file.name)
 
-    if uploaded_file:
-        file_path = os.path.join(RESUME_DIR, uploaded_file.name)
+            if os.path.exists(file_path):
+                st.warning(f"{uploaded_file.name} already exists. It will be updated.")
+                # indexed before the ledger existed -> no hashes to diff against
+                if not ledger.has_file(uploaded_file.name):
+                    delete_resume(uploaded_file.name)
 
-        if os.path.exists(file_path):
-            st.warning("Resume already exists. It will be updated.")
-            delete_resume(uploaded_file.name)
-            os.remove(file_path)
+            with open(file_path, "wb") as f:
+                f.write(uploaded_file.getbuffer())
 
-        with open(file_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
+            if background:
+                st.session_state.submitted[key] = job_queue.submit(file_path, uploaded_file.name)
+            else:
+                st.session_state.submitted[key] = None
+                batch.append((file_path, uploaded_file.name))
 
-        add_resume(file_path, uploaded_file.name)
-        st.success("Resume uploaded and indexed successfully!")
+        if batch:
+            stats = add_resumes(batch)
+
+            for name, err in stats["errors"].items():
+                st.error(f"{name}: {err}")
+            if stats["skipped"]:
+                st.info(f"{stats['skipped']} resume(s) unchanged, skipped.")
+            if stats["files"]:
+                st.success(
+                    f"Indexed {stats['files']} resume(s): {stats['pages']} pages, "
+                    f"{stats['chunks']} chunks ({stats['embedded']} embedded, {stats['deleted']} removed) "
+                    f"in {stats['total_seconds']:.1f}s "
+                    f"({stats['pages_per_sec']:.1f} pages/s, {stats['chunks_per_sec']:.1f} chunks/s)"
+                )
+            cache = embedding_model.stats()
+            st.caption(
+                f"Embedding cache: {cache['hits']} hits, {cache['misses']} misses "
+                f"({cache['hit_rate']:.0%} hit rate)"
+            )
+            dedup = stats["dedup"]
+            if dedup["considered"]:
+                st.caption(
+                    f"Near-duplicates: {dedup['collapsed']} collapsed, {dedup['skipped']} skipped "
+                    f"of {dedup['considered']} new chunks ({dedup['dedup_ratio']:.0%} dedup ratio)"
+                )
+
+    # -------- progress of background jobs --------
+    job_ids = [j for j in st.session_state.submitted.values() if j]
+    jobs = job_queue.get_jobs(job_ids) if job_ids else job_queue.get_jobs(limit=10)
+    if jobs:
+        st.subheader("Indexing Jobs")
+        st.button("🔄 Refresh progress")
+        for job in jobs:
+            done = STAGES.index(job["stage"]) / (len(STAGES) - 1)
+            label = f"{job['file_name']} — {job['status']} ({job['stage']}) · job {job['job_id']}"
+            if job["status"] == "failed":
+                st.error(f"{label}: {job['error']}")
+            else:
+                st.progress(done, text=label)
 
 # -------------------- TAB 2: LIST --------------------
 with tabs[1]:
     st.header("Available Resumes")
-    resumes = list_resumes()
+    search = st.text_input("Search by file name", key="catalog_search")
+    total = ledger.count_resumes(search)
+    pages = max(1, -(-total // CATALOG_PAGE_SIZE))
+    page = st.number_input(f"Page (of {pages})", 1, pages, 1, key="catalog_page")
+    resumes = list_resumes(search, offset=(page - 1) * CATALOG_PAGE_SIZE)
 
     if resumes:
-        for r in resumes:
-            st.write(f"📄 {r}")
+        st.caption(f"{total} resumes")
+        st.dataframe(
+            [{
+                "file": r["file_name"],
+                "status": r["status"],
+                "pages": r["pages"],
+                "chunks": r["chunks"],
+                "size KB": round(r["size_bytes"] / 1024, 1) if r["size_bytes"] else None,
+                "ingested": datetime.fromtimestamp(r["ingested_at"]).strftime("%Y-%m-%d %H:%M")
+                if r["ingested_at"] else "",
+                "error": r["error"] or ""
+            } for r in resumes],
+            use_container_width=True
+        )
+
+        inspect = st.selectbox("Show chunks for", [r["file_name"] for r in resumes], key="inspect_resume")
+        if st.button("Show Chunks"):
+            chunks = get_resume_chunks(inspect, vectorstore, ledger)
+            if not chunks:
+                st.info("No registered chunks for this resume.")
+            for c in chunks:
+                with st.expander(f"Page {(c['metadata'] or {}).get('page', '?')} — {c['id'][-12:]}"):
+                    st.write(c["text"])
     else:
         st.info("No resumes uploaded yet.")
 
 # -------------------- TAB 3: DELETE --------------------
 with tabs[2]:
     st.header("Delete Resume")
-    resumes = list_resumes()
+    search = st.text_input("Search by file name", key="delete_search")
+    resumes = [r["file_name"] for r in list_resumes(search)]
 
     selected = st.selectbox("Select Resume", resumes)
-    if st.button("Delete"):
+    if READ_ONLY:
+        st.info(f"The {VECTOR_BACKEND} store is read-only: delete resumes on the writable node.")
+    elif selected and st.button("Delete"):
         delete_resume(selected)
-        os.remove(os.path.join(RESUME_DIR, selected))
+        path = os.path.join(RESUME_DIR, selected)
+        if os.path.exists(path):
+            os.remove(path)
         st.success("Resume deleted successfully!")
 
 # -------------------- TAB 4: SHORTLIST --------------------
@@ -116,20 +303,103 @@ with tabs[3]:
         value=3
     )
 
+    aggregator = st.selectbox(
+        "Resume score",
+        AGGREGATORS,
+        format_func=lambda a: {
+            "max": "Best matching chunk",
+            "mean_top_n": "Mean of top-n chunks",
+            "weighted": "Weighted sum of top chunks"
+        }[a]
+    )
+    top_n = 3
+    if aggregator == "mean_top_n":
+        top_n = st.slider("Chunks per resume (n)", 1, 10, 3)
+
+    hybrid = st.checkbox("Hybrid search (keywords + meaning)", value=True)
+    rerank = st.checkbox("Re-rank top chunks with a cross-encoder (slower, more precise)")
+    diversify = st.checkbox("Diversify results (push down near-clone resumes)")
+    mmr_lambda = None
+    if diversify:
+        mmr_lambda = st.slider("Relevance vs. diversity (λ)", 0.0, 1.0, MMR_LAMBDA, 0.05)
+
     if st.button("Shortlist"):
         if not job_desc.strip():
             st.error("Please enter a job description.")
         else:
-            results = vectorstore.similarity_search(
+            t0 = time.perf_counter()
+            # same JD + same index version -> served from memory, whatever top_k is
+            results = get_query_cache().shortlist(
+                vectorstore,
                 job_desc,
-                k=top_k
+                int(top_k),
+                ledger.index_version(),
+                aggregator=aggregator,
+                top_n=top_n,
+                keyword_index=keyword_index if hybrid else None,
+                dense_index=dense_index,
+                reranker=get_reranker() if rerank else None,
+                near_dup=near_dup,
+                mmr_lambda=mmr_lambda
             )
+            record_query(time.perf_counter() - t0)
 
             st.subheader("📌 Shortlisted Resumes")
-            shown = set()
+            if not results:
+                st.info("No resumes indexed yet.")
+
+            qs = get_query_cache().stats()
+            st.caption(
+                f"Query cache hit rate {qs['hit_rate']:.0%} "
+                f"({qs['saved_seconds']:.1f}s saved so far)"
+            )
+            if rerank:
+                rs = get_reranker().stats()
+                st.caption(
+                    f"Re-ranked in {time.perf_counter() - t0:.2f}s — "
+                    f"score cache hit rate {rs['hit_rate']:.0%}, "
+                    f"budget hit {rs['budget_expired']} times"
+                )
+
+            for r in results:
+                tag = " 🎯" if r.get("reranked") else ""
+                st.write(f"✅ {r['file_name']} — score {r['score']:.3f} ({r['chunks']} matching chunks){tag}")
+                with st.expander("Best matching section"):
+                    st.write(r["best_chunk"])
+
+# -------------------- TAB 5: BATCH SHORTLIST --------------------
+with tabs[4]:
+    st.header("Shortlist Resumes for Many Job Descriptions")
+    st.caption("CSV with a job_description column (job_id optional).")
+
+    jobs_file = st.file_uploader("Upload Job Descriptions CSV", type=["csv"])
+    batch_k = st.number_input("Resumes per job", min_value=1, max_value=50, value=5)
+    batch_aggregator = st.selectbox("Resume score", AGGREGATORS, key="batch_aggregator")
 
-            for doc in results:
-                fname = doc.metadata.get("file_name")
-                if fname not in shown:
-                    st.write(f"✅ {fname}")
-                    shown.add(fname)
\ No newline at end of file
+    if jobs_file and st.button("Run Batch Shortlist"):
+        try:
+            jobs = read_jobs_csv(io.StringIO(jobs_file.getvalue().decode("utf-8")))
+        except ValueError as e:
+            st.error(str(e))
+            jobs = []
+
+        if jobs:
+            rows, stats = shortlist_batch(
+                jobs,
+                vectorstore,
+                embedding_model,
+                k=int(batch_k),
+                aggregator=batch_aggregator,
+                near_dup=near_dup
+            )
+            st.success(
+                f"Scored {stats['jobs']} jobs against {stats['chunks']} chunks "
+                f"in {stats['total_seconds']:.1f}s"
+            )
+            st.dataframe(rows)
+            st.download_button(
+                "Download CSV",
+                rows_to_csv(rows),
+                file_name="shortlist.csv",
+                mime="text/csv"
+            )
@@ -0,0 +1,297 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import zlib
+
+import numpy as np
+
+from embed_cache import normalize_text
+
+# -------------------- CONFIG --------------------
+DEDUP_PATH = "near_dup.sqlite3"
+POLICIES = ["collapse", "skip", "off"]
+NUM_PERM = 128
+BANDS = 16                 # 16 bands x 8 rows -> candidates from ~0.7 Jaccard upwards
+SHINGLE_WORDS = 3
+THRESHOLD = 0.85           # estimated Jaccard at which two chunks count as the same text
+PAGE_SIZE = 1000
+
+_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(1)
+_A = _rng.integers(1, _PRIME, NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, _PRIME, NUM_PERM, dtype=np.uint64)
+
+
+# -------------------- MINHASH --------------------
+def shingles(text, k=SHINGLE_WORDS):
+    words = normalize_text(text).lower().split()
+    grams = {" ".join(words[i:i + k]) for i in range(max(len(words) - k + 1, 1))}
+    return np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64)
+
+
+def minhash(text):
+    x = shingles(text) % _PRIME
+    return ((np.outer(x, _A) + _B) % _PRIME).min(axis=0).astype(np.uint32)
+
+
+def band_keys(sig):
+    rows = NUM_PERM // BANDS
+    return [
+        (b, int.from_bytes(hashlib.blake2b(sig[b * rows:(b + 1) * rows].tobytes(), digest_size=8).digest(),
+                           "little", signed=True))
+        for b in range(BANDS)
+    ]
+
+
+def similarity(a, b):
+    return float((a == b).mean())
+
+
+def _owner(chunk_id):
+    # ids are "file_name::chunk_hash"
+    return chunk_id.split("::", 1)[0]
+
+
+# -------------------- INDEX --------------------
+class NearDupIndex:
+    """
+    MinHash signatures + LSH buckets of every stored (canonical) chunk.
+    A new chunk whose estimated Jaccard with a stored one reaches the threshold is
+      collapse -> not embedded; kept as a reference (dup id -> canonical id) so
+                  the canonical vector also counts for the referencing resume
+      skip     -> dropped altogether
+    """
+
+    def __init__(self, path=DEDUP_PATH, policy="collapse", threshold=THRESHOLD):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown policy: {policy}")
+        self.path = path
+        self.policy = policy
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS signatures (chunk_id TEXT PRIMARY KEY, sig BLOB NOT NULL)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS bands ("
+                " band INTEGER NOT NULL, key INTEGER NOT NULL, chunk_id TEXT NOT NULL,"
+                " PRIMARY KEY (band, key, chunk_id))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS refs ("
+                " dup_id TEXT PRIMARY KEY,"
+                " canonical_id TEXT NOT NULL,"
+                " file_name TEXT NOT NULL,"
+                " document TEXT,"
+                " metadata TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_refs_canonical ON refs (canonical_id)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def __len__(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM signatures").fetchone()[0]
+
+    def rebuild_from(self, vectorstore):
+        """One-off: signatures for a collection indexed before this file existed."""
+        collection = vectorstore._collection
+        for offset in range(0, collection.count(), PAGE_SIZE):
+            page = collection.get(include=["documents"], limit=PAGE_SIZE, offset=offset)
+            self.commit([(cid, minhash(text or "")) for cid, text in zip(page["ids"], page["documents"])], [])
+
+    # ---------- ingest ----------
+    def filter(self, ids, texts, metadatas, exclude=()):
+        """
+        Returns (keep, refs, signatures):
+          keep       : positions that still need a vector
+          refs       : (dup_id, canonical_id, file_name, text, metadata) for collapsed chunks
+          signatures : (chunk_id, sig) of the kept chunks, to store once they are committed
+        Chunks earlier in the same batch count as stored. A chunk never collapses
+        onto its own resume (an edited resume deletes its old chunks) nor onto
+        ids in exclude (deleted by the same write).
+        """
+        exclude = set(exclude)
+        if self.policy == "off" or not ids:
+            return list(range(len(ids))), [], []
+        keep = []
+        refs = []
+        fresh = []
+        pending = {}            # (band, key) -> positions in this batch
+        sigs = {}
+        with self._connect() as conn:
+            for pos, (cid, text, meta) in enumerate(zip(ids, texts, metadatas)):
+                sig = minhash(text)
+                keys = band_keys(sig)
+                best, best_sim = None, 0.0
+                mine = _owner(cid)
+
+                for other in {p for k in keys for p in pending.get(k, ())}:
+                    s = similarity(sig, sigs[other])
+                    if s > best_sim and _owner(ids[other]) != mine:
+                        best, best_sim = ids[other], s
+                stored = set()
+                for band, key in keys:
+                    stored.update(r[0] for r in conn.execute(
+                        "SELECT chunk_id FROM bands WHERE band = ? AND key = ?", (band, key)))
+                stored = {c for c in stored if c not in exclude and _owner(c) != mine}
+                for other, blob in self._signatures(conn, stored):
+                    s = similarity(sig, blob)
+                    if s > best_sim:
+                        best, best_sim = other, s
+
+                if best is not None and best_sim >= self.threshold:
+                    if self.policy == "collapse":
+                        refs.append((cid, best, (meta or {}).get("file_name", ""), text, meta))
+                    continue
+                keep.append(pos)
+                sigs[pos] = sig
+                fresh.append((cid, sig))
+                for k in keys:
+                    pending.setdefault(k, []).append(pos)
+        return keep, refs, fresh
+
+    @staticmethod
+    def _signatures(conn, chunk_ids):
+        chunk_ids = list(chunk_ids)
+        for i in range(0, len(chunk_ids), 500):
+            part = chunk_ids[i:i + 500]
+            marks = ",".join("?" * len(part))
+            for cid, blob in conn.execute(
+                    f"SELECT chunk_id, sig FROM signatures WHERE chunk_id IN ({marks})", part):
+                yield cid, np.frombuffer(blob, dtype=np.uint32)
+
+    def commit(self, signatures, refs):
+        """Store signatures of newly written chunks and the collapsed references, in one transaction."""
+        with self._lock, self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO signatures (chunk_id, sig) VALUES (?, ?)",
+                [(cid, sig.tobytes()) for cid, sig in signatures]
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO bands (band, key, chunk_id) VALUES (?, ?, ?)",
+                [(band, key, cid) for cid, sig in signatures for band, key in band_keys(sig)]
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO refs (dup_id, canonical_id, file_name, document, metadata) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(d, c, f, t, json.dumps(m or {})) for d, c, f, t, m in refs]
+            )
+
+    # ---------- query ----------
+    def canonical_of(self, ids):
+        """dup id -> canonical id, for the ids that are collapsed references."""
+        ids = list(ids)
+        found = {}
+        with self._connect() as conn:
+            for i in range(0, len(ids), 500):
+                part = ids[i:i + 500]
+                marks = ",".join("?" * len(part))
+                found.update(conn.execute(
+                    f"SELECT dup_id, canonical_id FROM refs WHERE dup_id IN ({marks})", part))
+        return found
+
+    def ref_ids(self, ids):
+        """The subset of ids that are collapsed references (no vector of their own)."""
+        return set(self.canonical_of(ids))
+
+    def references(self):
+        """All (dup_id, canonical_id, file_name) references."""
+        with self._connect() as conn:
+            return conn.execute("SELECT dup_id, canonical_id, file_name FROM refs").fetchall()
+
+    def _refs_of(self, conn, canonical_ids):
+        canonical_ids = list(canonical_ids)
+        for i in range(0, len(canonical_ids), 500):
+            part = canonical_ids[i:i + 500]
+            marks = ",".join("?" * len(part))
+            yield from conn.execute(
+                f"SELECT dup_id, canonical_id, file_name, document, metadata FROM refs "
+                f"WHERE canonical_id IN ({marks})", part)
+
+    def expand(self, ids, file_names, scores, texts=None):
+        """Every hit on a canonical chunk is also a hit, with the same score, for the resumes referencing it."""
+        if self.policy != "collapse" or not len(ids):
+            return ids, file_names, scores
+        pos = {cid: i for i, cid in enumerate(ids)}
+        extra_ids, extra_files, extra_scores = [], [], []
+        with self._connect() as conn:
+            for dup_id, canonical, file_name, doc, _ in self._refs_of(conn, pos):
+                if dup_id in pos:
+                    continue
+                extra_ids.append(dup_id)
+                extra_files.append(file_name)
+                extra_scores.append(scores[pos[canonical]])
+                if texts is not None:
+                    texts[dup_id] = doc
+        if not extra_ids:
+            return ids, file_names, scores
+        return (
+            list(ids) + extra_ids,
+            list(file_names) + extra_files,
+            np.concatenate([np.asarray(scores, dtype=np.float32), np.asarray(extra_scores, dtype=np.float32)])
+        )
+
+    # ---------- delete ----------
+    def release(self, vectorstore, ids):
+        """
+        Chunk ids are about to be deleted. A canonical chunk that other resumes
+        still reference is re-homed: its vector is copied to the first
+        referencing chunk, which becomes the new canonical.
+        Only reads; returns ((ids, texts, vectors, metadatas) to write before
+        deleting, moves) -- hand moves to forget() once the delete is committed.
+        """
+        out = ([], [], [], [])
+        moves = {}
+        if self.policy == "off" or not ids:
+            return out, moves
+        ids = list(ids)
+        gone = set(ids)
+        heirs = {}
+        with self._connect() as conn:
+            for dup_id, canonical, file_name, doc, meta in self._refs_of(conn, ids):
+                if dup_id not in gone:
+                    heirs.setdefault(canonical, (dup_id, doc, json.loads(meta or "{}")))
+        if heirs:
+            got = vectorstore._collection.get(ids=list(heirs), include=["embeddings"])
+            vectors = dict(zip(got["ids"], got["embeddings"]))
+            for canonical, (dup_id, doc, meta) in heirs.items():
+                if canonical not in vectors:
+                    continue
+                out[0].append(dup_id)
+                out[1].append(doc)
+                out[2].append(list(vectors[canonical]))
+                out[3].append(meta)
+                moves[canonical] = dup_id
+        return out, moves
+
+    def forget(self, ids, moves):
+        """Drop the deleted chunks' references and signatures and apply the re-homing, in one transaction."""
+        if self.policy == "off" or not ids:
+            return
+        ids = list(ids)
+        with self._lock, self._connect() as conn:
+            for i in range(0, len(ids), 500):
+                part = ids[i:i + 500]
+                marks = ",".join("?" * len(part))
+                conn.execute(f"DELETE FROM refs WHERE dup_id IN ({marks})", part)
+            for canonical, dup_id in moves.items():
+                conn.execute("DELETE FROM refs WHERE dup_id = ?", (dup_id,))
+                conn.execute("UPDATE refs SET canonical_id = ? WHERE canonical_id = ?", (dup_id, canonical))
+                conn.execute("UPDATE signatures SET chunk_id = ? WHERE chunk_id = ?", (dup_id, canonical))
+                conn.execute("UPDATE OR IGNORE bands SET chunk_id = ? WHERE chunk_id = ?", (dup_id, canonical))
+            for i in range(0, len(ids), 500):
+                part = ids[i:i + 500]
+                marks = ",".join("?" * len(part))
+                conn.execute(f"DELETE FROM signatures WHERE chunk_id IN ({marks})", part)
+                conn.execute(f"DELETE FROM bands WHERE chunk_id IN ({marks})", part)
+
+
+def dedup_stats(considered, collapsed, skipped):
+    return {
+        "considered": considered,
+        "collapsed": collapsed,
+        "skipped": skipped,
+        "dedup_ratio": (collapsed + skipped) / considered if considered else 0.0
+    }
@@ -0,0 +1,196 @@
+import argparse
+import os
+import threading
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# -------------------- CONFIG --------------------
+EMBED_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+EXPORT_DIR = "onnx_model"
+MAX_LENGTH = 256          # all-MiniLM-L6-v2 was trained on 256 word pieces
+BATCH_SIZE = 32
+FP32_FILE = "model.onnx"
+INT8_FILE = "model_int8.onnx"
+
+
+# -------------------- EXPORT --------------------
+def export_model(model_name=EMBED_MODEL, export_dir=EXPORT_DIR, quantize=True):
+    """
+    One-off: transformer -> ONNX graph (+ dynamic int8 weights).
+    Returns the path of the graph to load. Skipped if it already exists.
+    """
+    target = os.path.join(export_dir, INT8_FILE if quantize else FP32_FILE)
+    if os.path.exists(target):
+        return target
+
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(export_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    tokenizer.save_pretrained(export_dir)
+    model = AutoModel.from_pretrained(model_name).eval()
+
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    fp32 = os.path.join(export_dir, FP32_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (sample["input_ids"], sample["attention_mask"], sample["token_type_ids"]),
+            fp32,
+            input_names=["input_ids", "attention_mask", "token_type_ids"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "tokens"},
+                "attention_mask": {0: "batch", 1: "tokens"},
+                "token_type_ids": {0: "batch", 1: "tokens"},
+                "last_hidden_state": {0: "batch", 1: "tokens"}
+            },
+            opset_version=17
+        )
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(fp32, target, weight_type=QuantType.QInt8)
+    return target
+
+
+# -------------------- EMBEDDINGS --------------------
+class OnnxEmbeddings(Embeddings):
+    """
+    MiniLM on ONNX Runtime (CPU, all cores, int8 weights by default).
+    Texts are tokenized once, sorted by length and batched so each batch is
+    padded only to its own longest text; mean pooling + L2 normalization
+    match the sentence-transformers model.
+    """
+
+    def __init__(self, model_name=EMBED_MODEL, export_dir=EXPORT_DIR, quantize=True,
+                 batch_size=BATCH_SIZE, threads=None):
+        self.model_name = model_name
+        self.export_dir = export_dir
+        self.quantize = quantize
+        self.batch_size = batch_size
+        self.threads = threads or os.cpu_count() or 1
+        self._session = None
+        self._tokenizer = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._session is not None:
+            return
+        with self._lock:
+            if self._session is not None:
+                return
+            import onnxruntime as ort
+            from transformers import AutoTokenizer
+
+            path = export_model(self.model_name, self.export_dir, self.quantize)
+            options = ort.SessionOptions()
+            options.intra_op_num_threads = self.threads
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            self._tokenizer = AutoTokenizer.from_pretrained(self.export_dir)
+            self._session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+    def _encode(self, texts):
+        self._load()
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        tokens = self._tokenizer(texts, truncation=True, max_length=MAX_LENGTH)
+        ids = tokens["input_ids"]
+
+        # length buckets: neighbours in sorted order have similar lengths
+        order = np.argsort([len(x) for x in ids], kind="stable")
+        out = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            width = max(len(ids[i]) for i in batch)
+            input_ids = np.zeros((len(batch), width), dtype=np.int64)
+            mask = np.zeros((len(batch), width), dtype=np.int64)
+            for row, i in enumerate(batch):
+                input_ids[row, :len(ids[i])] = ids[i]
+                mask[row, :len(ids[i])] = 1
+            hidden = self._session.run(None, {
+                "input_ids": input_ids,
+                "attention_mask": mask,
+                "token_type_ids": np.zeros_like(input_ids)
+            })[0]
+            pooled = (hidden * mask[..., None]).sum(axis=1) / np.maximum(mask.sum(axis=1, keepdims=True), 1)
+            pooled /= np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+            for row, i in enumerate(batch):
+                out[i] = pooled[row]
+        return np.vstack(out).astype(np.float32)
+
+    def embed_documents(self, texts):
+        return self._encode(list(texts)).tolist()
+
+    def embed_query(self, text):
+        return self._encode([text])[0].tolist()
+
+    def embed_queries(self, texts):
+        # no query prompt: a query is encoded exactly like a document
+        return self._encode(list(texts)).tolist()
+
+
+# -------------------- PARITY / BENCHMARK --------------------
+def parity_check(reference, candidate, texts, min_cosine=0.98):
+    """
+    Cosine agreement between two embeddings objects on the same texts.
+    Raises AssertionError if any pair falls below min_cosine.
+    """
+    a = np.asarray(reference.embed_documents(texts), dtype=np.float32)
+    b = np.asarray(candidate.embed_documents(texts), dtype=np.float32)
+    a /= np.maximum(np.linalg.norm(a, axis=1, keepdims=True), 1e-12)
+    b /= np.maximum(np.linalg.norm(b, axis=1, keepdims=True), 1e-12)
+    cos = (a * b).sum(axis=1)
+    report = {"texts": len(texts), "min_cosine": float(cos.min()), "mean_cosine": float(cos.mean())}
+    assert report["min_cosine"] >= min_cosine, f"parity below {min_cosine}: {report}"
+    return report
+
+
+def sentences_per_second(embeddings, texts, repeats=3):
+    embeddings.embed_documents(texts[:8])       # load / warm up outside the timing
+    best = float("inf")
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        embeddings.embed_documents(texts)
+        best = min(best, time.perf_counter() - t0)
+    return len(texts) / best
+
+
+def sample_texts(n, seed=0):
+    """Resume-like sentences of very different lengths (the case length bucketing helps)."""
+    rng = np.random.default_rng(seed)
+    words = ("python java kubernetes docker aws azure sql spark pandas react node.js "
+             "led team of engineers built data pipelines for analytics, reduced latency by 40% "
+             "bachelor of technology computer science university experience years").split()
+    return [" ".join(rng.choice(words, size=int(rng.integers(4, 180)))) for _ in range(n)]
+
+
+# -------------------- CLI --------------------
+if __name__ == "__main__":
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+
+    parser = argparse.ArgumentParser(description="ONNX Runtime MiniLM backend")
+    parser.add_argument("command", choices=["export", "parity", "bench"])
+    parser.add_argument("--model", default=EMBED_MODEL)
+    parser.add_argument("--fp32", action="store_true", help="skip int8 quantization")
+    parser.add_argument("--n", type=int, default=512, help="sentences for parity / bench")
+    args = parser.parse_args()
+
+    onnx_model = OnnxEmbeddings(args.model, quantize=not args.fp32)
+    if args.command == "export":
+        print(export_model(args.model, quantize=not args.fp32))
+    else:
+        reference = HuggingFaceEmbeddings(model_name=args.model)
+        texts = sample_texts(args.n)
+        if args.command == "parity":
+            print(parity_check(reference, onnx_model, texts))
+        else:
+            torch_rate = sentences_per_second(reference, texts)
+            onnx_rate = sentences_per_second(onnx_model, texts)
+            print(f"{'backend':<12} {'sent/s':>9}")
+            print(f"{'torch':<12} {torch_rate:>9.1f}")
+            print(f"{'onnx-int8' if not args.fp32 else 'onnx-fp32':<12} {onnx_rate:>9.1f}")
+            print(f"speed-up     {onnx_rate / torch_rate:>8.2f}x")
@@ -0,0 +1,356 @@
+import argparse
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from langchain_core.documents import Document
+
+from ledger import file_hash
+
+# -------------------- CONFIG --------------------
+TEXT_CACHE_PATH = "pdf_text.sqlite3"
+# "pypdf"  : what PyPDFLoader runs -> identical text, chunk ids stay the same
+# "pymupdf": MuPDF (C), several times faster
+# "pdfium" : PDFium (C, Chrome's PDF engine)
+EXTRACTORS = ["pypdf", "pymupdf", "pdfium"]
+EXTRACTOR = os.getenv("PDF_EXTRACTOR", "pypdf")
+MAX_ENTRIES = 20_000       # cached PDFs, least recently used evicted first
+PAGE_BATCH = 32            # pages per cache write / read
+
+
+# -------------------- EXTRACTORS --------------------
+# each takes a path or a binary file object and yields page texts in order
+def _pypdf(source):
+    from pypdf import PdfReader
+
+    for page in PdfReader(source).pages:
+        yield page.extract_text() or ""
+
+
+def _pymupdf(source):
+    import fitz
+
+    doc = fitz.open(source) if isinstance(source, str) else fitz.open(stream=source.read(), filetype="pdf")
+    try:
+        for page in doc:
+            yield page.get_text()
+    finally:
+        doc.close()
+
+
+def _pdfium(source):
+    import pypdfium2 as pdfium
+
+    pdf = pdfium.PdfDocument(source)
+    try:
+        for page in pdf:
+            textpage = page.get_textpage()
+            yield textpage.get_text_range()
+            textpage.close()
+            page.close()
+    finally:
+        pdf.close()
+
+
+_BACKENDS = {"pypdf": _pypdf, "pymupdf": _pymupdf, "pdfium": _pdfium}
+
+
+def _pypdf_pages(source):
+    from pypdf import PdfReader
+
+    reader = PdfReader(source)
+    try:
+        # the root /Count, without flattening the whole page tree
+        return int(reader.trailer["/Root"]["/Pages"]["/Count"])
+    except (KeyError, TypeError, ValueError):
+        return len(reader.pages)
+
+
+def _pymupdf_pages(source):
+    import fitz
+
+    doc = fitz.open(source) if isinstance(source, str) else fitz.open(stream=source.read(), filetype="pdf")
+    try:
+        return doc.page_count
+    finally:
+        doc.close()
+
+
+def _pdfium_pages(source):
+    import pypdfium2 as pdfium
+
+    pdf = pdfium.PdfDocument(source)
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+
+# page tree only, no text extraction
+_COUNTERS = {"pypdf": _pypdf_pages, "pymupdf": _pymupdf_pages, "pdfium": _pdfium_pages}
+
+
+def get_extractor(name=None):
+    name = name or EXTRACTOR
+    if name not in _BACKENDS:
+        raise ValueError(f"Unknown extractor: {name} (choose from {', '.join(EXTRACTORS)})")
+    return _BACKENDS[name]
+
+
+# -------------------- CACHE --------------------
+class PageTextCache:
+    """
+    Extracted page texts in SQLite keyed by (PDF content hash, extractor),
+    one zlib-compressed row per page: long PDFs are written and read
+    PAGE_BATCH pages at a time, and only complete documents are served.
+    Short-lived connections: parse workers are separate processes.
+    """
+
+    def __init__(self, path=TEXT_CACHE_PATH, max_entries=MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                " file_hash TEXT NOT NULL,"
+                " extractor TEXT NOT NULL,"
+                " pages INTEGER NOT NULL DEFAULT 0,"
+                " complete INTEGER NOT NULL DEFAULT 0,"
+                " last_used REAL NOT NULL,"
+                " PRIMARY KEY (file_hash, extractor))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_last_used ON documents (last_used)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS page_texts ("
+                " file_hash TEXT NOT NULL,"
+                " extractor TEXT NOT NULL,"
+                " page INTEGER NOT NULL,"
+                " text BLOB NOT NULL,"
+                " PRIMARY KEY (file_hash, extractor, page))"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def page_count(self, f_hash, extractor):
+        """Pages of a completely cached document (marked as used), else None."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT pages FROM documents WHERE file_hash = ? AND extractor = ? AND complete = 1",
+                (f_hash, extractor)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE documents SET last_used = ? WHERE file_hash = ? AND extractor = ?",
+                (time.time(), f_hash, extractor)
+            )
+        return row[0]
+
+    def iter_pages(self, f_hash, extractor, pages):
+        for start in range(0, pages, PAGE_BATCH):
+            with self._connect() as conn:
+                rows = conn.execute(
+                    "SELECT text FROM page_texts WHERE file_hash = ? AND extractor = ?"
+                    " AND page >= ? AND page < ? ORDER BY page",
+                    (f_hash, extractor, start, start + PAGE_BATCH)
+                ).fetchall()
+            for (blob,) in rows:
+                yield zlib.decompress(blob).decode("utf-8")
+
+    def begin(self, f_hash, extractor):
+        """Start (or restart) writing a document; it is not served until finish()."""
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM page_texts WHERE file_hash = ? AND extractor = ?", (f_hash, extractor))
+            conn.execute(
+                "INSERT OR REPLACE INTO documents (file_hash, extractor, last_used) VALUES (?, ?, ?)",
+                (f_hash, extractor, time.time())
+            )
+
+    def write(self, f_hash, extractor, start, texts):
+        with self._lock, self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO page_texts (file_hash, extractor, page, text) VALUES (?, ?, ?, ?)",
+                [(f_hash, extractor, start + i, zlib.compress(t.encode("utf-8"))) for i, t in enumerate(texts)]
+            )
+
+    def finish(self, f_hash, extractor, pages):
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "UPDATE documents SET pages = ?, complete = 1, last_used = ? WHERE file_hash = ? AND extractor = ?",
+                (pages, time.time(), f_hash, extractor)
+            )
+            over = conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0] - self.max_entries
+            if over > 0:
+                # least recently used first; abandoned partial writes age out the same way
+                old = conn.execute(
+                    "SELECT file_hash, extractor FROM documents ORDER BY last_used LIMIT ?", (over,)
+                ).fetchall()
+                conn.executemany("DELETE FROM page_texts WHERE file_hash = ? AND extractor = ?", old)
+                conn.executemany("DELETE FROM documents WHERE file_hash = ? AND extractor = ?", old)
+
+
+# -------------------- EXTRACTION --------------------
+def _open(source):
+    """Path stays a path; bytes / uploaded files become a seekable binary stream."""
+    if isinstance(source, str):
+        return source
+    if isinstance(source, (bytes, bytearray)):
+        return io.BytesIO(source)
+    if hasattr(source, "getvalue"):             # streamlit UploadedFile, BytesIO
+        return io.BytesIO(source.getvalue())
+    return io.BytesIO(source.read())
+
+
+def content_hash(source):
+    # same digest as the ledger's file hash, so both can be passed around
+    if isinstance(source, str):
+        return file_hash(source)
+    return hashlib.sha256(source.getvalue()).hexdigest()
+
+
+def iter_page_texts(source, extractor=None, cache_path=TEXT_CACHE_PATH, f_hash=None):
+    """
+    Page texts of a PDF (path, bytes or file object), one at a time.
+    Served from the cache when the same bytes were extracted before; otherwise
+    extracted lazily and written to the cache PAGE_BATCH pages at a time
+    (served from there once the last page is through).
+    cache_path=None skips the cache.
+    """
+    extractor = extractor or EXTRACTOR
+    extract = get_extractor(extractor)
+    source = _open(source)
+    if cache_path is None:
+        yield from extract(source)
+        return
+
+    cache = PageTextCache(cache_path)
+    f_hash = f_hash or content_hash(source)
+    pages = cache.page_count(f_hash, extractor)
+    if pages is not None:
+        yield from cache.iter_pages(f_hash, extractor, pages)
+        return
+    cache.begin(f_hash, extractor)
+    pages = 0
+    batch = []
+    for text in extract(source):
+        yield text
+        batch.append(text)
+        if len(batch) >= PAGE_BATCH:
+            cache.write(f_hash, extractor, pages, batch)
+            pages += len(batch)
+            batch = []
+    if batch:
+        cache.write(f_hash, extractor, pages, batch)
+        pages += len(batch)
+    cache.finish(f_hash, extractor, pages)
+
+
+def page_count(source, extractor=None, cache_path=TEXT_CACHE_PATH, f_hash=None):
+    """Number of pages, from the text cache when the PDF was extracted before."""
+    extractor = extractor or EXTRACTOR
+    get_extractor(extractor)
+    source = _open(source)
+    if cache_path is not None:
+        pages = PageTextCache(cache_path).page_count(f_hash or content_hash(source), extractor)
+        if pages is not None:
+            return pages
+    return _COUNTERS[extractor](source)
+
+
+def extract_pages(source, extractor=None, cache_path=TEXT_CACHE_PATH, f_hash=None):
+    return list(iter_page_texts(source, extractor, cache_path, f_hash))
+
+
+def iter_documents(source, extractor=None, cache_path=TEXT_CACHE_PATH, f_hash=None, name=None):
+    """Same Document / metadata shape as PyPDFLoader.lazy_load()."""
+    name = name or (source if isinstance(source, str) else getattr(source, "name", ""))
+    for i, text in enumerate(iter_page_texts(source, extractor, cache_path, f_hash)):
+        yield Document(page_content=text, metadata={"source": name, "page": i})
+
+
+def load_documents(source, extractor=None, cache_path=TEXT_CACHE_PATH, f_hash=None, name=None):
+    return list(iter_documents(source, extractor, cache_path, f_hash, name))
+
+
+# -------------------- BENCHMARK --------------------
+def _words(pages):
+    return set(" ".join(pages).lower().split())
+
+
+def bench(folder, extractors=EXTRACTORS, reference="pypdf", cache_path=None):
+    """
+    Pages/s of every extractor on the PDFs in folder (no cache), word-level
+    parity against the reference extractor, and the pages/s of a cache hit.
+    """
+    files = sorted(os.path.join(folder, n) for n in os.listdir(folder) if n.lower().endswith(".pdf"))
+    texts = {}
+    rows = []
+    for name in extractors:
+        try:
+            get_extractor(name)
+            texts[name] = {}
+            pages = 0
+            t0 = time.perf_counter()
+            for path in files:
+                texts[name][path] = extract_pages(path, name, cache_path=None)
+                pages += len(texts[name][path])
+            seconds = time.perf_counter() - t0
+        except ImportError as e:
+            rows.append({"extractor": name, "error": f"not installed ({e.name})"})
+            texts.pop(name, None)
+            continue
+        rows.append({"extractor": name, "files": len(files), "pages": pages, "seconds": seconds,
+                     "pages_per_sec": pages / seconds if seconds else 0.0})
+
+    # word-set Jaccard per file: layout / spacing differences don't count
+    for row in rows:
+        name = row["extractor"]
+        if name not in texts or reference not in texts:
+            continue
+        scores = []
+        for path in files:
+            a, b = _words(texts[reference][path]), _words(texts[name][path])
+            scores.append(len(a & b) / len(a | b) if a | b else 1.0)
+        row["parity_mean"] = sum(scores) / len(scores) if scores else 1.0
+        row["parity_min"] = min(scores) if scores else 1.0
+
+    if cache_path is not None and reference in texts:
+        for path in files:
+            extract_pages(path, reference, cache_path)          # fill
+        pages = 0
+        t0 = time.perf_counter()
+        for path in files:
+            pages += len(extract_pages(path, reference, cache_path))
+        seconds = time.perf_counter() - t0
+        rows.append({"extractor": f"{reference} (cached)", "files": len(files), "pages": pages,
+                     "seconds": seconds, "pages_per_sec": pages / seconds if seconds else 0.0})
+    return rows
+
+
+# -------------------- CLI --------------------
+if __name__ == "__main__":
+    import tempfile
+
+    parser = argparse.ArgumentParser(description="Compare PDF text extractors on a folder of resumes")
+    parser.add_argument("--folder", default="resumes")
+    parser.add_argument("--extractors", nargs="+", default=EXTRACTORS, choices=EXTRACTORS)
+    parser.add_argument("--reference", default="pypdf", choices=EXTRACTORS)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        rows = bench(args.folder, args.extractors, args.reference, os.path.join(tmp, TEXT_CACHE_PATH))
+    print(f"{'extractor':<16} {'pages/s':>9} {'parity':>7} {'min':>6}")
+    for row in rows:
+        if "error" in row:
+            print(f"{row['extractor']:<16} {row['error']}")
+            continue
+        parity = f"{row['parity_mean']:>7.3f} {row['parity_min']:>6.3f}" if "parity_mean" in row else ""
+        print(f"{row['extractor']:<16} {row['pages_per_sec']:>9.1f} {parity}")
@@ -0,0 +1,527 @@
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+
+import numpy as np
+
+# -------------------- CONFIG --------------------
+MODES = ["float16", "int8", "binary"]
+INDEX_DIR = "quantized_index"
+RESCORE_FACTOR = 4      # candidates kept from the first pass per wanted hit
+BLOCK_ROWS = 32768      # rows decoded at once during the first pass
+PAGE_SIZE = 5000
+ROWS_FILE = "rows.sqlite3"
+REFIT_MARGIN = 0.2      # int8: re-encode once a new vector exceeds the scale by this much
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+# -------------------- CODECS --------------------
+def normalize(x):
+    x = np.asarray(x, dtype=np.float32)
+    return x / np.maximum(np.linalg.norm(x, axis=-1, keepdims=True), 1e-12)
+
+
+def fit_scale(x):
+    # per-dimension symmetric int8 scale
+    return np.maximum(np.abs(x).max(axis=0), 1e-6).astype(np.float32) / 127.0
+
+
+def encode(x, mode, scale=None):
+    if mode == "float16":
+        return x.astype(np.float16)
+    if mode == "int8":
+        return np.clip(np.rint(x / scale), -127, 127).astype(np.int8)
+    if mode == "binary":
+        return np.packbits(x > 0, axis=1)
+    raise ValueError(f"Unknown mode: {mode}")
+
+
+def first_pass_scores(codes, q, mode, scale=None):
+    """Approximate similarity of q against every code row (higher is better)."""
+    out = np.empty(len(codes), dtype=np.float32)
+    if mode == "binary":
+        q_bits = np.packbits(q > 0)
+    elif mode == "int8":
+        q_scaled = (q * scale).astype(np.float32)
+    for i in range(0, len(codes), BLOCK_ROWS):
+        block = codes[i:i + BLOCK_ROWS]
+        if mode == "float16":
+            out[i:i + len(block)] = block.astype(np.float32) @ q
+        elif mode == "int8":
+            out[i:i + len(block)] = block.astype(np.float32) @ q_scaled
+        else:
+            out[i:i + len(block)] = -_POPCOUNT[block ^ q_bits].sum(axis=1, dtype=np.int32)
+    return out
+
+
+def two_stage_search(codes, full, alive, q, n, mode, scale=None, rescore=RESCORE_FACTOR):
+    """
+    Cheap search over the codes, then exact float32 rescoring of the
+    n * rescore best candidates. Returns (row indices, exact scores), best first.
+    """
+    q = normalize(q)
+    approx = first_pass_scores(codes, q, mode, scale)
+    approx[~alive] = -np.inf
+
+    n_alive = int(alive.sum())
+    n = min(n, n_alive)
+    if n == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+    m = min(n * rescore, n_alive)
+    cand = np.argpartition(-approx, m - 1)[:m]
+    cand.sort()                                  # sequential reads from the store
+    exact = np.asarray(full[cand], dtype=np.float32) @ q
+
+    best = np.argpartition(-exact, n - 1)[:n]
+    best = best[np.argsort(-exact[best])]
+    return cand[best], exact[best]
+
+
+# -------------------- STORE VECTORS --------------------
+def fetch_vectors(collection, ids, dim):
+    """Normalized float32 rows for ids, in order, read from the vector store (zeros for ids it lacks)."""
+    out = np.zeros((len(ids), dim), dtype=np.float32)
+    for i in range(0, len(ids), PAGE_SIZE):
+        batch = ids[i:i + PAGE_SIZE]
+        got = collection.get(ids=list(dict.fromkeys(batch)), include=["embeddings"])
+        if not got["ids"]:
+            continue
+        pos = {cid: j for j, cid in enumerate(got["ids"])}
+        found = [(k, pos[cid]) for k, cid in enumerate(batch) if cid in pos]
+        if found:
+            dst, src = map(list, zip(*found))
+            out[i + np.asarray(dst)] = np.asarray(got["embeddings"], dtype=np.float32)[src]
+    return normalize(out)
+
+
+class StoreVectors:
+    """
+    Index rows -> full-precision vectors, looked up in the collection the
+    index sits next to (the flat store's memory-mapped file, Chroma's own
+    copy), so the index keeps no second float32 file.
+    """
+
+    def __init__(self, collection, ids, dim):
+        self.collection = collection
+        self.ids = ids
+        self.dim = dim
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, rows):
+        return fetch_vectors(self.collection, [self.ids[r] for r in np.asarray(rows).tolist()], self.dim)
+
+
+# -------------------- INDEX --------------------
+def code_shape(mode, dim):
+    """(dtype, columns) of one code row."""
+    if mode == "float16":
+        return np.float16, dim
+    if mode == "int8":
+        return np.int8, dim
+    return np.uint8, (dim + 7) // 8
+
+
+class QuantizedIndex:
+    """
+    Resident compressed codes for the first pass; the candidates are rescored
+    with the full-precision vectors the vector store already holds.
+    Kept next to the collection and updated on add / delete. Codes are
+    appended to a raw file, ids live in SQLite and are committed per batch
+    (same layout and cross-process sync as FlatCollection).
+    The int8 scale is refitted, and every code re-encoded, once new vectors
+    fall well outside it.
+    """
+
+    def __init__(self, path, vectorstore, mode="int8"):
+        self.path = path
+        self.collection = vectorstore._collection
+        self._lock = threading.RLock()
+        os.makedirs(path, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(path, ROWS_FILE), timeout=30,
+                                     isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS rows ("
+            " row INTEGER PRIMARY KEY,"
+            " chunk_id TEXT NOT NULL,"
+            " file_name TEXT NOT NULL,"
+            " alive INTEGER NOT NULL,"
+            " version INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_rows_version ON rows (version)")
+        self._conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('mode', ?)", (mode,))
+        self.mode = mode
+        self._reset()
+        self._sync()
+
+    def _reset(self):
+        self.dim = None
+        self.scale = None
+        self.ids = []
+        self.file_names = []
+        self.row_of = {}
+        self.alive = np.zeros(0, dtype=bool)
+        self.codes = None
+        self.version = 0
+        self.generation = None         # changes when refit / compact rewrite the files
+        self.codes_path = os.path.join(self.path, "codes.bin")
+
+    def close(self):
+        self._conn.close()
+
+    def __len__(self):
+        with self._lock:
+            self._sync()
+            return len(self.row_of)
+
+    def _full(self):
+        return StoreVectors(self.collection, self.ids, self.dim or 0)
+
+    def _materialize(self):
+        """Every row as one float32 matrix (dead rows zero) -- for the recall report only."""
+        full = np.zeros((len(self.ids), self.dim or 0), dtype=np.float32)
+        live = np.flatnonzero(self.alive)
+        for i in range(0, len(live), PAGE_SIZE):
+            full[live[i:i + PAGE_SIZE]] = self._full()[live[i:i + PAGE_SIZE]]
+        return full
+
+    def _read_codes(self, start, stop):
+        dtype, cols = code_shape(self.mode, self.dim)
+        width = np.dtype(dtype).itemsize * cols
+        with open(self.codes_path, "rb") as f:
+            f.seek(start * width)
+            return np.frombuffer(f.read((stop - start) * width), dtype=dtype).reshape(-1, cols)
+
+    # ---------- storage ----------
+    def _sync(self):
+        """Apply rows committed since this process last looked (by anyone)."""
+        with self._lock:
+            meta = dict(self._conn.execute("SELECT key, value FROM meta"))
+            version = int(meta.get("version", 0))
+            if version == self.version and meta.get("generation") == self.generation:
+                return
+            if meta.get("generation") != self.generation:
+                self._reset()
+                self.generation = meta.get("generation")
+            self.mode = meta["mode"]
+            if meta.get("dim"):
+                self.dim = int(meta["dim"])
+            if meta.get("scale"):
+                self.scale = np.asarray(json.loads(meta["scale"]), dtype=np.float32)
+            self.codes_path = os.path.join(self.path, meta.get("codes_file", "codes.bin"))
+
+            records = self._conn.execute(
+                "SELECT row, chunk_id, file_name, alive FROM rows WHERE version > ? ORDER BY row",
+                (self.version,)).fetchall()
+            start = len(self.ids)
+            new = [r for r in records if r[0] >= start]       # contiguous, ascending
+            if new:
+                self.ids.extend(r[1] for r in new)
+                self.file_names.extend(r[2] for r in new)
+                self.alive = np.concatenate([self.alive, np.zeros(len(new), dtype=bool)])
+            for row, cid, _, alive in records:
+                self.alive[row] = bool(alive)
+                if alive:
+                    self.row_of[cid] = row
+                elif self.row_of.get(cid) == row:
+                    del self.row_of[cid]
+            if new:
+                codes = self._read_codes(start, len(self.ids))
+                self.codes = codes if self.codes is None else np.concatenate([self.codes, codes])
+            self.version = version
+
+    @contextmanager
+    def _write(self):
+        """One SQLite write transaction (serializes writers across processes); yields its version."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._sync()
+                version = self.version + 1
+                yield version
+                self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('version', ?)",
+                                   (str(version),))
+                self._conn.execute("COMMIT")
+                self.version = version
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                self._reset()           # in-memory state may be half applied -> reload
+                self._sync()
+                raise
+
+    def _set_meta(self, **values):
+        self._conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", list(values.items()))
+
+    @staticmethod
+    def _append(path, data, offset):
+        if not os.path.exists(path):
+            open(path, "wb").close()
+        with open(path, "r+b") as f:
+            if os.path.getsize(path) > offset:
+                f.truncate(offset)      # rows of a write that never committed
+            f.seek(offset)
+            f.write(data)
+
+    # ---------- updates ----------
+    def add(self, ids, vectors, metadatas, refit=True):
+        if not ids:
+            return
+        x = normalize(vectors)
+        with self._write() as version:
+            if self.dim is None:
+                self.dim = x.shape[1]
+                self._set_meta(dim=str(self.dim))
+                if self.mode == "int8":
+                    self.scale = fit_scale(x)
+                    self._set_meta(scale=json.dumps(self.scale.tolist()))
+            dead = sorted({self.row_of.pop(cid) for cid in ids if cid in self.row_of})
+            self.alive[dead] = False
+            self._conn.executemany("UPDATE rows SET alive = 0, version = ? WHERE row = ?",
+                                   [(version, row) for row in dead])
+
+            codes = encode(x, self.mode, self.scale)
+            start = len(self.ids)
+            self._append(self.codes_path, codes.tobytes(), start * codes[0].nbytes)
+            file_names = [(m or {}).get("file_name", "") for m in metadatas]
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO rows (row, chunk_id, file_name, alive, version) VALUES (?, ?, ?, 1, ?)",
+                [(start + i, cid, name, version) for i, (cid, name) in enumerate(zip(ids, file_names))]
+            )
+            self.codes = codes if self.codes is None else np.concatenate([self.codes, codes])
+            self.ids.extend(ids)
+            self.file_names.extend(file_names)
+            self.alive = np.concatenate([self.alive, np.ones(len(ids), dtype=bool)])
+            for i, cid in enumerate(ids):
+                self.row_of[cid] = start + i
+        if refit and self.mode == "int8" and \
+                (np.abs(x).max(axis=0) > self.scale * 127.0 * (1.0 + REFIT_MARGIN)).any():
+            self.refit()
+
+    def delete(self, ids):
+        with self._write() as version:
+            rows = sorted({self.row_of.pop(cid) for cid in ids if cid in self.row_of})
+            self.alive[rows] = False
+            self._conn.executemany("UPDATE rows SET alive = 0, version = ? WHERE row = ?",
+                                   [(version, row) for row in rows])
+
+    def delete_file(self, file_name):
+        with self._lock:
+            self._sync()
+            rows = [i for i, name in enumerate(self.file_names) if name == file_name and self.alive[i]]
+            self.delete([self.ids[i] for i in rows])
+
+    def save(self):
+        # every write is committed as it happens; kept for existing callers
+        pass
+
+    def refit(self):
+        """Fit the int8 scale to every live vector and re-encode all codes into a new file."""
+        if self.mode != "int8":
+            return
+        with self._write():
+            if not self.ids:
+                return
+            full = self._full()
+            live = np.flatnonzero(self.alive)
+            peak = np.zeros(self.dim, dtype=np.float32)
+            for i in range(0, len(live), PAGE_SIZE):
+                peak = np.maximum(peak, np.abs(full[live[i:i + PAGE_SIZE]]).max(axis=0))
+            self.scale = fit_scale(peak[None, :])
+            old = self.codes_path
+            self.codes_path = os.path.join(self.path, f"codes-{uuid.uuid4().hex[:8]}.bin")
+            with open(self.codes_path, "wb") as f:
+                for i in range(0, len(self.ids), PAGE_SIZE):
+                    # dead rows are never scored; their codes only hold the row numbers
+                    rows = np.arange(i, min(i + PAGE_SIZE, len(self.ids)))
+                    keep = self.alive[rows]
+                    block = np.zeros((len(rows), self.dim), dtype=np.float32)
+                    if keep.any():
+                        block[keep] = full[rows[keep]]
+                    f.write(encode(block, self.mode, self.scale).tobytes())
+            self.codes = self._read_codes(0, len(self.ids))
+            self.generation = uuid.uuid4().hex
+            self._set_meta(scale=json.dumps(self.scale.tolist()),
+                           codes_file=os.path.basename(self.codes_path), generation=self.generation)
+        _remove(old)
+
+    # ---------- compaction ----------
+    def tombstones(self):
+        with self._lock:
+            self._sync()
+            return len(self.ids) - len(self.row_of), len(self.ids)
+
+    def compact(self):
+        """
+        Drop deleted rows from the codes. The new file is written first;
+        renumbering the rows in the same transaction as naming it is the
+        swap. Returns (rows before, rows after).
+        """
+        with self._write() as version:
+            n = len(self.ids)
+            keep = np.flatnonzero(self.alive)
+            codes_path = os.path.join(self.path, f"codes-{uuid.uuid4().hex[:8]}.bin")
+            self.codes = self.codes[keep] if self.codes is not None else None
+            if self.codes is not None:
+                self.codes.tofile(codes_path)
+            self.ids = [self.ids[r] for r in keep]
+            self.file_names = [self.file_names[r] for r in keep]
+            self.alive = np.ones(len(keep), dtype=bool)
+            self.row_of = {cid: i for i, cid in enumerate(self.ids)}
+            old = self.codes_path
+            self.codes_path = codes_path
+            self.generation = uuid.uuid4().hex
+            self._conn.execute("DELETE FROM rows")
+            self._conn.executemany(
+                "INSERT INTO rows (row, chunk_id, file_name, alive, version) VALUES (?, ?, ?, 1, ?)",
+                [(i, cid, name, version) for i, (cid, name) in enumerate(zip(self.ids, self.file_names))]
+            )
+            self._set_meta(codes_file=os.path.basename(codes_path), generation=self.generation)
+        _remove(old)
+        return n, len(self.ids)
+
+    # ---------- search ----------
+    def search(self, query_vector, n, rescore=RESCORE_FACTOR):
+        """Top-n (ids, file_names, exact cosine scores), best first."""
+        with self._lock:
+            self._sync()
+            if not self.row_of:
+                return [], [], np.empty(0, dtype=np.float32)
+            rows, scores = two_stage_search(
+                self.codes, self._full(), self.alive, query_vector, n, self.mode, self.scale, rescore
+            )
+            return [self.ids[r] for r in rows], [self.file_names[r] for r in rows], scores
+
+    def memory_bytes(self):
+        return 0 if self.codes is None else int(self.codes.nbytes)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass        # still open (Windows) or never written
+
+
+def build_from(vectorstore, path, mode="int8"):
+    """(Re)build the quantized index from everything in the collection; int8 is fitted on all of it."""
+    if os.path.isdir(path):
+        for name in os.listdir(path):
+            if name.startswith(("rows.", "codes", "vectors")):
+                os.remove(os.path.join(path, name))
+    index = QuantizedIndex(path, vectorstore, mode)
+    collection = vectorstore._collection
+    for offset in range(0, collection.count(), PAGE_SIZE):
+        page = collection.get(include=["embeddings", "metadatas"], limit=PAGE_SIZE, offset=offset)
+        index.add(page["ids"], page["embeddings"], page["metadatas"], refit=False)
+    index.refit()
+    return index
+
+
+# -------------------- RECALL / MEMORY REPORT --------------------
+def _recall(codes, full, alive, mode, scale, k, n_queries, rescore_factors, seed):
+    """Recall@k per rescore factor against exact float32 search over the live rows."""
+    rng = np.random.default_rng(seed)
+    live = np.flatnonzero(alive)
+    picks = np.sort(rng.choice(live, size=min(n_queries, len(live)), replace=False))
+    queries = normalize(np.asarray(full[picks]) + rng.normal(scale=0.05, size=(len(picks), full.shape[1])))
+
+    k = min(k, len(live))
+    exact = []
+    for q in queries:
+        s = np.asarray(full) @ q
+        s[~alive] = -np.inf
+        exact.append(set(np.argpartition(-s, k - 1)[:k].tolist()))
+    out = {}
+    for r in rescore_factors:
+        hits = 0
+        for q, truth in zip(queries, exact):
+            got, _ = two_stage_search(codes, full, alive, q, k, mode, scale, r)
+            hits += len(truth.intersection(got.tolist()))
+        out[r] = hits / (k * len(queries))
+    return out
+
+
+def index_recall(index, k=10, n_queries=200, rescore_factors=(1, 4, 10), seed=0):
+    """Recall@k of the deployed index: its own codes and scale, not a fresh fit."""
+    with index._lock:
+        index._sync()
+        recall = _recall(index.codes, index._materialize(), index.alive, index.mode, index.scale,
+                         k, n_queries, rescore_factors, seed)
+        return [{
+            "mode": f"{index.mode} (live)",
+            "rescore": r,
+            "recall_at_k": value,
+            "resident_bytes": index.memory_bytes(),
+            "bytes_per_vector": index.codes[0].nbytes
+        } for r, value in recall.items()]
+
+
+def recall_report(matrix, k=10, n_queries=200, rescore_factors=(1, 4, 10), seed=0):
+    """
+    Recall@k every mode would reach if fitted on these vectors, against exact
+    float32 search, using stored chunk vectors (plus a little noise) as queries.
+    One row per (mode, rescore).
+    """
+    full = normalize(matrix)
+    alive = np.ones(len(full), dtype=bool)
+    rows = [{
+        "mode": "float32",
+        "rescore": "-",
+        "recall_at_k": 1.0,
+        "resident_bytes": int(full.nbytes),
+        "bytes_per_vector": full.shape[1] * 4
+    }]
+    for mode in MODES:
+        scale = fit_scale(full) if mode == "int8" else None
+        codes = encode(full, mode, scale)
+        recall = _recall(codes, full, alive, mode, scale, k, n_queries, rescore_factors, seed)
+        rows.extend({
+            "mode": mode,
+            "rescore": r,
+            "recall_at_k": value,
+            "resident_bytes": int(codes.nbytes),
+            "bytes_per_vector": int(codes.nbytes // len(full))
+        } for r, value in recall.items())
+    return rows
+
+
+# -------------------- CLI --------------------
+if __name__ == "__main__":
+    from batch_shortlist import load_resume_matrix
+    from resources import VECTOR_BACKEND, get_embedding_model, get_vectorstore
+
+    parser = argparse.ArgumentParser(description="Quantized first-pass index for resume vectors")
+    parser.add_argument("command", choices=["build", "report"])
+    parser.add_argument("--mode", choices=MODES, default="int8")
+    parser.add_argument("--chroma-dir", default="chroma_db")
+    parser.add_argument("--backend", default=VECTOR_BACKEND)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    vectorstore = get_vectorstore(args.chroma_dir, get_embedding_model(), args.backend)
+    path = os.path.join(getattr(vectorstore, "_persist_directory", None) or args.chroma_dir, INDEX_DIR)
+    if args.command == "build":
+        index = build_from(vectorstore, path, args.mode)
+        print(f"{len(index)} vectors, {index.memory_bytes() / 1e6:.1f} MB resident ({args.mode})")
+    else:
+        rows = []
+        if os.path.exists(os.path.join(path, ROWS_FILE)):
+            index = QuantizedIndex(path, vectorstore)
+            if len(index):
+                rows += index_recall(index, k=args.k)
+        matrix, _ = load_resume_matrix(vectorstore)
+        if len(matrix):
+            rows += recall_report(matrix, k=args.k)
+        print(f"{'mode':<16} {'rescore':>7} {'recall@k':>9} {'resident MB':>12} {'B/vector':>9}")
+        for row in rows:
+            print(f"{row['mode']:<16} {str(row['rescore']):>7} {row['recall_at_k']:>9.3f} "
+                  f"{row['resident_bytes'] / 1e6:>12.2f} {row['bytes_per_vector']:>9}")
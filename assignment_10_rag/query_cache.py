@@ -0,0 +1,104 @@
+import threading
+import time
+from collections import OrderedDict
+
+from embed_cache import normalize_text
+from ranking import MMR_POOL, chunk_vectors, diversify, rank_resumes
+
+# -------------------- CONFIG --------------------
+FETCH_DEPTH = 50        # resumes ranked per cached entry; any top_k up to this is a hit
+MAX_ENTRIES = 256
+MAX_VECTORS = 1024
+
+
+def _option_key(options):
+    # indexes / rerankers are keyed by whether they are used, not by identity
+    return tuple(sorted(
+        (name, value if value is None or isinstance(value, (str, int, float, tuple)) else type(value).__name__)
+        for name, value in options.items()
+    ))
+
+
+# -------------------- QUERY CACHE --------------------
+class QueryCache:
+    """
+    In-memory LRU of shortlist results keyed by (normalized job description,
+    index version, ranking options). Each entry holds a ranked list FETCH_DEPTH
+    resumes deep, so changing top_k is served from memory.
+    MMR requests share the plain ranking: it is diversified per request over its
+    best k * MMR_POOL, as rank_resumes would, with the chunk vectors kept in the entry.
+    Query vectors are kept separately by text only -- they survive a version bump.
+    """
+
+    def __init__(self, depth=FETCH_DEPTH, max_entries=MAX_ENTRIES, max_vectors=MAX_VECTORS):
+        self.depth = depth
+        self.max_entries = max_entries
+        self.max_vectors = max_vectors
+        self._lock = threading.Lock()
+        self._results = OrderedDict()    # key -> (depth, results, compute_seconds, chunk vectors)
+        self._vectors = OrderedDict()    # normalized text -> query vector
+        self._version = None
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+    def _remember(self, table, key, value, limit):
+        table[key] = value
+        table.move_to_end(key)
+        while len(table) > limit:
+            table.popitem(last=False)
+
+    def shortlist(self, vectorstore, query, k, version, **options):
+        """rank_resumes(vectorstore, query, k, **options), served from cache when possible."""
+        t0 = time.perf_counter()
+        text = normalize_text(query)
+        mmr_lambda = options.pop("mmr_lambda", None)
+        need = k if mmr_lambda is None else k * MMR_POOL
+        key = (text, version, _option_key(options))
+        with self._lock:
+            if self._version is None or version > self._version:
+                # index changed -> every cached ranking is stale
+                self._results.clear()
+                self._version = version
+            entry = self._results.get(key)
+            if entry is not None and need <= entry[0]:
+                self._results.move_to_end(key)
+                self.hits += 1
+                self.saved_seconds += max(entry[2] - (time.perf_counter() - t0), 0.0)
+            else:
+                entry = None
+            query_vector = self._vectors.get(text)
+
+        if entry is None:
+            if query_vector is None:
+                query_vector = vectorstore.embeddings.embed_query(query)
+            depth = max(need, self.depth)
+            results = rank_resumes(vectorstore, query, depth, query_vector=query_vector, **options)
+            entry = (depth, results, time.perf_counter() - t0, {})
+            # a rerank cut short by its budget is served once, not cached:
+            # the next request picks up where it stopped (scored pairs are cached)
+            complete = all(r.get("rerank_complete", True) for r in results)
+            with self._lock:
+                self.misses += 1
+                self._remember(self._vectors, text, query_vector, self.max_vectors)
+                if version == self._version and complete:
+                    self._remember(self._results, key, entry, self.max_entries)
+
+        results = [dict(r) for r in entry[1][:need]]
+        if mmr_lambda is not None:
+            vectors = entry[3]
+            missing = [r["best_chunk_id"] for r in results if r["best_chunk_id"] not in vectors]
+            if missing:
+                vectors.update(chunk_vectors(vectorstore, missing, options.get("near_dup")))
+            results = diversify(results, vectors, k, mmr_lambda)
+        return results
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "saved_seconds": self.saved_seconds,
+            "entries": len(self._results)
+        }
@@ -0,0 +1,242 @@
+import numpy as np
+
+# -------------------- CONFIG --------------------
+AGGREGATORS = ["max", "mean_top_n", "weighted"]
+OVERFETCH = 4          # chunk hits fetched per wanted resume on the first try
+MIN_FETCH = 20
+MAX_FETCH = 2000       # hard cap -> latency stays bounded on 100k+ chunk indexes
+DEFAULT_WEIGHTS = (1.0, 0.5, 0.25)
+RRF_K = 60             # reciprocal-rank fusion constant
+MMR_LAMBDA = 0.7       # 1.0 = pure relevance, 0.0 = pure diversity
+MMR_POOL = 4           # candidate resumes considered per wanted resume
+
+
+# -------------------- SCORES --------------------
+def to_similarity(distances, space="l2"):
+    """Chroma returns distances; turn them into 'higher is better' scores."""
+    d = np.asarray(distances, dtype=np.float32)
+    if space == "cosine":
+        return 1.0 - d
+    if space == "ip":
+        return -d
+    # squared L2 on unit vectors: d = 2 - 2cos
+    return 1.0 - d / 2.0
+
+
+def aggregate(file_names, scores, aggregator="max", top_n=3, weights=DEFAULT_WEIGHTS):
+    """
+    Collapse chunk scores into one score per resume.
+    Returns (unique_file_names, resume_scores, chunk_counts) as numpy arrays.
+    """
+    names, inv = np.unique(np.asarray(file_names, dtype=object), return_inverse=True)
+    scores = np.asarray(scores, dtype=np.float32)
+    counts = np.bincount(inv, minlength=len(names))
+
+    if aggregator == "max":
+        out = np.full(len(names), -np.inf, dtype=np.float32)
+        np.maximum.at(out, inv, scores)
+        return names, out, counts
+
+    # rank of every hit inside its own resume (0 = best chunk)
+    order = np.lexsort((-scores, inv))
+    group_start = np.searchsorted(inv[order], np.arange(len(names)))
+    rank = np.empty(len(scores), dtype=np.int64)
+    rank[order] = np.arange(len(scores)) - group_start[inv[order]]
+
+    if aggregator == "mean_top_n":
+        keep = rank < top_n
+        total = np.bincount(inv[keep], weights=scores[keep], minlength=len(names))
+        n = np.bincount(inv[keep], minlength=len(names))
+        return names, (total / np.maximum(n, 1)).astype(np.float32), counts
+
+    if aggregator == "weighted":
+        w = np.asarray(weights, dtype=np.float32)
+        keep = rank < len(w)
+        total = np.bincount(inv[keep], weights=scores[keep] * w[rank[keep]], minlength=len(names))
+        return names, total.astype(np.float32), counts
+
+    raise ValueError(f"Unknown aggregator: {aggregator}")
+
+
+def top_k(names, scores, counts, k):
+    k = min(k, len(names))
+    if k == 0:
+        return []
+    idx = np.argpartition(-scores, k - 1)[:k]
+    idx = idx[np.argsort(-scores[idx])]
+    return [
+        {"file_name": str(names[i]), "score": float(scores[i]), "chunks": int(counts[i])}
+        for i in idx
+    ]
+
+
+def mmr(relevance, vectors, k, lambda_mult=MMR_LAMBDA):
+    """
+    Greedy maximal marginal relevance: positions of k rows, each maximizing
+    lambda * relevance - (1 - lambda) * (max cosine to the rows already picked).
+    Relevance is divided by its maximum so it is on the cosine scale whatever
+    the aggregator. Each pick is one matrix-vector product over the candidates.
+    """
+    rel = np.asarray(relevance, dtype=np.float32)
+    k = min(k, len(rel))
+    if k == 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.abs(rel).max()
+    rel = rel / top if top > 0 else np.ones_like(rel)
+    v = np.asarray(vectors, dtype=np.float32)
+    v = v / np.maximum(np.linalg.norm(v, axis=1, keepdims=True), 1e-12)
+
+    redundancy = np.zeros(len(rel), dtype=np.float32)
+    picked = np.zeros(len(rel), dtype=bool)
+    order = np.empty(k, dtype=np.int64)
+    for step in range(k):
+        gain = lambda_mult * rel - (1.0 - lambda_mult) * redundancy
+        gain[picked] = -np.inf
+        j = int(np.argmax(gain))
+        order[step] = j
+        picked[j] = True
+        np.maximum(redundancy, v @ v[j], out=redundancy)
+    return order
+
+
+def rrf_fuse(ids, file_names, keyword_hits, rrf_k=RRF_K):
+    """
+    Reciprocal-rank fusion of the vector hit list (ids, already best first)
+    and the BM25 hit list. Returns (ids, file_names, fused_scores).
+    """
+    fused = {}
+    files = {}
+    for rank, (cid, name) in enumerate(zip(ids, file_names)):
+        fused[cid] = 1.0 / (rrf_k + rank + 1)
+        files[cid] = name
+    for rank, (cid, name, _) in enumerate(keyword_hits):
+        fused[cid] = fused.get(cid, 0.0) + 1.0 / (rrf_k + rank + 1)
+        files[cid] = name
+    out_ids = list(fused)
+    return out_ids, [files[c] for c in out_ids], np.fromiter(fused.values(), dtype=np.float32, count=len(fused))
+
+
+# -------------------- RANKING ENGINE --------------------
+def query_chunks(vectorstore, query_vector, n):
+    collection = vectorstore._collection
+    n = min(n, collection.count())
+    if n == 0:
+        return [], [], np.empty(0, dtype=np.float32), []
+    res = collection.query(
+        query_embeddings=[query_vector],
+        n_results=n,
+        include=["metadatas", "distances", "documents"]
+    )
+    space = (collection.metadata or {}).get("hnsw:space", "l2")
+    file_names = [(m or {}).get("file_name", "") for m in res["metadatas"][0]]
+    return res["ids"][0], file_names, to_similarity(res["distances"][0], space), res["documents"][0]
+
+
+def rank_resumes(vectorstore, query, k, aggregator="max", top_n=3,
+                 weights=DEFAULT_WEIGHTS, max_fetch=MAX_FETCH, keyword_index=None, rrf_k=RRF_K,
+                 dense_index=None, reranker=None, query_vector=None, near_dup=None,
+                 mmr_lambda=None):
+    """
+    Return exactly k distinct resumes (fewer only if the index has fewer),
+    each with an aggregated score. Chunk hits are over-fetched and the
+    fetch depth grows until k resumes are covered or max_fetch is reached.
+    With a keyword_index, vector and BM25 hits are merged by reciprocal-rank fusion.
+    With a dense_index (quantized codes + exact rescoring) it replaces the Chroma query.
+    With a reranker, the best reranker.top_n chunks are re-scored by a cross-encoder
+    within its latency budget; re-scored chunks rank above the rest, which keep
+    their first-stage order. Each result then carries rerank_complete=False
+    if the budget ran out first.
+    query_vector skips embedding the query when the caller already has it.
+    With a near_dup index, a hit on a collapsed chunk also counts for every
+    resume that references it.
+    With mmr_lambda, the k resumes are picked by maximal marginal relevance
+    from the best k * MMR_POOL, so near-clones of a higher pick drop down.
+    """
+    if query_vector is None:
+        query_vector = vectorstore.embeddings.embed_query(query)
+
+    fetch = max(MIN_FETCH, k * OVERFETCH)
+    while True:
+        n = min(fetch, max_fetch)
+        if dense_index is not None:
+            ids, file_names, scores = dense_index.search(query_vector, n)
+            texts = {}
+        else:
+            ids, file_names, scores, docs = query_chunks(vectorstore, query_vector, n)
+            texts = dict(zip(ids, docs))
+        found = len(ids)
+        if keyword_index is not None:
+            keyword_hits = keyword_index.search(query, n)
+            found = max(found, len(keyword_hits))
+            ids, file_names, scores = rrf_fuse(ids, file_names, keyword_hits, rrf_k)
+        if near_dup is not None:
+            ids, file_names, scores = near_dup.expand(ids, file_names, scores, texts)
+        if len(set(file_names)) >= k or found < fetch or fetch >= max_fetch:
+            break
+        fetch *= OVERFETCH
+
+    reranked = {}
+    complete = True
+    if reranker is not None and len(ids):
+        scores = np.array(scores, dtype=np.float32)
+        head = np.argsort(-scores)[:reranker.top_n]
+        _fetch_texts(vectorstore, [ids[i] for i in head], texts)
+        reranked, complete = reranker.rerank(query, [(ids[i], texts.get(ids[i]) or "") for i in head])
+        # first-stage scores are <= 1, so every re-scored chunk lands on top
+        for i in head:
+            if ids[i] in reranked:
+                scores[i] = 1.0 + reranked[ids[i]]
+
+    names, resume_scores, counts = aggregate(file_names, scores, aggregator, top_n, weights)
+
+    # best matching chunk per resume: snippet for the UI, vector for MMR
+    best = {}
+    for cid, name, score in zip(ids, file_names, scores):
+        if name not in best or score > best[name][0]:
+            best[name] = (score, cid)
+
+    results = top_k(names, resume_scores, counts, k if mmr_lambda is None else k * MMR_POOL)
+    for r in results:
+        r["best_chunk_id"] = best[r["file_name"]][1]
+    if mmr_lambda is not None:
+        vectors = chunk_vectors(vectorstore, [r["best_chunk_id"] for r in results], near_dup)
+        results = diversify(results, vectors, k, mmr_lambda)
+    _fetch_texts(vectorstore, [r["best_chunk_id"] for r in results], texts)
+    for r in results:
+        r["best_chunk"] = texts.get(r["best_chunk_id"], "")
+        if reranker is not None:
+            r["reranked"] = r["best_chunk_id"] in reranked
+            r["rerank_complete"] = complete
+    return results
+
+
+def chunk_vectors(vectorstore, chunk_ids, near_dup=None):
+    """{chunk id: vector} in one read; collapsed chunks get their canonical's vector."""
+    source = {cid: cid for cid in chunk_ids}
+    if near_dup is not None:
+        source.update(near_dup.canonical_of(chunk_ids))
+    if not source:
+        return {}
+    got = vectorstore._collection.get(ids=list(set(source.values())), include=["embeddings"])
+    found = dict(zip(got["ids"], got["embeddings"]))
+    return {cid: found[src] for cid, src in source.items() if src in found}
+
+
+def diversify(results, vectors, k, lambda_mult=MMR_LAMBDA):
+    """MMR over ranked resumes, each represented by the vector of its best chunk."""
+    if len(results) <= 1:
+        return results[:k]
+    dim = len(next(iter(vectors.values()))) if vectors else 1
+    matrix = np.zeros((len(results), dim), dtype=np.float32)   # no vector -> redundant with nothing
+    for i, r in enumerate(results):
+        if r["best_chunk_id"] in vectors:
+            matrix[i] = vectors[r["best_chunk_id"]]
+    order = mmr([r["score"] for r in results], matrix, k, lambda_mult)
+    return [results[i] for i in order]
+
+
+def _fetch_texts(vectorstore, ids, texts):
+    missing = [cid for cid in ids if cid not in texts]
+    if missing:
+        got = vectorstore._collection.get(ids=missing, include=["documents"])
+        texts.update(zip(got["ids"], got["documents"]))
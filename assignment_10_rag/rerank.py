@@ -0,0 +1,150 @@
+import hashlib
+import math
+import sqlite3
+import threading
+import time
+
+from embed_cache import normalize_text
+
+# -------------------- CONFIG --------------------
+RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+RERANK_TOP_N = 50          # candidate chunks from the first stage that get re-scored
+RERANK_BATCH_SIZE = 16
+BUDGET_SECONDS = 1.5       # past this the partial ordering is returned
+SCORE_CACHE_PATH = "rerank_cache.sqlite3"
+MAX_ENTRIES = 500_000
+
+
+def jd_hash(model_name, query):
+    # the model is uncased, so case and spacing edits map to the same key
+    raw = f"{model_name}\0{normalize_text(query).lower()}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+# -------------------- CROSS-ENCODER --------------------
+class CrossEncoderReranker:
+    """
+    Small local cross-encoder (CPU) that re-scores (job description, chunk) pairs.
+    Scores are cached in SQLite keyed by (job description hash, chunk id); chunk
+    ids are content hashes, so a cached score is valid for as long as the id exists.
+    """
+
+    def __init__(self, model_name=RERANK_MODEL, path=SCORE_CACHE_PATH, top_n=RERANK_TOP_N,
+                 batch_size=RERANK_BATCH_SIZE, budget_seconds=BUDGET_SECONDS, max_entries=MAX_ENTRIES):
+        self.model_name = model_name
+        self.top_n = top_n
+        self.batch_size = batch_size
+        self.budget_seconds = budget_seconds
+        self.max_entries = max_entries
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.scored = 0
+        self.expired = 0
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS scores ("
+            " jd_hash TEXT NOT NULL,"
+            " chunk_id TEXT NOT NULL,"
+            " score REAL NOT NULL,"
+            " last_used REAL NOT NULL,"
+            " PRIMARY KEY (jd_hash, chunk_id))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_scores_last_used ON scores (last_used)")
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    from sentence_transformers import CrossEncoder
+
+                    self._model = CrossEncoder(self.model_name, device="cpu", max_length=512)
+        return self._model
+
+    # ---------- score cache ----------
+    def _lookup(self, key, chunk_ids):
+        found = {}
+        with self._lock:
+            for i in range(0, len(chunk_ids), 500):
+                part = chunk_ids[i:i + 500]
+                marks = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT chunk_id, score FROM scores WHERE jd_hash = ? AND chunk_id IN ({marks})",
+                    [key, *part]
+                ).fetchall()
+                found.update(rows)
+            if found:
+                self._conn.executemany(
+                    "UPDATE scores SET last_used = ? WHERE jd_hash = ? AND chunk_id = ?",
+                    [(time.time(), key, cid) for cid in found]
+                )
+                self._conn.commit()
+        return found
+
+    def _store(self, key, items):
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO scores (jd_hash, chunk_id, score, last_used) VALUES (?, ?, ?, ?)",
+                [(key, cid, score, now) for cid, score in items]
+            )
+            self._count += len(items)
+            if self._count > self.max_entries:
+                extra = self._count - self.max_entries
+                self._conn.execute(
+                    "DELETE FROM scores WHERE rowid IN ("
+                    " SELECT rowid FROM scores ORDER BY last_used LIMIT ?)",
+                    (extra,)
+                )
+                self._count = self._conn.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+            self._conn.commit()
+
+    # ---------- rerank ----------
+    def rerank(self, query, candidates, budget_seconds=None):
+        """
+        candidates: [(chunk_id, text)] in first-stage order (best first).
+        Uncached pairs are scored batch by batch in that order; once the next
+        batch would overrun the budget the rest is left unscored.
+        Returns ({chunk_id: probability}, complete).
+        """
+        t0 = time.perf_counter()
+        budget_seconds = self.budget_seconds if budget_seconds is None else budget_seconds
+        key = jd_hash(self.model_name, query)
+        logits = self._lookup(key, [cid for cid, _ in candidates])
+        self.hits += len(logits)
+
+        todo = [(cid, text) for cid, text in candidates if cid not in logits]
+        complete = True
+        last_batch = 0.0
+        for i in range(0, len(todo), self.batch_size):
+            elapsed = time.perf_counter() - t0
+            if elapsed + last_batch > budget_seconds:
+                complete = False
+                self.expired += 1
+                break
+            tb = time.perf_counter()
+            batch = todo[i:i + self.batch_size]
+            out = self.model.predict([(query, text) for _, text in batch],
+                                     batch_size=self.batch_size, show_progress_bar=False)
+            new = [(cid, float(s)) for (cid, _), s in zip(batch, out)]
+            self._store(key, new)
+            logits.update(new)
+            self.scored += len(new)
+            last_batch = time.perf_counter() - tb
+
+        return {cid: 1.0 / (1.0 + math.exp(-s)) for cid, s in logits.items()}, complete
+
+    def stats(self):
+        looked_up = self.hits + self.scored
+        return {
+            "hits": self.hits,
+            "scored": self.scored,
+            "hit_rate": self.hits / looked_up if looked_up else 0.0,
+            "budget_expired": self.expired,
+            "entries": self._count
+        }
@@ -0,0 +1,294 @@
+import os
+import threading
+import time
+
+from langchain_community.embeddings import HuggingFaceEmbeddings
+from langchain_core.embeddings import Embeddings
+
+from bm25_index import INDEX_FILE, BM25Index
+from embed_cache import CACHE_PATH, CachedEmbeddings, embed_queries
+from flat_store import FLAT_DIR, FlatVectorStore
+from group_commit import GroupCommitStore
+from jobs import JOBS_PATH, WORKERS, JobQueue
+from near_dup import DEDUP_PATH, NearDupIndex
+from quantized_index import INDEX_DIR, QuantizedIndex, build_from
+from query_cache import QueryCache
+from rerank import RERANK_MODEL, SCORE_CACHE_PATH, CrossEncoderReranker
+
+# -------------------- CONFIG --------------------
+EMBED_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+# "torch" (stock sentence-transformers), "onnx" (ONNX Runtime, int8, length-bucketed)
+# or "remote" (embed_server.py -- one model copy shared by every app)
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "torch")
+EMBED_SERVER_URL = os.getenv("EMBED_SERVER_URL", "http://127.0.0.1:8765/v1")
+BACKENDS = ["chroma", "flat", "sharded", "snapshot"]
+READ_ONLY_BACKENDS = {"snapshot"}
+QUANT_MODE = os.getenv("QUANT_MODE", "")
+# chosen explicitly, QUANT_MODE does not change it; "flat" is the low-RAM option
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+
+# Streamlit re-runs the app script on every click, but imported modules stay
+# in sys.modules -> everything below is created once per process and shared
+# by all sessions.
+_lock = threading.Lock()
+_model_lock = threading.Lock()
+_models = {}
+_warmups = {}
+_clients = {}
+_stores = {}
+_keyword_indexes = {}
+_dense_indexes = {}
+_near_dup_indexes = {}
+_job_queues = {}
+_rerankers = {}
+_query_cache = QueryCache()
+_metrics = {
+    "process_start": time.time(),
+    "model_load_seconds": None,
+    "model_ready_after_start": None,
+    "store_open_seconds": None,
+    "first_query_seconds": None
+}
+
+
+# -------------------- EMBEDDING MODEL --------------------
+def _load_model(model_name, cache_path):
+    if model_name in _models:
+        return _models[model_name]
+    with _model_lock:
+        if model_name in _models:
+            return _models[model_name]
+        t0 = time.perf_counter()
+        if EMBED_BACKEND == "onnx":
+            from onnx_embeddings import OnnxEmbeddings
+
+            # int8 vectors differ slightly -> their own cache keys
+            model = CachedEmbeddings(OnnxEmbeddings(model_name), f"{model_name}+onnx-int8", cache_path)
+        elif EMBED_BACKEND == "remote":
+            from embed_server import RemoteEmbeddings
+
+            model = CachedEmbeddings(RemoteEmbeddings(EMBED_SERVER_URL), f"{model_name}@server", cache_path)
+        else:
+            model = CachedEmbeddings(
+                HuggingFaceEmbeddings(model_name=model_name),
+                model_name=model_name,
+                path=cache_path
+            )
+        # first encode pulls weights into memory and builds the torch graph
+        model.embeddings.embed_query("warmup")
+        _metrics["model_load_seconds"] = time.perf_counter() - t0
+        _metrics["model_ready_after_start"] = time.time() - _metrics["process_start"]
+        _models[model_name] = model
+        return model
+
+
+def start_warmup(model_name=EMBED_MODEL, cache_path=CACHE_PATH):
+    """Load the model in a background thread so the first page renders immediately."""
+    with _lock:
+        if model_name in _models or model_name in _warmups:
+            return
+        t = threading.Thread(
+            target=_load_model, args=(model_name, cache_path), daemon=True, name="embed-warmup"
+        )
+        _warmups[model_name] = t
+    t.start()
+
+
+class LazyEmbeddings(Embeddings):
+    """Stand-in handed to the vector store; blocks on first use until the model is ready."""
+
+    def __init__(self, model_name=EMBED_MODEL, cache_path=CACHE_PATH):
+        self.model_name = model_name
+        self.cache_path = cache_path
+
+    @property
+    def model(self):
+        return _load_model(self.model_name, self.cache_path)
+
+    def is_ready(self):
+        return self.model_name in _models
+
+    def embed_documents(self, texts):
+        return self.model.embed_documents(texts)
+
+    def embed_query(self, text):
+        return self.model.embed_query(text)
+
+    def embed_queries(self, texts):
+        return embed_queries(self.model, texts)
+
+    def stats(self):
+        return self.model.stats()
+
+
+def get_embedding_model(model_name=EMBED_MODEL, cache_path=CACHE_PATH):
+    start_warmup(model_name, cache_path)
+    return LazyEmbeddings(model_name, cache_path)
+
+
+# -------------------- VECTOR STORE --------------------
+def get_chroma_client(persist_directory):
+    # imported lazily: the flat backend never pays for chromadb start-up
+    import chromadb
+
+    with _lock:
+        if persist_directory not in _clients:
+            _clients[persist_directory] = chromadb.PersistentClient(path=persist_directory)
+        return _clients[persist_directory]
+
+
+def get_vectorstore(persist_directory, embedding_model, backend="chroma", group_commit=False):
+    """
+    backend="chroma" -> langchain Chroma (HNSW, SQLite)
+    backend="flat"   -> FlatVectorStore (exact search over a memory-mapped file)
+    backend="sharded"-> ShardedVectorStore (flat shards in worker processes, scatter-gather)
+    backend="snapshot"-> SnapshotVectorStore (read-only, memory-mapped snapshot chain)
+    group_commit=True buffers writes and commits them in groups (see group_commit.py);
+    ignored for read-only backends, whose writes must fail at once, not at the next commit.
+    """
+    group_commit = group_commit and backend not in READ_ONLY_BACKENDS
+    key = (persist_directory, embedding_model.model_name, backend, group_commit)
+    if key in _stores:
+        return _stores[key]
+
+    t0 = time.perf_counter()
+    # the client has its own cache + lock, open it before taking ours
+    client = get_chroma_client(persist_directory) if backend == "chroma" else None
+    with _lock:
+        if key not in _stores:
+            store = _open_store(persist_directory, embedding_model, backend, client)
+            # one writer per process, so every session shares the same buffer
+            _stores[key] = GroupCommitStore(store) if group_commit else store
+            _metrics["store_open_seconds"] = time.perf_counter() - t0
+        return _stores[key]
+
+
+def _open_store(persist_directory, embedding_model, backend, client):
+    if backend == "flat":
+        store = FlatVectorStore(os.path.join(persist_directory, FLAT_DIR), embedding_model)
+        if store._collection.count() == 0:
+            _copy_from_chroma(persist_directory, store)
+        return store
+    if backend == "sharded":
+        from sharded_store import SHARD_DIR, ShardedVectorStore
+
+        return ShardedVectorStore(os.path.join(persist_directory, SHARD_DIR), embedding_model)
+    if backend == "snapshot":
+        from snapshot import SNAPSHOT_DIR, SnapshotVectorStore
+
+        return SnapshotVectorStore(os.path.join(persist_directory, SNAPSHOT_DIR), embedding_model)
+
+    from langchain_community.vectorstores import Chroma
+
+    from compact import lock_writes, recover_chroma
+
+    # an interrupted compaction must be finished before langchain opens the collection
+    recover_chroma(client)
+    return lock_writes(Chroma(
+        client=client,
+        persist_directory=persist_directory,
+        embedding_function=embedding_model
+    ))
+
+
+def _copy_from_chroma(persist_directory, store, page_size=5000):
+    """One-off: a new flat store starts from the Chroma collection in the same folder."""
+    if not os.path.exists(os.path.join(persist_directory, "chroma.sqlite3")):
+        return
+    import chromadb
+
+    try:
+        source = chromadb.PersistentClient(path=persist_directory).get_collection("langchain")
+    except Exception:
+        return      # no collection yet
+    for offset in range(0, source.count(), page_size):
+        page = source.get(include=["embeddings", "documents", "metadatas"], limit=page_size, offset=offset)
+        if page["ids"]:
+            store._collection.upsert(ids=page["ids"], embeddings=page["embeddings"],
+                                     documents=page["documents"], metadatas=page["metadatas"])
+
+
+def get_keyword_index(persist_directory, vectorstore):
+    """BM25 index stored next to the collection, built from it on first use."""
+    # each backend keeps its own sidecars (the flat store lives in a sub-folder)
+    persist_directory = getattr(vectorstore, "_persist_directory", None) or persist_directory
+    with _lock:
+        if persist_directory not in _keyword_indexes:
+            os.makedirs(persist_directory, exist_ok=True)
+            index = BM25Index(os.path.join(persist_directory, INDEX_FILE))
+            if len(index) == 0 and vectorstore._collection.count() > 0:
+                index.rebuild_from(vectorstore)
+            _keyword_indexes[persist_directory] = index
+        return _keyword_indexes[persist_directory]
+
+
+def get_dense_index(persist_directory, vectorstore, mode):
+    """Quantized first-pass index next to the collection (None = plain search)."""
+    if not mode:
+        return None
+    persist_directory = getattr(vectorstore, "_persist_directory", None) or persist_directory
+    with _lock:
+        if persist_directory not in _dense_indexes:
+            path = os.path.join(persist_directory, INDEX_DIR)
+            index = QuantizedIndex(path, vectorstore, mode)
+            if index.mode != mode or (len(index) == 0 and vectorstore._collection.count() > 0):
+                index.close()
+                index = build_from(vectorstore, path, mode)
+            _dense_indexes[persist_directory] = index
+        return _dense_indexes[persist_directory]
+
+
+def near_dup_path(persist_directory, vectorstore):
+    return os.path.join(getattr(vectorstore, "_persist_directory", None) or persist_directory, DEDUP_PATH)
+
+
+def get_near_dup_index(persist_directory, vectorstore, policy):
+    """MinHash/LSH signatures of the stored chunks (None = no near-duplicate check)."""
+    if not policy or policy == "off":
+        return None
+    persist_directory = getattr(vectorstore, "_persist_directory", None) or persist_directory
+    with _lock:
+        if persist_directory not in _near_dup_indexes:
+            os.makedirs(persist_directory, exist_ok=True)
+            index = NearDupIndex(near_dup_path(persist_directory, vectorstore), policy)
+            if len(index) == 0 and vectorstore._collection.count() > 0:
+                index.rebuild_from(vectorstore)
+            _near_dup_indexes[persist_directory] = index
+        return _near_dup_indexes[persist_directory]
+
+
+# -------------------- RE-RANKER --------------------
+def get_reranker(model_name=RERANK_MODEL, cache_path=SCORE_CACHE_PATH):
+    """Cross-encoder for the optional second stage; weights load on first rerank."""
+    with _lock:
+        if model_name not in _rerankers:
+            _rerankers[model_name] = CrossEncoderReranker(model_name, cache_path)
+        return _rerankers[model_name]
+
+
+def get_query_cache():
+    """Shortlist results shared by all sessions of this process."""
+    return _query_cache
+
+
+# -------------------- BACKGROUND INGESTION --------------------
+def get_job_queue(handler, path=JOBS_PATH, workers=WORKERS):
+    """One queue + worker pool per process; the first handler passed in wins."""
+    with _lock:
+        if path not in _job_queues:
+            queue = JobQueue(handler, path, workers)
+            queue.start()
+            _job_queues[path] = queue
+        return _job_queues[path]
+
+
+# -------------------- METRICS --------------------
+def record_query(seconds):
+    # only the first query after boot is interesting, later ones hit a warm model
+    with _lock:
+        if _metrics["first_query_seconds"] is None:
+            _metrics["first_query_seconds"] = seconds
+
+
+def get_metrics():
+    return dict(_metrics)
@@ -0,0 +1,343 @@
+import argparse
+import atexit
+import glob
+import hashlib
+import itertools
+import json
+import multiprocessing as mp
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from flat_store import FlatCollection, FlatVectorStore
+
+# -------------------- CONFIG --------------------
+SHARD_DIR = "sharded_store"
+# shard count of a *new* store; an existing one keeps the count it was created with
+SHARDS = int(os.getenv("SHARDS", str(max(2, (os.cpu_count() or 2) // 2))))
+LAYOUT_FILE = "shards.json"
+
+
+def shard_of(file_name, shards):
+    # stable across processes and restarts (unlike hash())
+    return int(hashlib.md5(file_name.encode("utf-8")).hexdigest()[:8], 16) % shards
+
+
+def stored_shards(path, shards=None):
+    """
+    Shard count the store at path was created with (saved on first open).
+    Routing is md5 % count, so reopening with another count would send ids to
+    the wrong shard: an explicit shards that disagrees is refused.
+    """
+    layout = os.path.join(path, LAYOUT_FILE)
+    if os.path.exists(layout):
+        with open(layout, encoding="utf-8") as f:
+            count = json.load(f)["shards"]
+    else:
+        # stores from before the layout file: one directory per shard
+        count = len(glob.glob(os.path.join(path, "shard_*"))) or shards or SHARDS
+        os.makedirs(path, exist_ok=True)
+        tmp = f"{layout}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"shards": count}, f)
+        os.replace(tmp, layout)
+    if shards is not None and shards != count:
+        raise ValueError(f"{path} is partitioned over {count} shards, not {shards}; "
+                         "restore a snapshot into a new directory to re-partition")
+    return count
+
+
+def owner(chunk_id, metadata=None):
+    """Resume a chunk belongs to: its metadata, else the 'file_name::hash' id."""
+    name = (metadata or {}).get("file_name")
+    if name:
+        return name
+    return chunk_id.split("::", 1)[0] if "::" in chunk_id else None
+
+
+# -------------------- SHARD PROCESS --------------------
+def _serve(path, conn):
+    # requests arrive tagged with an id and are answered in order with the same id
+    collection = FlatCollection(path)
+    while True:
+        req, method, args, kwargs = conn.recv()
+        if method is None:
+            collection.save()
+            conn.send((req, True, None))
+            return
+        try:
+            conn.send((req, True, getattr(collection, method)(*args, **kwargs)))
+        except Exception as e:
+            conn.send((req, False, f"{type(e).__name__}: {e}"))
+
+
+# -------------------- SHARDED COLLECTION --------------------
+class ShardedCollection:
+    """
+    Chroma-style collection split over N processes, each owning a FlatCollection.
+    Chunks are hash-partitioned by resume, so all chunks of one resume live on
+    one shard; writes go to the owning shard, queries fan out to every shard
+    in parallel and the per-shard top-k lists are merged.
+    Requests carry an id and one reader thread per shard hands each reply to
+    its caller, so concurrent callers queue on the shards instead of taking
+    turns for a whole round trip.
+    """
+
+    metadata = {"hnsw:space": "l2"}
+
+    def __init__(self, path, shards=None):
+        self.path = path
+        self.shards = stored_shards(path, shards)
+        ctx = mp.get_context("spawn")       # no forking a process that runs threads
+        self._pipes = []
+        self._locks = []            # one sender at a time per pipe; replies come back via _read
+        self._procs = []
+        self._pending = {}          # request id -> (shard, Future)
+        self._ids = itertools.count()
+        for i in range(self.shards):
+            parent, child = ctx.Pipe()
+            proc = ctx.Process(target=_serve, args=(os.path.join(path, f"shard_{i}"), child),
+                               daemon=True, name=f"shard-{i}")
+            proc.start()
+            self._pipes.append(parent)
+            self._locks.append(threading.Lock())
+            self._procs.append(proc)
+            threading.Thread(target=self._read, args=(i,), daemon=True, name=f"shard-{i}-replies").start()
+        atexit.register(self.close)
+
+    # ---------- transport ----------
+    def _read(self, i):
+        while True:
+            try:
+                req, ok, res = self._pipes[i].recv()
+            except (EOFError, OSError):
+                break
+            self._pending.pop(req)[1].set_result((ok, res))
+        # shard gone -> nobody will answer what is still waiting on it
+        for req, (shard, fut) in list(self._pending.items()):
+            if shard == i and self._pending.pop(req, None) is not None:
+                fut.set_result((False, "shard process exited"))
+
+    def _call(self, calls):
+        """calls: {shard: (method, args, kwargs)} -> {shard: result}, run in parallel."""
+        futures = {}
+        for i, (method, args, kwargs) in calls.items():
+            req = next(self._ids)
+            futures[i] = self._pending[req] = (i, Future())
+            try:
+                with self._locks[i]:
+                    self._pipes[i].send((req, method, args, kwargs))
+            except OSError as e:
+                self._pending.pop(req, None)
+                futures[i][1].set_result((False, f"{type(e).__name__}: {e}"))
+        replies = {i: fut.result() for i, (_, fut) in futures.items()}
+        errors = [f"shard {i}: {res}" for i, (ok, res) in replies.items() if not ok]
+        if errors:
+            raise RuntimeError("; ".join(errors))
+        return {i: res for i, (_, res) in replies.items()}
+
+    def _broadcast(self, method, *args, **kwargs):
+        return self._call({i: (method, args, kwargs) for i in range(self.shards)})
+
+    def _route(self, ids, metadatas=None):
+        """shard -> positions of the ids it owns; ids with unknown owner go everywhere."""
+        groups = {}
+        for pos, cid in enumerate(ids):
+            name = owner(cid, metadatas[pos] if metadatas else None)
+            targets = [shard_of(name, self.shards)] if name else range(self.shards)
+            for i in targets:
+                groups.setdefault(i, []).append(pos)
+        return groups
+
+    @staticmethod
+    def _pick(values, positions):
+        return None if values is None else [values[p] for p in positions]
+
+    # ---------- chroma-style API ----------
+    def count(self):
+        return sum(self._broadcast("count").values())
+
+    def upsert(self, ids, embeddings, documents=None, metadatas=None):
+        embeddings = np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1)
+        calls = {}
+        for i, pos in self._route(ids, metadatas).items():
+            calls[i] = ("upsert", (), {
+                "ids": self._pick(ids, pos),
+                "embeddings": embeddings[pos],
+                "documents": self._pick(documents, pos),
+                "metadatas": self._pick(metadatas, pos)
+            })
+        if calls:
+            self._call(calls)
+
+    add = upsert
+
+    def update(self, ids, metadatas=None, documents=None, embeddings=None):
+        calls = {}
+        for i, pos in self._route(ids, metadatas).items():
+            calls[i] = ("update", (), {
+                "ids": self._pick(ids, pos),
+                "metadatas": self._pick(metadatas, pos),
+                "documents": self._pick(documents, pos),
+                "embeddings": None if embeddings is None else np.asarray(embeddings)[pos]
+            })
+        if calls:
+            self._call(calls)
+
+    def delete(self, ids=None, where=None):
+        if ids is None:
+            self._broadcast("delete", where=where)
+            return
+        groups = self._route(ids)
+        self._call({i: ("delete", (), {"ids": self._pick(ids, pos), "where": where})
+                    for i, pos in groups.items()})
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=("documents", "metadatas")):
+        include = tuple(include)
+        if ids is not None:
+            calls = {i: ("get", (), {"ids": self._pick(ids, pos), "where": where, "include": include})
+                     for i, pos in self._route(ids).items()}
+            return self._merge(self._call(calls), include)
+        if where is None:
+            # paging: walk the shards in order, each one only serves its slice
+            counts = self._broadcast("count")
+            offset = offset or 0
+            remaining = limit if limit is not None else sum(counts.values())
+            calls = {}
+            for i in range(self.shards):
+                if remaining <= 0:
+                    break
+                if offset >= counts[i]:
+                    offset -= counts[i]
+                    continue
+                take = min(remaining, counts[i] - offset)
+                calls[i] = ("get", (), {"limit": take, "offset": offset, "include": include})
+                remaining -= take
+                offset = 0
+            return self._merge(self._call(calls), include)
+        merged = self._merge(self._broadcast("get", where=where, include=include), include)
+        start = offset or 0
+        end = start + limit if limit is not None else None
+        return {k: v[start:end] for k, v in merged.items()}
+
+    @staticmethod
+    def _merge(results, include):
+        out = {"ids": []}
+        for key in ("documents", "metadatas", "embeddings"):
+            if key in include:
+                out[key] = []
+        for i in sorted(results):
+            for key in out:
+                out[key].extend(results[i].get(key, []))
+        if "embeddings" in out:
+            out["embeddings"] = np.asarray(out["embeddings"], dtype=np.float32) if out["ids"] else []
+        return out
+
+    def query(self, query_embeddings, n_results=10, where=None,
+              include=("documents", "metadatas", "distances")):
+        wanted = tuple(set(include) | {"distances"})
+        replies = self._broadcast("query", query_embeddings, n_results=n_results,
+                                  where=where, include=wanted)
+        out = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for q in range(len(query_embeddings)):
+            hits = [
+                (dist, i, j)
+                for i, res in replies.items()
+                for j, dist in enumerate(res["distances"][q])
+            ]
+            hits.sort()
+            hits = hits[:n_results]
+            out["ids"].append([replies[i]["ids"][q][j] for _, i, j in hits])
+            out["distances"].append([dist for dist, _, _ in hits])
+            for key in ("documents", "metadatas"):
+                if key in wanted:
+                    out[key].append([replies[i][key][q][j] for _, i, j in hits])
+        return {k: v for k, v in out.items() if k == "ids" or k in include}
+
+    def save(self):
+        self._broadcast("save")
+
+    def tombstones(self):
+        dead, total = zip(*self._broadcast("tombstones").values())
+        return sum(dead), sum(total)
+
+    def compact(self):
+        """Every shard compacts its own file, in parallel."""
+        before, after = zip(*self._broadcast("compact").values())
+        return sum(before), sum(after)
+
+    def close(self):
+        try:
+            self._call({i: (None, (), {}) for i in range(self.shards) if self._procs[i].is_alive()})
+        except RuntimeError:
+            pass                            # a shard already died; the rest have saved
+        for proc in self._procs:
+            proc.join(timeout=10)
+
+
+# -------------------- VECTOR STORE --------------------
+class ShardedVectorStore(FlatVectorStore):
+    """FlatVectorStore surface over a ShardedCollection."""
+
+    def __init__(self, persist_directory, embedding_function, shards=None):
+        self._persist_directory = persist_directory
+        self._embedding_function = embedding_function
+        self._collection = ShardedCollection(persist_directory, shards)
+
+
+# -------------------- BENCHMARK --------------------
+def bench_qps(path, shards, ids, vectors, metadatas, queries, k, clients):
+    collection = ShardedCollection(path, shards)
+    try:
+        for i in range(0, len(ids), 5000):
+            collection.upsert(ids[i:i + 5000], vectors[i:i + 5000], metadatas=metadatas[i:i + 5000])
+        collection.query(queries[:1], n_results=k)          # warm up every shard
+
+        results = [None] * len(queries)
+
+        def worker(part):
+            for q in part:
+                results[q] = collection.query([queries[q]], n_results=k, include=[])["ids"][0]
+
+        parts = np.array_split(np.arange(len(queries)), clients)
+        threads = [threading.Thread(target=worker, args=(p,)) for p in parts]
+        t0 = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return len(queries) / (time.perf_counter() - t0), results
+    finally:
+        collection.close()
+
+
+if __name__ == "__main__":
+    from bench_stores import make_data, recall
+
+    parser = argparse.ArgumentParser(description="Queries/s of the sharded store for 1..N shards")
+    parser.add_argument("--n", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=400)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=4)
+    args = parser.parse_args()
+
+    ids, vectors, metadatas, queries = make_data(args.n, args.dim, args.queries)
+    ids = [f"{m['file_name']}::{cid}" for cid, m in zip(ids, metadatas)]
+    truth = [[ids[i] for i in np.argsort(-(vectors @ q))[:args.k]] for q in queries]
+
+    print(f"{args.n} vectors x {args.dim} dims, {args.queries} queries, {args.clients} clients")
+    print(f"{'shards':>6} {'q/s':>8} {'recall':>7}")
+    tmp = tempfile.mkdtemp(prefix="bench_shards_")
+    try:
+        for n in args.shards:
+            qps, results = bench_qps(f"{tmp}/{n}", n, ids, vectors, metadatas, queries, args.k, args.clients)
+            print(f"{n:>6} {qps:>8.1f} {recall(results, truth):>7.3f}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
@@ -0,0 +1,451 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from flat_store import FlatCollection, FlatVectorStore, normalize
+from near_dup import DEDUP_PATH
+
+# -------------------- CONFIG --------------------
+SNAPSHOT_DIR = "snapshots"
+SUFFIX = ".snap"
+MAGIC = b"RSNAP\x00\x01\x00"
+HEADER_BYTES = 64          # vectors start 64-byte aligned -> memory-mapped as-is
+PAGE_SIZE = 5000
+VERIFY = os.getenv("SNAPSHOT_VERIFY", "1") == "1"
+
+# File layout (one file per snapshot):
+#   MAGIC, zero padding up to HEADER_BYTES
+#   vectors  float32 [rows x dim], L2-normalized
+#   records  zlib(JSON): ids, documents, metadatas, digests, deleted ids
+#   sidecars zlib(SQLite file) each: ledger (chunk registry + catalog), near_dup (refs)
+#   manifest JSON (offsets, sizes, sha256 of vectors / records / sidecars, base snapshot)
+#   uint64 manifest length, MAGIC
+# A "full" snapshot holds every chunk; a "delta" holds the chunks added or
+# changed since its base snapshot plus the ids deleted since then.
+# Sidecars are small and always copied whole; the newest one in a chain wins.
+
+
+def _digest(document, metadata, vector):
+    raw = json.dumps([document, metadata or {}], sort_keys=True, ensure_ascii=False)
+    h = hashlib.sha1(raw.encode("utf-8"))
+    h.update(np.asarray(vector, dtype="<f4").tobytes())     # re-embedded chunk -> new digest
+    return h.hexdigest()
+
+
+def _sqlite_bytes(path, directory):
+    """Consistent copy of a SQLite file, even while another process writes to it."""
+    tmp = os.path.join(directory, f".sidecar-{os.getpid()}.tmp")
+    source, target = sqlite3.connect(path, timeout=30), sqlite3.connect(tmp)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+    try:
+        with open(tmp, "rb") as f:
+            return f.read()
+    finally:
+        os.remove(tmp)
+
+
+# -------------------- READ --------------------
+def read_manifest(path):
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path}: not a snapshot")
+        f.seek(-8 - len(MAGIC), os.SEEK_END)
+        (length,) = struct.unpack("<Q", f.read(8))
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path}: truncated snapshot")
+        f.seek(-8 - len(MAGIC) - length, os.SEEK_END)
+        return json.loads(f.read(length))
+
+
+def _sha256(path, offset, size):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        f.seek(offset)
+        while size > 0:
+            block = f.read(min(size, 1 << 22))
+            if not block:
+                break
+            h.update(block)
+            size -= len(block)
+    return h.hexdigest()
+
+
+def verify_snapshot(path, manifest=None):
+    """Raises ValueError if vectors or records do not match their checksums."""
+    m = manifest or read_manifest(path)
+    if _sha256(path, m["vectors_offset"], m["vectors_bytes"]) != m["vectors_sha256"]:
+        raise ValueError(f"{path}: vector checksum mismatch")
+    if _sha256(path, m["records_offset"], m["records_bytes"]) != m["records_sha256"]:
+        raise ValueError(f"{path}: record checksum mismatch")
+    for name, entry in m.get("sidecars", {}).items():
+        if _sha256(path, entry["offset"], entry["bytes"]) != entry["sha256"]:
+            raise ValueError(f"{path}: {name} checksum mismatch")
+    return m
+
+
+def read_records(path, manifest):
+    with open(path, "rb") as f:
+        f.seek(manifest["records_offset"])
+        return json.loads(zlib.decompress(f.read(manifest["records_bytes"])))
+
+
+def map_vectors(path, manifest):
+    if manifest["rows"] == 0:
+        return np.zeros((0, manifest["dim"] or 0), dtype=np.float32)
+    return np.memmap(path, dtype=np.float32, mode="r", offset=manifest["vectors_offset"],
+                     shape=(manifest["rows"], manifest["dim"]))
+
+
+def snapshot_chain(directory):
+    """Newest full snapshot plus the deltas built on top of it, oldest first."""
+    manifests = {p: read_manifest(p) for p in glob.glob(os.path.join(directory, f"*{SUFFIX}"))}
+    fulls = sorted((m["created"], p) for p, m in manifests.items() if m["kind"] == "full")
+    if not fulls:
+        return []
+    children = {}
+    for p, m in sorted(manifests.items(), key=lambda item: item[1]["created"]):
+        if m["kind"] == "delta":
+            children[m["base_id"]] = p          # newest delta on a base wins
+    chain = [fulls[-1][1]]
+    while manifests[chain[-1]]["snapshot_id"] in children:
+        chain.append(children[manifests[chain[-1]]["snapshot_id"]])
+    return chain
+
+
+def chain_sidecars(paths):
+    """name -> (path, entry) of the newest copy of each sidecar in the chain."""
+    found = {}
+    for path in paths:
+        for name, entry in read_manifest(path).get("sidecars", {}).items():
+            found[name] = (path, entry)
+    return found
+
+
+def extract_sidecar(path, entry, target):
+    """Write a sidecar SQLite file out of a snapshot, replacing target atomically."""
+    with open(path, "rb") as f:
+        f.seek(entry["offset"])
+        raw = zlib.decompress(f.read(entry["bytes"]))
+    os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+    tmp = f"{target}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(raw)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, target)
+
+
+def chain_state(paths):
+    """chunk id -> digest of (document, metadata, vector) after applying the chain."""
+    state = {}
+    for path in paths:
+        records = read_records(path, read_manifest(path))
+        for cid in records["deleted"]:
+            state.pop(cid, None)
+        state.update(zip(records["ids"], records["digests"]))
+    return state
+
+
+# -------------------- EXPORT --------------------
+def export_snapshot(vectorstore, directory=SNAPSHOT_DIR, base=None, page_size=PAGE_SIZE, info=None,
+                    sidecars=None):
+    """
+    Write the store to one snapshot file in directory and return its path.
+    base=None -> full snapshot; base=[paths of a chain] -> delta against it.
+    sidecars: name -> SQLite path (ledger, near_dup) copied in whole, so a restore
+    gets the chunk registry, the catalog and the near-duplicate refs back.
+    Take snapshots of a quiet store (or right after a group commit flush).
+    """
+    os.makedirs(directory, exist_ok=True)
+    collection = vectorstore._collection
+    base = list(base or [])
+    prior = chain_state(base) if base else {}
+    base_manifest = read_manifest(base[-1]) if base else None
+
+    ids, documents, metadatas, digests = [], [], [], []
+    seen = set()
+    dim = base_manifest["dim"] if base_manifest else None
+    vec_hash = hashlib.sha256()
+    tmp = os.path.join(directory, f".export-{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(MAGIC.ljust(HEADER_BYTES, b"\0"))
+        for offset in range(0, collection.count(), page_size):
+            page = collection.get(include=["embeddings", "documents", "metadatas"],
+                                  limit=page_size, offset=offset)
+            if not page["ids"]:
+                continue
+            x = normalize(np.asarray(page["embeddings"], dtype=np.float32))
+            keep = []
+            for i, (cid, doc, meta) in enumerate(zip(page["ids"], page["documents"], page["metadatas"])):
+                seen.add(cid)
+                d = _digest(doc, meta, x[i])
+                if prior.get(cid) == d:
+                    continue
+                keep.append(i)
+                ids.append(cid)
+                documents.append(doc)
+                metadatas.append(meta or {})
+                digests.append(d)
+            if keep:
+                dim = x.shape[1]
+                raw = x[keep].tobytes()
+                f.write(raw)
+                vec_hash.update(raw)
+
+        records = zlib.compress(json.dumps({
+            "ids": ids,
+            "documents": documents,
+            "metadatas": metadatas,
+            "digests": digests,
+            "deleted": sorted(prior.keys() - seen)
+        }).encode("utf-8"))
+        f.write(records)
+        vectors_bytes = len(ids) * (dim or 0) * 4
+        offset = HEADER_BYTES + vectors_bytes + len(records)
+        side = {}
+        for name, source in sorted((sidecars or {}).items()):
+            if not source or not os.path.exists(source):
+                continue
+            blob = zlib.compress(_sqlite_bytes(source, directory))
+            f.write(blob)
+            side[name] = {"offset": offset, "bytes": len(blob), "sha256": hashlib.sha256(blob).hexdigest()}
+            offset += len(blob)
+        manifest = {
+            "format": 2,
+            "kind": "delta" if base else "full",
+            "base_id": base_manifest["snapshot_id"] if base else None,
+            "created": time.time(),
+            "rows": len(ids),
+            "dim": dim,
+            "chunks": len(seen),
+            "vectors_offset": HEADER_BYTES,
+            "vectors_bytes": vectors_bytes,
+            "vectors_sha256": vec_hash.hexdigest(),
+            "records_offset": HEADER_BYTES + vectors_bytes,
+            "records_bytes": len(records),
+            "records_sha256": hashlib.sha256(records).hexdigest(),
+            "sidecars": side,
+            "info": info or {}
+        }
+        manifest["snapshot_id"] = hashlib.sha256(
+            (manifest["vectors_sha256"] + manifest["records_sha256"] + str(manifest["base_id"])
+             + "".join(entry["sha256"] for entry in side.values())).encode()
+        ).hexdigest()[:16]
+        raw = json.dumps(manifest).encode("utf-8")
+        f.write(raw)
+        f.write(struct.pack("<Q", len(raw)))
+        f.write(MAGIC)
+        f.flush()
+        os.fsync(f.fileno())
+
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(manifest["created"]))
+    path = os.path.join(directory, f"{stamp}-{manifest['kind']}-{manifest['snapshot_id']}{SUFFIX}")
+    os.replace(tmp, path)
+    return path
+
+
+def export_next(vectorstore, directory=SNAPSHOT_DIR, full=False, info=None, sidecars=None):
+    """Delta on top of the current chain, or a full snapshot if there is none (or full=True)."""
+    chain = [] if full else snapshot_chain(directory)
+    return export_snapshot(vectorstore, directory, base=chain or None, info=info, sidecars=sidecars)
+
+
+# -------------------- LOAD --------------------
+class _Segments:
+    """Row-wise concatenation of memory-mapped segments, without copying them."""
+
+    def __init__(self, arrays, dim):
+        self.arrays = [a for a in arrays if len(a)]
+        self.dim = dim
+        self.starts = np.cumsum([0] + [len(a) for a in self.arrays])
+
+    def __len__(self):
+        return int(self.starts[-1])
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, _ = key.indices(len(self))
+            parts = []
+            for a, s in zip(self.arrays, self.starts):
+                lo, hi = max(start - s, 0), min(stop - s, len(a))
+                if lo < hi:
+                    parts.append(a[lo:hi])
+            if len(parts) == 1:
+                return parts[0]
+            return np.concatenate(parts) if parts else np.zeros((0, self.dim), dtype=np.float32)
+        rows = np.asarray(key, dtype=np.int64)
+        seg = np.searchsorted(self.starts, rows, side="right") - 1
+        out = np.empty((len(rows), self.dim), dtype=np.float32)
+        for i in np.unique(seg):
+            mask = seg == i
+            out[mask] = self.arrays[i][rows[mask] - self.starts[i]]
+        return out
+
+
+class SnapshotCollection(FlatCollection):
+    """
+    Read-only FlatCollection over a snapshot chain. Vectors are memory-mapped
+    straight from the snapshot files (nothing is copied or re-embedded), so a
+    new node serves queries as soon as the records are decoded.
+    """
+
+    def __init__(self, paths, verify=VERIFY):
+        if not paths:
+            raise ValueError("no snapshot to load")
+        self.path = paths[-1]
+        self.paths = list(paths)
+        self._lock = threading.RLock()
+        self._mm = None
+        self.dim = None
+        self.ids = []
+        self.documents = []
+        self.columns = {}
+        self.row_of = {}
+        alive = []
+        segments = []
+        prev = None
+        for path in paths:
+            m = verify_snapshot(path) if verify else read_manifest(path)
+            if m["base_id"] != prev:
+                raise ValueError(f"{path}: built on {m['base_id']}, expected {prev}")
+            prev = m["snapshot_id"]
+            self.dim = m["dim"] or self.dim
+            records = read_records(path, m)
+            for cid in records["deleted"] + records["ids"]:
+                row = self.row_of.pop(cid, None)
+                if row is not None:
+                    alive[row] = False
+            self._append(records["ids"], records["documents"], records["metadatas"])
+            alive.extend([True] * m["rows"])
+            segments.append(map_vectors(path, m))
+        self.alive = np.asarray(alive, dtype=bool)
+        self._segments = _Segments(segments, self.dim or 0)
+
+    def _append(self, ids, documents, metadatas):
+        start = len(self.ids)
+        self.ids.extend(ids)
+        self.documents.extend(documents)
+        for key in {k for m in metadatas for k in m} - self.columns.keys():
+            self.columns[key] = [None] * start
+        for key, col in self.columns.items():
+            col.extend(m.get(key) for m in metadatas)
+        for i, cid in enumerate(ids):
+            self.row_of[cid] = start + i
+
+    def _vectors(self):
+        return self._segments
+
+    def _sync(self):
+        pass                            # immutable files, nothing to pick up
+
+    def tombstones(self):
+        return 0, self.count()          # read-only: never compacted, re-export instead
+
+    def _read_only(self, *args, **kwargs):
+        raise RuntimeError("snapshot stores are read-only; restore the snapshot into a writable backend")
+
+    upsert = add = update = delete = compact = _read_only
+
+    def save(self):
+        pass
+
+
+class SnapshotVectorStore(FlatVectorStore):
+    """
+    FlatVectorStore surface over the newest snapshot chain in a directory.
+    The chain's near-duplicate refs are unpacked next to it, where
+    get_near_dup_index looks for them (collapsed chunks have no vector to rebuild from).
+    """
+
+    def __init__(self, directory, embedding_function, verify=VERIFY):
+        self._persist_directory = directory
+        self._embedding_function = embedding_function
+        chain = snapshot_chain(directory)
+        self._collection = SnapshotCollection(chain, verify)
+        found = chain_sidecars(chain).get("near_dup")
+        target = os.path.join(directory, DEDUP_PATH)
+        if found is not None and (not os.path.exists(target)
+                                  or os.path.getmtime(target) < os.path.getmtime(found[0])):
+            extract_sidecar(*found, target)
+
+
+def restore_snapshot(paths, vectorstore, batch_size=PAGE_SIZE, verify=True, sidecars=None):
+    """
+    Copy a snapshot chain into any writable store (chroma / flat / sharded).
+    sidecars: name -> SQLite path to restore the chain's ledger / near_dup copy to.
+    """
+    source = SnapshotCollection(paths, verify)
+    target = vectorstore._collection
+    client = getattr(target, "_client", None)
+    if client is not None and hasattr(client, "get_max_batch_size"):
+        batch_size = min(batch_size, client.get_max_batch_size())
+    rows = sorted(source.row_of.values())
+    for i in range(0, len(rows), batch_size):
+        part = rows[i:i + batch_size]
+        target.upsert(
+            ids=[source.ids[r] for r in part],
+            embeddings=source._vectors()[part],
+            documents=[source.documents[r] for r in part],
+            metadatas=[source._meta(r) for r in part]
+        )
+    vectorstore.persist()
+    found = chain_sidecars(paths)
+    for name, target in (sidecars or {}).items():
+        if name in found:
+            extract_sidecar(*found[name], target)
+    return len(rows)
+
+
+# -------------------- CLI --------------------
+if __name__ == "__main__":
+    from ledger import LEDGER_PATH, Ledger
+
+    parser = argparse.ArgumentParser(description="Export / load / restore vector store snapshots")
+    parser.add_argument("command", choices=["export", "verify", "load", "restore"])
+    parser.add_argument("--dir", default=os.path.join("chroma_db", SNAPSHOT_DIR))
+    parser.add_argument("--chroma-dir", default="chroma_db")
+    parser.add_argument("--backend", help="store to export from / restore into (default VECTOR_BACKEND)")
+    parser.add_argument("--full", action="store_true", help="export: full snapshot instead of a delta")
+    parser.add_argument("--ledger", default=LEDGER_PATH, help="ledger to export / restore with the vectors")
+    args = parser.parse_args()
+
+    if args.command == "verify":
+        for path in snapshot_chain(args.dir):
+            m = verify_snapshot(path)
+            print(f"ok  {os.path.basename(path)}  {m['kind']}  {m['rows']} rows")
+    elif args.command == "load":
+        # cold start: open + first query, no embedding model needed
+        t0 = time.perf_counter()
+        collection = SnapshotCollection(snapshot_chain(args.dir))
+        t1 = time.perf_counter()
+        collection.query([np.ones(collection.dim, dtype=np.float32)], n_results=10)
+        t2 = time.perf_counter()
+        print(f"{collection.count()} chunks, opened in {t1 - t0:.2f}s, first query {t2 - t1:.3f}s")
+    else:
+        from resources import VECTOR_BACKEND, get_embedding_model, get_vectorstore, near_dup_path
+
+        args.backend = args.backend or VECTOR_BACKEND
+        vectorstore = get_vectorstore(args.chroma_dir, get_embedding_model(), args.backend)
+        sidecars = {"ledger": args.ledger, "near_dup": near_dup_path(args.chroma_dir, vectorstore)}
+        if args.command == "export":
+            path = export_next(vectorstore, args.dir, args.full, sidecars=sidecars,
+                               info={"index_version": Ledger(args.ledger).index_version(), "backend": args.backend})
+            m = read_manifest(path)
+            print(f"{path}: {m['kind']}, {m['rows']} rows of {m['chunks']} chunks, "
+                  f"{os.path.getsize(path) / 2 ** 20:.1f} MB")
+        else:
+            n = restore_snapshot(snapshot_chain(args.dir), vectorstore, sidecars=sidecars)
+            print(f"restored {n} chunks")
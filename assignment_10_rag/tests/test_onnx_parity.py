@@ -0,0 +1,46 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("transformers")
+pytest.importorskip("torch")
+pytest.importorskip("sentence_transformers")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from onnx_embeddings import EMBED_MODEL, OnnxEmbeddings, parity_check, sample_texts  # noqa: E402
+
+MIN_COSINE = 0.98
+
+
+@pytest.fixture(scope="module")
+def reference():
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+
+    return HuggingFaceEmbeddings(model_name=EMBED_MODEL)
+
+
+@pytest.fixture(scope="module")
+def export_dir(tmp_path_factory):
+    return str(tmp_path_factory.mktemp("onnx_model"))
+
+
+@pytest.mark.parametrize("quantize", [True, False], ids=["int8", "fp32"])
+def test_onnx_matches_torch(reference, export_dir, quantize):
+    texts = sample_texts(64)
+    report = parity_check(reference, OnnxEmbeddings(export_dir=export_dir, quantize=quantize),
+                          texts, min_cosine=MIN_COSINE)
+    assert report["texts"] == len(texts)
+    assert report["min_cosine"] >= MIN_COSINE
+
+
+def test_query_matches_documents(export_dir):
+    model = OnnxEmbeddings(export_dir=export_dir)
+    text = "senior python engineer, kubernetes and aws"
+    a = np.asarray(model.embed_query(text))
+    b = np.asarray(model.embed_documents([text])[0])
+    assert abs(float(np.linalg.norm(a)) - 1.0) < 1e-3
+    assert float(a @ b) >= 0.999
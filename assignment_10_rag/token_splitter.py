@@ -0,0 +1,139 @@
+import argparse
+from functools import lru_cache
+
+import numpy as np
+from langchain_core.documents import Document
+
+# -------------------- CONFIG --------------------
+EMBED_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+MAX_TOKENS = 256           # all-MiniLM-L6-v2 truncates everything after this
+CHUNK_TOKENS = 250         # room for [CLS] / [SEP] plus boundary slack when re-tokenized
+CHUNK_OVERLAP_TOKENS = 32
+SNAP_WINDOW = 0.25         # look back this share of a chunk for a sentence / word break
+PAGE_SIZE = 1000
+
+
+@lru_cache(maxsize=4)
+def get_tokenizer(model_name=EMBED_MODEL):
+    from transformers import AutoTokenizer
+
+    # the Rust "fast" tokenizer: batched, and gives character offsets
+    return AutoTokenizer.from_pretrained(model_name, use_fast=True)
+
+
+# -------------------- SPLITTER --------------------
+class TokenSplitter:
+    """
+    Packs text into chunks of at most chunk_tokens word-pieces of the embedding
+    model's own tokenizer, with chunk_overlap tokens shared between neighbours.
+    Every page is tokenized once (one batched call per split_documents), chunks
+    are cut on the returned character offsets, preferring a sentence or word break.
+    Same split_text / split_documents surface as langchain's text splitters.
+    """
+
+    def __init__(self, model_name=EMBED_MODEL, chunk_tokens=CHUNK_TOKENS,
+                 chunk_overlap=CHUNK_OVERLAP_TOKENS):
+        if chunk_overlap >= chunk_tokens:
+            raise ValueError("chunk_overlap must be smaller than chunk_tokens")
+        self.model_name = model_name
+        self.chunk_tokens = chunk_tokens
+        self.chunk_overlap = chunk_overlap
+
+    def _cut(self, text, offsets):
+        n = len(offsets)
+        chunks = []
+        start = 0
+        while start < n:
+            end = min(start + self.chunk_tokens, n)
+            if end < n:
+                end = self._snap(text, offsets, start, end)
+            chunk = text[offsets[start][0]:offsets[end - 1][1]].strip()
+            if chunk:
+                chunks.append(chunk)
+            if end >= n:
+                break
+            start = max(end - self.chunk_overlap, start + 1)
+        return chunks
+
+    def _snap(self, text, offsets, start, end):
+        """Move end back to just after a sentence end, else to a word start."""
+        floor = end - int((end - start) * SNAP_WINDOW)
+        word = None
+        for i in range(end, max(floor, start + 1), -1):
+            gap = text[offsets[i - 1][1]:offsets[i][0]]
+            if "\n" in gap or text[offsets[i - 1][1] - 1:offsets[i - 1][1]] in (".", "!", "?", ";"):
+                return i
+            if word is None and gap:
+                word = i
+        return word or end
+
+    def split_text(self, text):
+        return self._split_many([text])[0]
+
+    def _split_many(self, texts):
+        if not texts:
+            return []
+        enc = get_tokenizer(self.model_name)(
+            texts, add_special_tokens=False, return_offsets_mapping=True, verbose=False
+        )
+        return [self._cut(t, offsets) for t, offsets in zip(texts, enc["offset_mapping"])]
+
+    def split_documents(self, documents):
+        documents = list(documents)
+        out = []
+        for doc, chunks in zip(documents, self._split_many([d.page_content for d in documents])):
+            out.extend(Document(page_content=c, metadata=dict(doc.metadata)) for c in chunks)
+        return out
+
+
+# -------------------- TRUNCATION REPORT --------------------
+def token_counts(texts, model_name=EMBED_MODEL, batch_size=256):
+    """Word-pieces per text including [CLS] / [SEP], i.e. what the model would see untruncated."""
+    tokenizer = get_tokenizer(model_name)
+    counts = []
+    for i in range(0, len(texts), batch_size):
+        enc = tokenizer(texts[i:i + batch_size], add_special_tokens=True, verbose=False)
+        counts.extend(len(ids) for ids in enc["input_ids"])
+    return np.asarray(counts, dtype=np.int64)
+
+
+def truncation_report(texts, model_name=EMBED_MODEL, max_tokens=MAX_TOKENS):
+    counts = token_counts(list(texts), model_name)
+    if len(counts) == 0:
+        return {"chunks": 0}
+    lost = np.maximum(counts - max_tokens, 0)
+    return {
+        "chunks": int(len(counts)),
+        "truncated_chunks": int((lost > 0).sum()),
+        "truncated_share": float((lost > 0).mean()),
+        "tokens_total": int(counts.sum()),
+        "tokens_invisible": int(lost.sum()),
+        "invisible_share": float(lost.sum() / counts.sum()),
+        "mean_tokens": float(counts.mean()),
+        "p95_tokens": float(np.percentile(counts, 95)),
+        "max_tokens": int(counts.max()),
+        # padding + unused positions in a max_tokens window -> embedding work spent on nothing
+        "window_fill": float(np.minimum(counts, max_tokens).mean() / max_tokens)
+    }
+
+
+def index_texts(vectorstore, page_size=PAGE_SIZE):
+    collection = vectorstore._collection
+    for offset in range(0, collection.count(), page_size):
+        yield from collection.get(include=["documents"], limit=page_size, offset=offset)["documents"]
+
+
+# -------------------- CLI --------------------
+if __name__ == "__main__":
+    from resources import get_embedding_model, get_vectorstore
+
+    parser = argparse.ArgumentParser(description="How much indexed text the embedding model never sees")
+    parser.add_argument("--chroma-dir", default="chroma_db")
+    parser.add_argument("--backend", default="chroma")
+    parser.add_argument("--max-tokens", type=int, default=MAX_TOKENS)
+    args = parser.parse_args()
+
+    vectorstore = get_vectorstore(args.chroma_dir, get_embedding_model(), args.backend)
+    report = truncation_report([t or "" for t in index_texts(vectorstore)], max_tokens=args.max_tokens)
+    for key, value in report.items():
+        print(f"{key:<18} {value:.3f}" if isinstance(value, float) else f"{key:<18} {value}")
@@ -1,12 +1,16 @@
 
-import chromadb
+import os
+import sys
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.embeddings import HuggingFaceEmbeddings
 
+# shared model / client layer lives in assignment_10_rag
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "assignment_10_rag"))
+from resources import get_chroma_client, get_embedding_model
 
 
-#embedding model using langchain embeddings
-embed_model = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+
+#embedding model using langchain embeddings (loaded once per process, warmed in background)
+embed_model = get_embedding_model("sentence-transformers/all-MiniLM-L6-v2")
 
 #chunking usinglangchain
 text_splitter = RecursiveCharacterTextSplitter(chunk_size = 200, chunk_overlap = 20)
@@ -14,7 +18,7 @@ text_splitter = RecursiveCharacterTextSplitter(chunk_size = 200, chunk_overlap =
 # client = chromadb.Client(settingschromadb.settings(persist_directory = "./chroma_db"))
 
 
-client = chromadb.PersistentClient(path="./chroma_db")
+client = get_chroma_client("./chroma_db")
 collection = client.get_or_create_collection("resumes")
 
 
@@ -30,7 +34,7 @@ metadatas = [ {"source" : "example.txt" , "chunk_id" : i} for i in range (len(ch
 
 #add data to chromadb
 collection.add(ids = ids, documents = chunks , embeddings = embeddings , metadatas = metadatas)
-client.persist()
+# PersistentClient writes through on add -- there is no separate persist() step
 
 #READ similarity search
 
@@ -1,5 +1,6 @@
 from langchain.embeddings import init_embeddings
 import numpy as np
+import os
 
 
 
@@ -15,10 +16,11 @@ import numpy as np
 def cosine_similatity(a,b):
     return np.dot(a , b) / (np.linalg.norm(a) * np.linalg.norm(b))
 
+#served by assignment_10_rag/embed_server.py (python embed_server.py serve), one model copy for every demo
 embed_model = init_embeddings(
     model="text-embedding-all-minilm-l6-v2-embedding",
     provider="openai",
-    base_url="http://127.0.0.1:1234/v1",
+    base_url=os.getenv("EMBED_SERVER_URL", "http://127.0.0.1:8765/v1"),
     api_key="not-needed",
     check_embedding_ctx_length = False
 )
@@ -1,29 +1,41 @@
 from langchain_community.document_loaders import PyPDFLoader
 from langchain.embeddings import init_embeddings
 
+import os
+import sys
+# shared embedding cache lives in assignment_10_rag
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "assignment_10_rag"))
+from embed_cache import CachedEmbeddings
+
 
 #PyPDFLoader is a LangChain document loader used to read PDF files and convert them into text documents page-by-page.
 
 
-embed_model = init_embeddings(
-    model="text-embedding-nomic-embed-text-v1.5",
-    provider="openai",
-    base_url="http://127.0.0.1:1234/v1",
-    api_key="not-needed",
-    check_embedding_ctx_length=False
+embed_model = CachedEmbeddings(
+    init_embeddings(
+        model="text-embedding-nomic-embed-text-v1.5",
+        provider="openai",
+        base_url="http://127.0.0.1:1234/v1",
+        api_key="not-needed",
+        check_embedding_ctx_length=False
+    ),
+    model_name="text-embedding-nomic-embed-text-v1.5"
 )
 
 def load_pdf_resume(pdf_path):
 
     #load pdf and extract text
+    #lazy_load yields one page at a time, so only the text is kept, not every Document
     loader = PyPDFLoader(pdf_path)
-    docs = loader.load()
-    resume_content = ""
-    for page in docs:
-        resume_content += page.page_content
+    parts = []
+    page_count = 0
+    for page in loader.lazy_load():
+        parts.append(page.page_content)
+        page_count += 1
+    resume_content = "".join(parts)
     metadata = {
         "source": pdf_path,
-        "page_count": len(docs)
+        "page_count": page_count
     }
     return resume_content, metadata
 
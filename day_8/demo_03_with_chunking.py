@@ -2,41 +2,57 @@ from langchain_community.document_loaders import PyPDFLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain.embeddings import init_embeddings
 
-embed_model = init_embeddings(
-    model="text-embedding-nomic-embed-text-v1.5",
-    provider="openai",
-    base_url="http://127.0.0.1:1234/v1",
-    api_key="not-needed",
-    check_embedding_ctx_length=False
+import os
+import sys
+# shared embedding cache lives in assignment_10_rag
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "assignment_10_rag"))
+from embed_cache import CachedEmbeddings
+
+embed_model = CachedEmbeddings(
+    init_embeddings(
+        model="text-embedding-nomic-embed-text-v1.5",
+        provider="openai",
+        base_url="http://127.0.0.1:1234/v1",
+        api_key="not-needed",
+        check_embedding_ctx_length=False
+    ),
+    model_name="text-embedding-nomic-embed-text-v1.5"
 )
 
 def load_pdf_resume(pdf_path):
-    # 1. Load PDF pages
+    # 1. Load PDF pages LAZILY (one page in memory at a time)
     loader = PyPDFLoader(pdf_path)
-    docs = loader.load()
 
-    # 2. Chunking happens HERE ⬅⬅⬅
+    # 2. Chunking happens HERE ⬅⬅⬅ (page by page)
     text_splitter = RecursiveCharacterTextSplitter(
         chunk_size=200,
         chunk_overlap=20
     )
-    chunks = text_splitter.split_documents(docs)
 
-    # 3. Extract chunk texts & metadata
-    texts = [chunk.page_content for chunk in chunks]
-    metadatas = [chunk.metadata for chunk in chunks]
-
-    return texts, metadatas
+    # 3. Yield chunk texts & metadata as soon as each page is split
+    for page in loader.lazy_load():
+        for chunk in text_splitter.split_documents([page]):
+            yield chunk.page_content, chunk.metadata
 
 resume_path = "F:/git_1/resume/resume-003.pdf"
-resume_chunks, resume_metadata = load_pdf_resume(resume_path)
-
-print("Total chunks:", len(resume_chunks))
-print(resume_chunks[0])
-
-# 4. Generate embeddings (ONE embedding per chunk)
-resume_embeddings = embed_model.embed_documents(resume_chunks)
 
-print("Total embeddings:", len(resume_embeddings))
-print(f"Embedding length: {len(resume_embeddings[0])}")
-print(f"First 4 values: {resume_embeddings[0][:4]}")
+# 4. Generate embeddings in small batches (ONE embedding per chunk)
+BATCH_SIZE = 16
+batch = []
+total = 0
+for text, metadata in load_pdf_resume(resume_path):
+    if total == 0 and not batch:
+        print(text)
+    batch.append(text)
+    if len(batch) == BATCH_SIZE:
+        resume_embeddings = embed_model.embed_documents(batch)
+        total += len(resume_embeddings)
+        batch = []
+if batch:
+    resume_embeddings = embed_model.embed_documents(batch)
+    total += len(resume_embeddings)
+
+print("Total embeddings:", total)
+if total:
+    print(f"Embedding length: {len(resume_embeddings[0])}")
+    print(f"First 4 values: {resume_embeddings[0][:4]}")
@@ -5,11 +5,12 @@ from langchain.chat_models import init_chat_model
 from langchain_community.document_loaders import PyPDFLoader
 from langchain.embeddings import init_embeddings
 import os
+import sys
 import streamlit as st
 
-
-from PyPDF2 import PdfReader
-from langchain_core.documents import Document
+# page text cached by PDF content hash: a Streamlit rerun never re-parses the same upload
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "assignment_10_rag"))
+from pdf_text import load_documents
 
 
 llm = init_chat_model(
@@ -19,28 +20,17 @@ llm = init_chat_model(
     api_key = os.getenv("GROQ_API_KEY")
 )
 
+# the shared embedding server (assignment_10_rag/embed_server.py), not a second model copy
 embed_model = init_embeddings(
-    model="text-embedding-nomic-embed-text-v1.5",
+    model="text-embedding-all-minilm-l6-v2-embedding",
     provider="openai",
-    base_url="http://127.0.0.1:1234/v1",
+    base_url=os.getenv("EMBED_SERVER_URL", "http://127.0.0.1:8765/v1"),
     api_key="not-needed",
     check_embedding_ctx_length=False
 )
 
 def load_pdf_resume(pdf_path):
-    reader = PdfReader(uploaded_file)
-    documents = []
-    i = 0  # page counter
-
-    for page in reader.pages:
-        text = page.extract_text()
-        documents.append(
-            Document(
-                page_content=text,
-                metadata={"page": i, "source": uploaded_file.name}
-            )
-        )
-        i += 1  # increment page number
+    documents = load_documents(pdf_path, name=pdf_path.name)
     # st.success(f"Loaded {len(documents)} pages")
     st.write(documents[0].page_content)
     metadata = {